@@ -0,0 +1,519 @@
+# File: analytics.py
+# Single-pass analytics engine behind the dashboard panels.
+#
+# Each analytics endpoint used to reload the transactions table, reparse the
+# dates and recompute total_amount on its own. Here the table is loaded and
+# prepared once (cached per transactions data version, see data_version.py),
+# the shared aggregates are computed in one pass, and every panel is a cheap
+# view over them. /api/dashboard returns all panels in one response; the existing
+# endpoints call the same panel functions.
+#
+# Window-based panels (KPIs, stock alerts, marketing) read a product x day
+# MetricsCube with prefix sums, so any start/end/compare window is an O(1)
+# subtraction per product instead of a filter over the whole frame.
+#
+# With ?approx=1 the KPI panel (approx_kpis) never loads the transactions
+# table: it answers from the SketchStore (sketches.py), which keeps exact
+# per-product daily totals plus bounded-error distinct counts, top SKUs and
+# quantiles.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+import customers
+import data_version
+import inventory
+import sketches
+from database import load_data
+
+
+COST_RATIO = 0.70  # Assume 30% margin (can be made dynamic)
+ASSUMED_STOCK = 100
+DEFAULT_WINDOW_DAYS = 30
+
+DAYS_EN = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAYS_BN = ['সোমবার', 'মঙ্গলবার', 'বুধবার', 'বৃহস্পতিবার', 'শুক্রবার', 'শনিবার', 'রবিবার']
+MONTH_NAMES_BN = {1: 'জানুয়ারি', 2: 'ফেব্রুয়ারি', 3: 'মার্চ (রমজান)', 4: 'এপ্রিল (ঈদ)',
+                  5: 'মে', 6: 'জুন', 7: 'জুলাই', 8: 'আগস্ট', 9: 'সেপ্টেম্বর',
+                  10: 'অক্টোবর', 11: 'নভেম্বর (শীত)', 12: 'ডিসেম্বর (শীত)'}
+
+
+class NoData(Exception):
+    """Raised by a panel when the data it needs is missing (endpoints answer 404)."""
+
+
+class MetricsCube:
+    """Dense product x day cube of {units, revenue, orders, active} with prefix sums.
+
+    `cum[p, d]` holds the totals of product p over days [0, d), so any
+    inclusive day window is one subtraction for every product at once.
+    `active` counts days with at least one sale (for per-selling-day averages).
+    """
+
+    METRICS = ('units', 'revenue', 'orders', 'active')
+
+    def __init__(self, df, today):
+        codes, products = pd.factorize(df['product'], sort=True)
+        days = df['date'].dt.normalize()
+        self.day0 = days.min()
+        self.last_day = max(days.max(), today)
+        self.products = list(products)
+        n_prod = len(products)
+        n_days = (self.last_day - self.day0).days + 1
+        valid = codes >= 0  # rows without a product are left out
+        offsets = (days - self.day0).dt.days.to_numpy()
+        flat = (codes * n_days + offsets)[valid]
+        size = n_prod * n_days
+
+        def binned(weights=None):
+            w = None if weights is None else df[weights].to_numpy(dtype=float)[valid]
+            return np.bincount(flat, weights=w, minlength=size).reshape(n_prod, n_days)
+
+        cube = np.zeros((n_prod, n_days, len(self.METRICS)))
+        cube[:, :, 0] = binned('quantity')
+        cube[:, :, 1] = binned('total_amount')
+        cube[:, :, 2] = binned()
+        cube[:, :, 3] = cube[:, :, 2] > 0
+        self.cum = np.zeros((n_prod, n_days + 1, len(self.METRICS)))
+        np.cumsum(cube, axis=1, out=self.cum[:, 1:, :])
+
+    def _index(self, day):
+        return int(np.clip((pd.Timestamp(day).normalize() - self.day0).days, 0, self.cum.shape[1] - 1))
+
+    def window(self, start, end):
+        """Per-product totals for the inclusive day range [start, end] -> DataFrame."""
+        # cum has n_days + 1 columns; an end past last_day is clamped to the whole cube
+        a, b = self._index(start), min(self._index(end) + 1, self.cum.shape[1] - 1)
+        if pd.Timestamp(end) < self.day0 or pd.Timestamp(start) > self.last_day or a >= b:
+            sums = np.zeros((len(self.products), len(self.METRICS)))
+        else:
+            sums = self.cum[:, b, :] - self.cum[:, a, :]
+        return pd.DataFrame(sums, index=pd.Index(self.products, name='product'), columns=self.METRICS)
+
+
+class Window:
+    """An inclusive [start, end] day range and the range it is compared against."""
+
+    def __init__(self, start, end, compare_start, compare_end):
+        self.start, self.end = start, end
+        self.compare_start, self.compare_end = compare_start, compare_end
+
+    def to_dict(self):
+        return {k: getattr(self, k).strftime('%Y-%m-%d')
+                for k in ('start', 'end', 'compare_start', 'compare_end')}
+
+
+def resolve_window(prepared, start=None, end=None, compare=None, days=DEFAULT_WINDOW_DAYS):
+    """Build a Window from request-style strings.
+
+    Defaults to the last `days` days ending today. `compare` is 'previous'
+    (default; the same number of days right before start), 'year' (same
+    dates a year earlier) or an explicit 'YYYY-MM-DD:YYYY-MM-DD' range.
+    Raises ValueError for unparseable input. `prepared` may be None (the
+    sketch-only panels), in which case "today" comes from today().
+    """
+    end = pd.Timestamp(end).normalize() if end else (prepared.today if prepared is not None else today())
+    start = pd.Timestamp(start).normalize() if start else end - pd.Timedelta(days=days - 1)
+    if start > end:
+        raise ValueError('start must not be after end')
+    compare = (compare or 'previous').strip()
+    if compare == 'previous':
+        length = end - start + pd.Timedelta(days=1)
+        c_start, c_end = start - length, start - pd.Timedelta(days=1)
+    elif compare == 'year':
+        c_start, c_end = start - pd.DateOffset(years=1), end - pd.DateOffset(years=1)
+    elif ':' in compare:
+        a, b = compare.split(':', 1)
+        c_start, c_end = pd.Timestamp(a).normalize(), pd.Timestamp(b).normalize()
+        if c_start > c_end:
+            raise ValueError('compare range start must not be after its end')
+    else:
+        raise ValueError("compare must be 'previous', 'year' or 'YYYY-MM-DD:YYYY-MM-DD'")
+    return Window(start, end, c_start, c_end)
+
+
+def today():
+    """Start of the current local day (data_version.today(), which the ETags also use)."""
+    return pd.Timestamp(data_version.today())
+
+
+class Prepared:
+    """Transactions loaded once with derived columns and shared aggregates."""
+
+    def __init__(self, df, now=None):
+        self.now = now or pd.Timestamp.now()
+        self.today = self.now.normalize() if now is not None else today()
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        df['total_amount'] = df['quantity'] * df['price']
+        df['dow'] = df['date'].dt.dayofweek
+        df['month'] = df['date'].dt.month
+        self.df = df
+        self.has_users = 'user_id' in df.columns
+        self._cube = None
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+
+        # Shared aggregates (one groupby each, reused by several panels)
+        self.by_product = df.groupby('product').agg(
+            total_amount=('total_amount', 'sum'), quantity=('quantity', 'sum'))
+        self.by_dow = df.groupby('dow')['total_amount'].agg(['sum', 'mean'])
+        self.by_month = df.groupby('month')['total_amount'].sum()
+        self.by_period = df.groupby(df['date'].dt.to_period('M'))['total_amount'].sum()
+
+    @property
+    def cube(self):
+        if self._cube is None:
+            self._cube = MetricsCube(self.df, self.today)
+        return self._cube
+
+    def default_window(self):
+        return resolve_window(self)
+
+    def memo(self, key, compute):
+        """Cache a derived result for the life of this frame (i.e. per data version)."""
+        with self._memo_lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        with self._memo_lock:
+            return self._memo.setdefault(key, value)
+
+
+_cache = {'stamp': None, 'prepared': None}
+_lock = threading.Lock()
+_load_lock = threading.Lock()  # one load at a time; the others wait and reuse its frame
+
+
+def _db_stamp():
+    # The date is part of the stamp so "today"/"last 30 days" roll over at midnight
+    return (data_version.version_key(('transactions',)), data_version.today())
+
+
+def get_prepared():
+    """Return the shared Prepared frame, rebuilding it only when transactions changed."""
+    stamp = _db_stamp()
+    with _lock:
+        if _cache['prepared'] is not None and stamp is not None and _cache['stamp'] == stamp:
+            return _cache['prepared']
+    with _load_lock:
+        # Re-check: a request that held the lock before us may have loaded this version
+        stamp = _db_stamp()
+        with _lock:
+            if _cache['prepared'] is not None and stamp is not None and _cache['stamp'] == stamp:
+                return _cache['prepared']
+        df = load_data('transactions')
+        if df is None or df.empty:
+            raise NoData('No transaction data available')
+        prepared = Prepared(df)
+        with _lock:
+            _cache['stamp'] = stamp
+            _cache['prepared'] = prepared
+        return prepared
+
+
+# ---------------------------------------------------------------------------
+# Panels
+# ---------------------------------------------------------------------------
+
+def kpis(p, window=None):
+    w = window or p.default_window()
+    df = p.df
+    cube = p.cube
+    total_revenue = float(df['total_amount'].sum())
+
+    cur = cube.window(w.start, w.end)
+    prev = cube.window(w.compare_start, w.compare_end)
+    growth_rate = _growth_rate(cur, prev)
+
+    product_revenue = p.by_product['total_amount'].sort_values(ascending=False)
+    top_products = [{'name': k, 'revenue': float(v)} for k, v in product_revenue.head(5).items()]
+
+    if 'transaction_id' in df.columns:
+        avg_order_value = float(df.groupby('transaction_id')['total_amount'].sum().mean())
+        unique_customers = int(df['user_id'].nunique()) if p.has_users else 0
+    else:
+        avg_order_value = float(df['total_amount'].mean())
+        unique_customers = int(df['user_id'].nunique()) if p.has_users else 0
+
+    today_revenue = float(cube.window(p.today, p.today)['revenue'].sum())
+    week_start = p.today - pd.Timedelta(days=p.today.dayofweek)
+    week_revenue = float(cube.window(week_start, cube.last_day)['revenue'].sum())
+    month_revenue = float(cube.window(p.today.replace(day=1), cube.last_day)['revenue'].sum())
+
+    trending_product = _trending(cur, prev)
+
+    out = {
+        'total_revenue': round(total_revenue, 2),
+        'growth_rate': round(growth_rate, 2),
+        'total_orders': len(df),
+        'avg_order_value': round(avg_order_value, 2),
+        'unique_customers': unique_customers,
+        'today_revenue': round(today_revenue, 2),
+        'week_revenue': round(week_revenue, 2),
+        'month_revenue': round(month_revenue, 2),
+        'top_products': top_products,
+        'trending_product': {'name': trending_product[0], 'growth': round(trending_product[1], 2)},
+        'window': w.to_dict(),
+    }
+    return out
+
+
+def _growth_rate(cur, prev):
+    last_revenue = float(cur['revenue'].sum())
+    prev_revenue = float(prev['revenue'].sum()) if prev['orders'].sum() else 1
+    return ((last_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
+
+
+def _trending(cur, prev):
+    """(product, growth %) with the highest growth; products without compare-window sales are skipped."""
+    base = prev['revenue'].to_numpy()
+    has_base = base > 0
+    growth = np.full(len(base), -np.inf)
+    growth[has_base] = (cur['revenue'].to_numpy()[has_base] - base[has_base]) / base[has_base] * 100
+    if not has_base.any():
+        return ('N/A', 0)
+    i = int(np.argmax(growth))
+    return (cur.index[i], float(growth[i]))
+
+
+def _day(ts):
+    return ts.strftime('%Y-%m-%d')
+
+
+def approx_kpis(window=None, store=None):
+    """kpis() answered from the SketchStore alone (no transactions frame).
+
+    Revenue, order counts, windows and top products come from the store's
+    exact daily totals; average order value and unique customers use the
+    HyperLogLog distinct counts, so they carry the errors in 'error_bounds'.
+    """
+    sk = store or sketches.get_store()
+    if not sk.rows:
+        raise NoData('No transaction data available')
+    w = window or resolve_window(None)
+    now = today()
+    products = sk.totals()
+    cur = sk.totals(_day(w.start), _day(w.end))
+    prev = sk.totals(_day(w.compare_start), _day(w.compare_end))
+    total_revenue = float(products['revenue'].sum())
+    growth_rate = _growth_rate(cur, prev)
+    trending_product = _trending(cur, prev)
+    product_revenue = products['revenue'].sort_values(ascending=False)
+    week_start = now - pd.Timedelta(days=now.dayofweek)
+
+    def revenue(start, end=None):
+        return float(sk.totals(_day(start), end and _day(end))['revenue'].sum())
+
+    return {
+        'total_revenue': round(total_revenue, 2),
+        'growth_rate': round(growth_rate, 2),
+        'total_orders': sk.rows,
+        'avg_order_value': round(total_revenue / max(sk.distinct_orders(), 1), 2),
+        'unique_customers': sk.distinct_users() if sk.users_product else 0,
+        'today_revenue': round(revenue(now, now), 2),
+        'week_revenue': round(revenue(week_start), 2),
+        'month_revenue': round(revenue(now.replace(day=1)), 2),
+        'top_products': [{'name': k, 'revenue': float(v)} for k, v in product_revenue.head(5).items()],
+        'trending_product': {'name': trending_product[0], 'growth': round(trending_product[1], 2)},
+        'window': w.to_dict(),
+        'approx': {
+            'top_skus': [{'name': k, 'revenue': round(v, 2)} for k, v in sk.sku_revenue.top(5)],
+            'quantiles': sk.quantiles(),
+            'error_bounds': sk.error_bounds(),
+        },
+    }
+
+
+def stock_alerts(p, window=None):
+    w = window or p.default_window()
+    cur = p.cube.window(w.start, w.end)
+    cur = cur[cur['orders'] > 0]
+    # Average units per selling day, as before, for all products at once
+    daily = cur['units'] / cur['active']
+    # Category stock is the sum over its SKUs: the stock table (inventory.py) for
+    # tracked SKUs, ASSUMED_STOCK for each SKU that has no stock row yet
+    stock = inventory.load_stock()
+    if 'product_name' in p.df.columns:
+        skus = p.memo('sku_categories', lambda: p.df[['product', 'product_name']].drop_duplicates('product_name'))
+        per_sku = skus['product_name'].map(stock.set_index('product_name')['current_stock']).fillna(ASSUMED_STOCK)
+        on_hand = per_sku.groupby(skus['product'].to_numpy()).sum()
+    else:
+        on_hand = stock.groupby('category')['current_stock'].sum() if not stock.empty else pd.Series(dtype=float)
+    current = on_hand.reindex(cur.index).fillna(ASSUMED_STOCK).astype(int)
+    days_left = np.where(daily > 0, current // np.where(daily > 0, daily, 1), 999).astype(int)
+    reorder = (daily * 7).astype(int)  # 1 week safety stock
+    status = np.select([days_left < 7, days_left < 14], ['critical', 'warning'], 'ok')
+    alerts = []
+    for product, stock_now, avg, left, rp, st in zip(cur.index, current, daily, days_left, reorder, status):
+        alerts.append({
+            'product': product,
+            'current_stock': int(stock_now),
+            'daily_avg_sales': round(float(avg), 2),
+            'days_until_stockout': int(left),
+            'reorder_point': int(rp),
+            'status': str(st),
+            'recommendation': f"অর্ডার দিন {int(rp)} ইউনিট" if st != 'ok' else 'স্টক ভালো আছে',
+        })
+    return {'alerts': sorted(alerts, key=lambda x: x['days_until_stockout']), 'window': w.to_dict()}
+
+
+def trends(p):
+    day_sales = {DAYS_EN[d]: float(v) for d, v in p.by_dow['sum'].items()}
+    best_day = max(day_sales.items(), key=lambda x: x[1])
+    weekly_pattern = [{'day': day, 'revenue': float(day_sales.get(day, 0))} for day in DAYS_EN]
+
+    monthly_revenue = p.by_period
+    if len(monthly_revenue) >= 2:
+        latest_month = monthly_revenue.iloc[-1]
+        prev_month = monthly_revenue.iloc[-2]
+        mom_growth = ((latest_month - prev_month) / prev_month * 100) if prev_month > 0 else 0
+    else:
+        mom_growth = 0
+
+    return {
+        'best_day': {'name': best_day[0], 'revenue': float(best_day[1])},
+        'weekly_pattern': weekly_pattern,
+        'mom_growth': round(float(mom_growth), 2),
+        'recommendation': f"{best_day[0]} তে বেশি প্রচার চালান - সবচেয়ে বেশি বিক্রয় হয়!",
+    }
+
+
+def customer_insights(p):
+    # Per-customer RFM table is maintained incrementally by customers.py
+    engine = customers.get_table() if p.has_users else None
+    table = engine.table if engine is not None else None
+    if table is None or table.empty:
+        raise NoData('No customer data')
+    top = table.nlargest(5, 'monetary')
+    top_list = [{'customer_id': int(idx), 'total_spent': float(m), 'orders': int(f)}
+                for idx, m, f in zip(top.index, top['monetary'], top['frequency'])]
+    at_risk = int((table['recency'] > customers.AT_RISK_DAYS).sum())
+    return {
+        'total_customers': len(table),
+        'top_customers': top_list,
+        'avg_ltv': round(float(table['monetary'].mean()), 2),
+        'at_risk_customers': at_risk,
+        'segments': engine.segment_counts(),
+        'recommendation': f"{at_risk} জন ক্রেতা ঝুঁকিতে আছে - তাদের জন্য বিশেষ অফার দিন!",
+    }
+
+
+def profit(p):
+    pp = p.by_product.reset_index()
+    pp['cost'] = pp['total_amount'] * COST_RATIO
+    pp['profit'] = pp['total_amount'] - pp['cost']
+    pp['profit_margin'] = pp['profit'] / pp['total_amount'] * 100
+
+    top_profit = pp.nlargest(5, 'profit')
+    profit_list = [{'product': prod, 'revenue': float(rev), 'profit': float(pr), 'margin': round(float(m), 2)}
+                   for prod, rev, pr, m in zip(top_profit['product'], top_profit['total_amount'],
+                                               top_profit['profit'], top_profit['profit_margin'])]
+    total_amount = float(pp['total_amount'].sum())
+    total_profit = float(pp['profit'].sum())
+    best = pp.loc[pp['profit_margin'].idxmax()]
+    return {
+        'total_profit': round(total_profit, 2),
+        'profit_margin': round(total_profit / total_amount * 100, 2),
+        'top_profitable': profit_list,
+        'best_margin_product': {'name': best['product'], 'margin': round(float(best['profit_margin']), 2)},
+        'recommendation': f"{best['product']} সবচেয়ে লাভজনক - এটি বেশি প্রচার করুন!",
+    }
+
+
+def seasonal(p):
+    peak_month = int(p.by_month.idxmax())
+    df = p.df
+    eid_top = df[df['month'].isin([3, 4, 5])].groupby('product')['total_amount'].sum().nlargest(3)
+    winter_top = df[df['month'].isin([11, 12, 1, 2])].groupby('product')['total_amount'].sum().nlargest(3)
+
+    current_month = p.now.month
+    if current_month in [2, 3]:
+        upcoming_season = "রমজান আসছে - খাদ্য ও পোশাক স্টক বাড়ান"
+    elif current_month in [3, 4]:
+        upcoming_season = "ঈদ আসছে - পোশাক, প্রসাধনী, খেলনা স্টক বাড়ান"
+    elif current_month in [10, 11]:
+        upcoming_season = "শীত আসছে - ইলেকট্রনিক্স, পোশাক স্টক বাড়ান"
+    else:
+        upcoming_season = "স্বাভাবিক মৌসুম - নিয়মিত স্টক বজায় রাখুন"
+
+    return {
+        'peak_month': {'month': peak_month, 'name': MONTH_NAMES_BN.get(peak_month),
+                       'revenue': float(p.by_month.loc[peak_month])},
+        'eid_top_products': [{'product': k, 'revenue': float(v)} for k, v in eid_top.items()],
+        'winter_top_products': [{'product': k, 'revenue': float(v)} for k, v in winter_top.items()],
+        'upcoming_season': upcoming_season,
+        'recommendation': upcoming_season,
+    }
+
+
+def marketing(p, window=None):
+    w = window or p.default_window()
+    best_campaign_day = int(p.by_dow['mean'].idxmax())
+    recent = p.cube.window(w.start, w.end)['revenue']
+    old = p.cube.window(w.compare_start, w.compare_end)['revenue']
+    # Products with no sales in the compare window count as 1 (as before)
+    old = old.where(old > 0, 1)
+    decline = ((old - recent) / old * 100)[recent < old]
+    declining = [{'product': k, 'decline': round(float(v), 2)}
+                 for k, v in decline.sort_values(ascending=False, kind='mergesort').head(3).items()]
+    discount_candidates = [item['product'] for item in declining]
+    return {
+        'best_campaign_day': DAYS_BN[best_campaign_day],
+        'declining_products': declining,
+        'discount_recommendations': discount_candidates,
+        'recommended_discount': '15-20%',
+        'recommendation': f"{DAYS_BN[best_campaign_day]} তে ক্যাম্পেইন চালান এবং {', '.join(discount_candidates[:2])} এ ডিসকাউন্ট দিন",
+        'window': w.to_dict(),
+    }
+
+
+PANELS = {
+    'kpis': kpis,
+    'stock_alert': stock_alerts,
+    'trends': trends,
+    'customer_insights': customer_insights,
+    'profit': profit,
+    'seasonal': seasonal,
+    'marketing': marketing,
+}
+
+
+# Panels that take a Window (start/end/compare); the rest always use all data
+WINDOWED = {'kpis', 'stock_alert', 'marketing'}
+# Panels that can answer from sketches (sketches.py) with ?approx=1, without the frame
+APPROX = {'kpis': approx_kpis}
+
+
+def panel(name, prepared=None, window=None, approx=False):
+    """Compute one named panel (raises NoData when its input is missing)."""
+    if approx and name in APPROX:
+        return APPROX[name](window)
+    prepared = prepared or get_prepared()
+    kwargs = {}
+    if name in WINDOWED:
+        kwargs['window'] = window
+    return PANELS[name](prepared, **kwargs)
+
+
+def dashboard(names=None, start=None, end=None, compare=None, approx=False):
+    """Compute every requested panel from one prepared frame.
+
+    start/end/compare select the window of the windowed panels (see
+    resolve_window; ValueError on bad input); approx lets panels use
+    sketches. A panel that fails is reported as {'error': ...} without
+    failing the rest.
+    """
+    names = names or list(PANELS)
+    # Sketch-only requests (?panels=kpis&approx=1) never load the transactions frame
+    prepared = None if approx and all(n in APPROX for n in names) else get_prepared()
+    window = resolve_window(prepared, start, end, compare)
+    out = {}
+    for name in names:
+        try:
+            out[name] = panel(name, prepared, window, approx)
+        except Exception as e:
+            out[name] = {'error': str(e)}
+    return out
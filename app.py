@@ -27,33 +27,48 @@ def _load_local_env(path=None):
 _load_local_env()
 from flask import Flask, request, jsonify
 import threading
+import time
+import json
 from database import init_db, load_data
 from data_ingestion import ingest_trends, ingest_mock_transactions, ingest_social_buzz
 # Defer importing heavy modules (models) until needed to reduce startup memory
 
-from llm import load_llm, generate_insight, generate_insight_stream
+from llm import generate_insight, generate_insight_stream
+from local_llm import get_service as get_local_llm_service
+from prompt_builder import build_chat_prompt
+import analytics
+import catalog
+import customers
+import export_jobs
+import inventory
+import olap
+import series
+import sketches
+import data_version
+from data_version import depends_on
+import responses
 from flask import Response
 from utils import explain_model
 from sklearn.linear_model import LinearRegression
 import pandas as pd
 
-# LLM (lazy-loaded to avoid heavy startup at import time)
+# LLM: the optional local pipeline (LOCAL_LLM=true) loads on a background
+# thread the first time a chat falls back to it (see local_llm.py), so neither
+# import nor any request blocks on transformers.
 llm = None
+_local_llm = get_local_llm_service()
 
 def get_llm():
+    """Return the local micro-batching service if enabled, else None (never blocks)."""
     global llm
-    if llm is None:
-        try:
-            llm = load_llm()
-        except Exception:
-            llm = None
+    llm = _local_llm if _local_llm.enabled else None
     return llm
 
-def gather_dashboard_context(product='clothing'):
-    """Gather a short textual summary of current dashboard state for `product`.
+def gather_dashboard_sections(product='clothing'):
+    """Gather the current dashboard state for `product` as (section, text) pairs.
 
-    This function pulls forecast, pricing, recommendations and social signal
-    and returns a concise human-readable summary to prepend to LLM prompts.
+    Section names match prompt_builder.SECTION_PRIORITY so the chat prompt can
+    keep the most useful ones when the token budget is tight.
     """
     parts = []
     try:
@@ -62,9 +77,9 @@ def gather_dashboard_context(product='clothing'):
         fc = forecast_demand(product)
         if hasattr(fc, 'tail'):
             recent = fc.tail(1).iloc[0]
-            parts.append(f"Forecast (next period) yhat={recent.get('yhat', 'NA'):.2f}")
+            parts.append(("forecast", f"Forecast (next period) yhat={recent.get('yhat', 'NA'):.2f}"))
     except Exception:
-        parts.append("Forecast: unavailable")
+        parts.append(("forecast", "Forecast: unavailable"))
     try:
         # Price details
         df = load_data('transactions')
@@ -72,47 +87,79 @@ def gather_dashboard_context(product='clothing'):
         from models import train_pricing_model, optimize_price
         model = train_pricing_model(product)
         new_price = float(optimize_price(model, current_price))
-        parts.append(f"Price: current={current_price:.2f}, optimized={new_price:.2f}")
+        parts.append(("price", f"Price: current={current_price:.2f}, optimized={new_price:.2f}"))
     except Exception:
-        parts.append("Price: unavailable")
+        parts.append(("price", "Price: unavailable"))
     try:
         from models import build_recommender, recommend_products
         algo = build_recommender()
         recs = recommend_products(algo, user_id=1, n=5) if callable(recommend_products) else []
         if recs:
-            parts.append("Top recommendations: " + ", ".join(map(str, recs[:5])))
+            parts.append(("recommendations", "Top recommendations: " + ", ".join(map(str, recs[:5]))))
     except Exception:
-        parts.append("Recommendations: unavailable")
+        parts.append(("recommendations", "Recommendations: unavailable"))
     try:
         df = load_data('social_sentiment')
         sentiment = float(df[df['product'] == product]['sentiment'].mean()) if (df is not None and not df.empty) else 0.0
-        parts.append(f"Social sentiment (avg): {sentiment:.2f}")
+        parts.append(("sentiment", f"Social sentiment (avg): {sentiment:.2f}"))
     except Exception:
-        parts.append("Social sentiment: unavailable")
+        parts.append(("sentiment", "Social sentiment: unavailable"))
     try:
         from models import build_graph, graph_insights
         G = build_graph()
         insights = graph_insights(G, product)
-        parts.append(f"Graph: {insights}")
+        parts.append(("graph", f"Graph: {insights}"))
     except Exception:
-        parts.append("Graph: unavailable")
+        parts.append(("graph", "Graph: unavailable"))
 
-    return "\n".join(parts)
+    return parts
+
+def gather_dashboard_context(product='clothing'):
+    """Gather a short textual summary of current dashboard state for `product`."""
+    return "\n".join(text for _, text in gather_dashboard_sections(product))
+
+# Sync export endpoints wait this long for their job before answering 202 + job to poll
+EXPORT_SYNC_TIMEOUT = float(os.environ.get('EXPORT_SYNC_TIMEOUT', 60))
 
 # Flask App
 flask_app = Flask(__name__)
+# ETag / Last-Modified + 304 for views marked with @depends_on (see data_version.py)
+data_version.init_app(flask_app)
+# orjson-backed jsonify (DataFrames encoded directly) + gzip/brotli above a size threshold
+responses.init_app(flask_app)
 
 @flask_app.route('/api/forecast', methods=['GET'])
+@depends_on('transactions')
 def api_forecast():
+    """Demand forecast rows (ds, yhat, ...).
+
+    ?format=records|columns|msgpack|arrow; ?points=N&method=lttb|minmax or
+    ?limit=N&cursor=... (see series.py).
+    """
     product = request.args.get('product', 'clothing')
+    try:
+        fmt = responses.check_format(request.args.get('format'))
+        opts = series.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         from models import forecast_demand
-        forecast = forecast_demand(product)
-        return jsonify(forecast.to_dict(orient='records'))
+        cached = series.get_series('forecast', product, ('transactions',),
+                                   lambda: forecast_demand(product), 'ds', 'yhat')
+        return _series_response(cached, opts, fmt)
+    except series.SeriesError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         # Return a JSON error message so the client can display useful feedback
         return jsonify({'error': str(e)}), 500
 
+def _series_response(cached, opts, fmt, wrap=None):
+    """Formatted response for a series.CachedSeries after points/cursor selection."""
+    frame, headers = series.select(cached, opts)
+    resp = responses.formatted_response({wrap: frame} if wrap else frame, fmt)
+    resp.headers.update(headers)
+    return resp
+
 @flask_app.route('/api/price', methods=['GET'])
 def api_price():
     product = request.args.get('product', 'clothing')
@@ -150,6 +197,7 @@ def api_price_details():
     return jsonify({'current_price': current_price, 'optimized_price': new_price, 'explanation': explanation})
 
 @flask_app.route('/api/graph', methods=['GET'])
+@depends_on('transactions')
 def api_graph():
     product = request.args.get('product', 'clothing')
     from models import build_graph, graph_insights
@@ -160,55 +208,41 @@ def api_graph():
     edges = [{'from': u, 'to': v, 'value': G[u][v].get('weight', 1)} for u, v in G.edges()]
     return jsonify({'insights': insights, 'nodes': nodes, 'edges': edges})
 
-# Simple product catalog (static/sample)
 @flask_app.route('/api/products', methods=['GET'])
+@depends_on('products', 'stock')
 def api_products():
-    """Return a small product catalog; in future this can be DB-backed."""
-    # Simple sample catalog with external placeholder images to avoid adding binary assets
-    products = [
-        {
-            'id': 1,
-            'name': 'Lovely Linen Shirt',
-            'price': 28.99,
-            'old_price': 39.99,
-            'currency': 'USD',
-            'image': 'https://via.placeholder.com/400x300.png?text=Linen+Shirt',
-            'stock': 23,
-            'rating': 4.6,
-            'short_desc': 'Cool, comfy, and camera-ready—linen that breathes all day.',
-            'tags': ['Best Seller','Eco'],
-            'eta_days': 2
-        },
-        {
-            'id': 2,
-            'name': 'Smart Home Charger',
-            'price': 45.00,
-            'old_price': 59.00,
-            'currency': 'USD',
-            'image': 'https://via.placeholder.com/400x300.png?text=Charger',
-            'stock': 8,
-            'rating': 4.4,
-            'short_desc': 'Fast charge without fuss—power up in a snap.',
-            'tags': ['New'],
-            'eta_days': 3
-        },
-        {
-            'id': 3,
-            'name': 'Everyday Tote Bag',
-            'price': 19.50,
-            'old_price': None,
-            'currency': 'USD',
-            'image': 'https://via.placeholder.com/400x300.png?text=Tote+Bag',
-            'stock': 120,
-            'rating': 4.2,
-            'short_desc': 'Carry everything with style—durable, light, and washable.',
-            'tags': ['Budget'],
-            'eta_days': 1
-        }
-    ]
-    return jsonify({'products': products})
+    """Paginated product catalog: ?page=1&page_size=50&category=&band=budget|mid|premium&sort=popular|name|price|-price."""
+    try:
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
+        page_size = min(max(request.args.get('page_size', 50, type=int) or 50, 1), 200)
+        band = request.args.get('band') or None
+        if band and band not in catalog.PRICE_BAND_LABELS_BN:
+            return jsonify({'error': 'band must be budget, mid or premium'}), 400
+        return jsonify(catalog.list_products(page, page_size, request.args.get('category') or None, band,
+                                             request.args.get('sort', 'popular')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@flask_app.route('/api/products/search', methods=['GET'])
+@depends_on('products')
+def api_products_search():
+    """Typeahead over English/Bengali product and category names: ?q=sam gal&limit=10&category=."""
+    query = (request.args.get('q') or '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int) or 10, 1), 50)
+    if not query:
+        return jsonify({'query': query, 'results': []})
+    try:
+        t0 = time.perf_counter()  # whole lookup, including the version check / index rebuild
+        results = catalog.get_index().search(query, limit, request.args.get('category') or None)
+        took_ms = (time.perf_counter() - t0) * 1000
+        return jsonify({'query': query, 'results': results, 'took_ms': round(took_ms, 3)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @flask_app.route('/api/social', methods=['GET'])
+@depends_on('social_sentiment')
 def api_social():
     product = request.args.get('product', 'clothing')
     df = load_data('social_sentiment')
@@ -216,424 +250,408 @@ def api_social():
     return jsonify({'sentiment': sentiment})
 
 @flask_app.route('/api/social_series', methods=['GET'])
+@depends_on('social_sentiment')
 def api_social_series():
+    """Sentiment series for a product.
+
+    ?format=records|columns|msgpack|arrow; ?points=N&method=lttb|minmax or
+    ?limit=N&cursor=... (see series.py).
+    """
     product = request.args.get('product', 'clothing')
-    df = load_data('social_sentiment')
-    dfp = df[df['product'] == product].sort_values('date') if (df is not None and not df.empty) else None
-    series = dfp.to_dict(orient='records') if dfp is not None and not dfp.empty else []
-    return jsonify({'series': series})
+    try:
+        fmt = responses.check_format(request.args.get('format'))
+        opts = series.parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build():
+        df = load_data('social_sentiment')
+        if df is None or df.empty:
+            return pd.DataFrame(columns=['date', 'product', 'sentiment'])
+        return df[df['product'] == product]
+
+    try:
+        cached = series.get_series('social', product, ('social_sentiment',), build, 'date', 'sentiment')
+        return _series_response(cached, opts, fmt, wrap='series')
+    except series.SeriesError as e:
+        return jsonify({'error': str(e)}), 400
 
 @flask_app.route('/api/export/excel', methods=['GET'])
 def api_export_excel():
-    """Export sales data to Excel format."""
+    """Export sales data to Excel format (waits for the export job; cached per data version)."""
+    return _export_and_send('sales_excel', {'start_date': request.args.get('start_date'),
+                                            'end_date': request.args.get('end_date')})
+
+def _export_and_send(kind, params):
+    """Run an export job (or reuse its cached artifact) and send the file, as the old sync endpoints did."""
+    # A second attempt covers a build discarded because the data changed mid-build,
+    # or an artifact evicted between the build and sending it
+    for attempt in range(2):
+        try:
+            job = export_jobs.get_queue().submit(kind, params)
+        except export_jobs.ExportError as e:
+            return jsonify({'error': str(e)}), 400
+        if not job.wait(EXPORT_SYNC_TIMEOUT):
+            # Still building: hand the client the job to poll instead of holding the request
+            return jsonify(job.to_dict()), 202, {'Location': f'/api/export/jobs/{job.id}'}
+        if job.status != 'done':
+            if job.stale:
+                continue
+            return jsonify({'error': job.error or 'export failed'}), 500
+        f = _open_artifact(job)
+        if f is not None:
+            return _send_artifact(job, f)
+    return jsonify({'error': 'Export was outdated or evicted before it could be sent; try again'}), 503
+
+def _open_artifact(job):
+    """Open the finished artifact, or None if evict() removed it (an open file survives a later delete)."""
     try:
-        from export_utils import export_sales_excel
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        filepath = export_sales_excel(start_date, end_date)
-        from flask import send_file
-        return send_file(filepath, as_attachment=True, download_name=os.path.basename(filepath))
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return open(job.path, 'rb')
+    except FileNotFoundError:
+        return None
+
+def _send_artifact(job, f):
+    from flask import send_file
+    ext = os.path.splitext(job.path)[1]
+    return send_file(f, as_attachment=True, download_name=f'{job.kind}_{job.id[:8]}{ext}')
+
+@flask_app.route('/api/export/jobs', methods=['POST'])
+def api_export_jobs_create():
+    """Queue an export: {"kind": "sales_excel|sales_csv|sales_ndjson|forecast|product_reports", "params": {...}}.
+
+    product_reports builds one PDF per product in parallel (params.products
+    optional) and zips them with a summary.json carrying reports/minute.
+
+    Identical kind + params at the same data version return the existing job
+    (200 when its artifact is ready, 202 while queued or running).
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind') or request.args.get('kind')
+    params = data.get('params') or {k: v for k, v in data.items() if k != 'kind'} or request.args.to_dict()
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
+    params.pop('kind', None)
+    try:
+        job = export_jobs.get_queue().submit(kind, params)
+    except export_jobs.ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    status = 200 if job.status == 'done' else 202
+    return jsonify(job.to_dict()), status, {'Location': f'/api/export/jobs/{job.id}'}
+
+@flask_app.route('/api/export/jobs/<job_id>', methods=['GET'])
+def api_export_jobs_status(job_id):
+    """Poll an export job: status queued|running|done|failed, plus size/download when done."""
+    job = export_jobs.get_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired export job'}), 404
+    return jsonify(job.to_dict())
+
+@flask_app.route('/api/export/jobs/<job_id>/download', methods=['GET'])
+def api_export_jobs_download(job_id):
+    job = export_jobs.get_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired export job'}), 404
+    if job.status != 'done':
+        return jsonify(job.to_dict()), 409
+    f = _open_artifact(job)
+    if f is None:
+        return jsonify({'error': 'Export artifact was evicted; submit the job again'}), 410
+    return _send_artifact(job, f)
+
+@flask_app.route('/api/export/sales', methods=['GET'])
+def api_export_sales():
+    """Stream sales rows as ?format=csv|ndjson (optional start_date / end_date), chunk by chunk."""
+    from export_utils import STREAM_FORMATS, date_bounds
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(STREAM_FORMATS)}"}), 400
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        date_bounds(start_date, end_date)  # reject bad dates before the stream starts
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid date: {e}'}), 400
+    produce, mimetype = STREAM_FORMATS[fmt]
+    filename = f"sales_export_{time.strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(produce(start_date, end_date), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @flask_app.route('/api/export/forecast', methods=['GET'])
 def api_export_forecast():
-    """Export forecast report."""
+    """Export forecast report (waits for the export job; cached per data version)."""
+    return _export_and_send('forecast', {'product': request.args.get('product', 'clothing')})
+
+def _approx_requested():
+    return request.args.get('approx', '').lower() in ('1', 'true', 'yes')
+
+def _analytics_view(name, table=None):
+    """Serve one dashboard panel from the shared analytics frame.
+
+    Windowed panels accept ?start=YYYY-MM-DD&end=YYYY-MM-DD&compare=previous|year|A:B;
+    ?approx=1 lets panels that support it answer from sketches (bounded error).
+    When `table` names a list-of-rows key of the panel, ?format= applies to it
+    (see responses.formatted_response).
+    """
     try:
-        from export_utils import generate_forecast_pdf
-        from models import forecast_demand
-        product = request.args.get('product', 'clothing')
-        forecast_data = forecast_demand(product)
-        filepath = generate_forecast_pdf(product, forecast_data)
-        from flask import send_file
-        return send_file(filepath, as_attachment=True, download_name=os.path.basename(filepath))
+        fmt = responses.check_format(request.args.get('format')) if table else 'records'
+        approx = _approx_requested()
+        # ?approx=1 panels answer from sketches without loading the transactions frame
+        prepared = None if approx and name in analytics.APPROX else analytics.get_prepared()
+        window = None
+        if name in analytics.WINDOWED:
+            args = request.args
+            window = analytics.resolve_window(prepared, args.get('start'), args.get('end'), args.get('compare'))
+        result = analytics.panel(name, prepared, window, approx)
+        if fmt != 'records':
+            # Panels build a fresh dict per call, so the rows can be swapped in place
+            result[table] = pd.DataFrame(result[table])
+            return responses.formatted_response(result, fmt)
+        return jsonify(result)
+    except analytics.NoData as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@flask_app.route('/api/dashboard', methods=['GET'])
+@depends_on('transactions', 'stock')
+def api_dashboard():
+    """All analytics panels in one response (one load, one pass over the data).
+
+    Optional ?panels=kpis,stock_alert limits the panels computed and
+    start/end/compare set the window of the windowed panels.
+    """
+    try:
+        names = [n.strip() for n in request.args.get('panels', '').split(',') if n.strip()]
+        unknown = [n for n in names if n not in analytics.PANELS]
+        if unknown:
+            return jsonify({'error': f"Unknown panels: {', '.join(unknown)}"}), 400
+        args = request.args
+        return jsonify(analytics.dashboard(names or None, args.get('start'), args.get('end'), args.get('compare'),
+                                           approx=_approx_requested()))
+    except analytics.NoData as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @flask_app.route('/api/analytics/kpis', methods=['GET'])
+@depends_on('transactions')
 def api_analytics_kpis():
     """Calculate comprehensive KPIs for dashboard analytics."""
-    try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No transaction data available'}), 404
-        
-        # Ensure date column is datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Calculate Total Revenue
-        df['total_amount'] = df['quantity'] * df['price']
-        total_revenue = float(df['total_amount'].sum())
-        
-        # Calculate growth rate (compare last 30 days vs previous 30 days)
-        today = pd.Timestamp.now()
-        last_30_days = df[df['date'] >= (today - pd.Timedelta(days=30))]
-        prev_30_days = df[(df['date'] >= (today - pd.Timedelta(days=60))) & (df['date'] < (today - pd.Timedelta(days=30)))]
-        
-        last_30_revenue = float(last_30_days['total_amount'].sum()) if not last_30_days.empty else 0
-        prev_30_revenue = float(prev_30_days['total_amount'].sum()) if not prev_30_days.empty else 1
-        growth_rate = ((last_30_revenue - prev_30_revenue) / prev_30_revenue * 100) if prev_30_revenue > 0 else 0
-        
-        # Top 5 Products by Revenue
-        product_revenue = df.groupby('product')['total_amount'].sum().sort_values(ascending=False)
-        top_products = [{'name': k, 'revenue': float(v)} for k, v in product_revenue.head(5).items()]
-        
-        # Total Orders
-        total_orders = len(df)
-        
-        # Average Order Value
-        avg_order_value = float(df.groupby('transaction_id')['total_amount'].sum().mean()) if 'transaction_id' in df.columns else float(df['total_amount'].mean())
-        
-        # Unique Customers (if user_id exists)
-        unique_customers = int(df['user_id'].nunique()) if 'user_id' in df.columns else 0
-        
-        # Today's Revenue
-        today_revenue = float(df[df['date'] == today.date()]['total_amount'].sum()) if not df[df['date'] == today.date()].empty else 0
-        
-        # This Week's Revenue
-        week_start = today - pd.Timedelta(days=today.dayofweek)
-        week_revenue = float(df[df['date'] >= week_start.date()]['total_amount'].sum())
-        
-        # This Month's Revenue
-        month_start = today.replace(day=1)
-        month_revenue = float(df[df['date'] >= month_start.date()]['total_amount'].sum())
-        
-        # Product with highest growth
-        last_month_df = df[df['date'] >= (today - pd.Timedelta(days=30))]
-        prev_month_df = df[(df['date'] >= (today - pd.Timedelta(days=60))) & (df['date'] < (today - pd.Timedelta(days=30)))]
-        
-        growth_by_product = {}
-        for product in df['product'].unique():
-            last = last_month_df[last_month_df['product'] == product]['total_amount'].sum()
-            prev = prev_month_df[prev_month_df['product'] == product]['total_amount'].sum()
-            if prev > 0:
-                growth_by_product[product] = ((last - prev) / prev * 100)
-        
-        trending_product = max(growth_by_product.items(), key=lambda x: x[1]) if growth_by_product else ('N/A', 0)
-        
-        return jsonify({
-            'total_revenue': round(total_revenue, 2),
-            'growth_rate': round(growth_rate, 2),
-            'total_orders': total_orders,
-            'avg_order_value': round(avg_order_value, 2),
-            'unique_customers': unique_customers,
-            'today_revenue': round(today_revenue, 2),
-            'week_revenue': round(week_revenue, 2),
-            'month_revenue': round(month_revenue, 2),
-            'top_products': top_products,
-            'trending_product': {
-                'name': trending_product[0],
-                'growth': round(trending_product[1], 2)
-            }
-        })
-    except Exception as e:
-        import traceback
-        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+    return _analytics_view('kpis')
 
 @flask_app.route('/api/stock/alert', methods=['GET'])
+@depends_on('transactions', 'stock')
 def api_stock_alert():
     """Analyze inventory and predict stock-outs."""
+    return _analytics_view('stock_alert')
+
+@flask_app.route('/api/inventory/critical', methods=['GET'])
+@depends_on('transactions', 'stock')
+def api_inventory_critical():
+    """SKUs closest to stock-out: ?k=20&status=critical&service_level=0.95&lookback=56."""
     try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No data'}), 404
-        
-        df['date'] = pd.to_datetime(df['date'])
-        today = pd.Timestamp.now()
-        last_30_days = df[df['date'] >= (today - pd.Timedelta(days=30))]
-        
-        alerts = []
-        for product in df['product'].unique():
-            product_sales = last_30_days[last_30_days['product'] == product]
-            if len(product_sales) == 0:
-                continue
-            
-            # Calculate daily average sales
-            daily_avg = product_sales.groupby('date')['quantity'].sum().mean()
-            total_sold_30d = product_sales['quantity'].sum()
-            
-            # Assume 100 units current stock (can be made dynamic)
-            current_stock = 100
-            days_until_stockout = int(current_stock / daily_avg) if daily_avg > 0 else 999
-            reorder_point = int(daily_avg * 7)  # 1 week safety stock
-            
-            status = 'ok'
-            if days_until_stockout < 7:
-                status = 'critical'
-            elif days_until_stockout < 14:
-                status = 'warning'
-            
-            alerts.append({
-                'product': product,
-                'current_stock': current_stock,
-                'daily_avg_sales': round(daily_avg, 2),
-                'days_until_stockout': days_until_stockout,
-                'reorder_point': reorder_point,
-                'status': status,
-                'recommendation': f"অর্ডার দিন {reorder_point} ইউনিট" if status != 'ok' else 'স্টক ভালো আছে'
-            })
-        
-        return jsonify({'alerts': sorted(alerts, key=lambda x: x['days_until_stockout'])})
+        k = min(max(request.args.get('k', 20, type=int) or 20, 1), 1000)
+        status = request.args.get('status') or None
+        service_level = request.args.get('service_level', inventory.DEFAULT_SERVICE_LEVEL, type=float)
+        lookback = min(max(request.args.get('lookback', inventory.DEFAULT_LOOKBACK, type=int) or 1, 2), 365)
+        if not 0.5 <= service_level < 1:
+            return jsonify({'error': 'service_level must be in [0.5, 1)'}), 400
+        if status and status not in ('critical', 'warning', 'ok'):
+            return jsonify({'error': 'status must be critical, warning or ok'}), 400
+        prepared = analytics.get_prepared()
+        stats = prepared.memo(('demand', lookback),
+                              lambda: inventory.DemandStats(prepared.df, prepared.today, lookback))
+        table = inventory.plan(stats, inventory.load_stock(), service_level)
+        counts = table['status'].value_counts()
+        return jsonify({
+            'skus': inventory.to_records(inventory.top_critical(table, k, status)),
+            'total_skus': len(table),
+            'status_counts': {s: int(counts.get(s, 0)) for s in ('critical', 'warning', 'ok')},
+            'service_level': service_level,
+            'lookback_days': lookback,
+        })
+    except analytics.NoData as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@flask_app.route('/api/trends/analysis', methods=['GET'])
-def api_trends_analysis():
-    """Analyze sales trends by day and time."""
+@flask_app.route('/api/inventory/stock', methods=['GET', 'POST'])
+@depends_on('stock')
+def api_inventory_stock():
+    """GET the stock table; POST {"items": [{"product_name", "current_stock", "lead_time_days"?, "category"?}]}."""
     try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No data'}), 404
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df['day_of_week'] = df['date'].dt.day_name()
-        df['total_amount'] = df['quantity'] * df['price']
-        
-        # Best selling days
-        day_sales = df.groupby('day_of_week')['total_amount'].sum().to_dict()
-        best_day = max(day_sales.items(), key=lambda x: x[1])
-        
-        # Weekly pattern
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        weekly_pattern = [{'day': day, 'revenue': float(day_sales.get(day, 0))} for day in days_order]
-        
-        # Month-over-month growth
-        df['month'] = df['date'].dt.to_period('M')
-        monthly_revenue = df.groupby('month')['total_amount'].sum()
-        if len(monthly_revenue) >= 2:
-            latest_month = monthly_revenue.iloc[-1]
-            prev_month = monthly_revenue.iloc[-2]
-            mom_growth = ((latest_month - prev_month) / prev_month * 100) if prev_month > 0 else 0
-        else:
-            mom_growth = 0
-        
-        return jsonify({
-            'best_day': {'name': best_day[0], 'revenue': float(best_day[1])},
-            'weekly_pattern': weekly_pattern,
-            'mom_growth': round(mom_growth, 2),
-            'recommendation': f"{best_day[0]} তে বেশি প্রচার চালান - সবচেয়ে বেশি বিক্রয় হয়!"
-        })
+        if request.method == 'GET':
+            stock = inventory.load_stock()
+            return jsonify({'stock': json.loads(stock.to_json(orient='records'))})
+        data = request.get_json(silent=True) or {}
+        items = data.get('items') if isinstance(data, dict) else data
+        if isinstance(data, dict) and items is None and 'product_name' in data:
+            items = [data]
+        if not items:
+            return jsonify({'error': 'No stock items provided'}), 400
+        try:
+            updated = inventory.upsert_stock(items)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid stock item: {e}'}), 400
+        return jsonify({'updated': updated})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@flask_app.route('/api/trends/analysis', methods=['GET'])
+@depends_on('transactions')
+def api_trends_analysis():
+    """Analyze sales trends by day and time; ?format= applies to weekly_pattern."""
+    return _analytics_view('trends', table='weekly_pattern')
+
 @flask_app.route('/api/customer/insights', methods=['GET'])
+@depends_on('transactions')
 def api_customer_insights():
     """Customer RFM analysis and lifetime value."""
+    return _analytics_view('customer_insights')
+
+@flask_app.route('/api/customers', methods=['GET'])
+@depends_on('transactions')
+def api_customers():
+    """Paginated customer list with RFM scores: ?segment=at_risk&page=1&page_size=50&sort=monetary."""
     try:
-        df = load_data('transactions')
-        if df is None or df.empty or 'user_id' not in df.columns:
+        segment = request.args.get('segment') or None
+        sort = request.args.get('sort', 'monetary')
+        page = request.args.get('page', 1, type=int)
+        page_size = request.args.get('page_size', 50, type=int)
+        if segment and segment not in customers.SEGMENTS:
+            return jsonify({'error': f"Unknown segment. Use one of: {', '.join(customers.SEGMENTS)}"}), 400
+        if sort not in customers.SORT_KEYS:
+            return jsonify({'error': f"sort must be one of: {', '.join(customers.SORT_KEYS)}"}), 400
+        page = max(page or 1, 1)
+        page_size = min(max(page_size or 50, 1), 500)
+        engine = customers.get_table()
+        if engine.table is None or engine.table.empty:
             return jsonify({'error': 'No customer data'}), 404
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df['total_amount'] = df['quantity'] * df['price']
-        today = pd.Timestamp.now()
-        
-        # RFM Analysis
-        rfm = df.groupby('user_id').agg({
-            'date': lambda x: (today - x.max()).days,  # Recency
-            'transaction_id': 'count',  # Frequency
-            'total_amount': 'sum'  # Monetary
-        }).rename(columns={'date': 'recency', 'transaction_id': 'frequency', 'total_amount': 'monetary'})
-        
-        # Top 5 customers by value
-        top_customers = rfm.nlargest(5, 'monetary')
-        top_list = [{'customer_id': int(idx), 'total_spent': float(row['monetary']), 'orders': int(row['frequency'])} 
-                    for idx, row in top_customers.iterrows()]
-        
-        # Average customer lifetime value
-        avg_ltv = float(rfm['monetary'].mean())
-        
-        # Churn risk (customers who haven't bought in 60+ days)
-        at_risk = len(rfm[rfm['recency'] > 60])
-        
-        return jsonify({
-            'total_customers': len(rfm),
-            'top_customers': top_list,
-            'avg_ltv': round(avg_ltv, 2),
-            'at_risk_customers': at_risk,
-            'recommendation': f"{at_risk} জন ক্রেতা ঝুঁকিতে আছে - তাদের জন্য বিশেষ অফার দিন!"
-        })
+        result = engine.page(segment, page, page_size, sort)
+        result['segments'] = engine.segment_counts()
+        result['segment_labels'] = customers.SEGMENT_LABELS_BN
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@flask_app.route('/api/profit/analysis', methods=['GET'])
-def api_profit_analysis():
-    """Calculate profit margins for products."""
+@flask_app.route('/api/customers/cohorts', methods=['GET'])
+@depends_on('transactions')
+def api_customer_cohorts():
+    """Cohort retention / revenue / cumulative LTV matrix: ?months=12 (max 60)."""
     try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No data'}), 404
-        
-        # Assume 30% cost (can be made dynamic)
-        cost_margin = 0.70
-        
-        df['total_amount'] = df['quantity'] * df['price']
-        df['cost'] = df['total_amount'] * cost_margin
-        df['profit'] = df['total_amount'] - df['cost']
-        
-        # Profit by product
-        product_profit = df.groupby('product').agg({
-            'total_amount': 'sum',
-            'cost': 'sum',
-            'profit': 'sum',
-            'quantity': 'sum'
-        }).reset_index()
-        
-        product_profit['profit_margin'] = (product_profit['profit'] / product_profit['total_amount'] * 100)
-        
-        # Most profitable products
-        top_profit = product_profit.nlargest(5, 'profit')
-        profit_list = [{'product': row['product'], 
-                        'revenue': float(row['total_amount']), 
-                        'profit': float(row['profit']),
-                        'margin': round(row['profit_margin'], 2)}
-                       for _, row in top_profit.iterrows()]
-        
-        total_profit = float(df['profit'].sum())
-        total_margin = (total_profit / df['total_amount'].sum() * 100)
-        
-        best_margin_product = product_profit.loc[product_profit['profit_margin'].idxmax()]
-        
-        return jsonify({
-            'total_profit': round(total_profit, 2),
-            'profit_margin': round(total_margin, 2),
-            'top_profitable': profit_list,
-            'best_margin_product': {
-                'name': best_margin_product['product'],
-                'margin': round(best_margin_product['profit_margin'], 2)
-            },
-            'recommendation': f"{best_margin_product['product']} সবচেয়ে লাভজনক - এটি বেশি প্রচার করুন!"
-        })
+        months = min(max(request.args.get('months', 12, type=int) or 12, 1), 60)
+        prepared = analytics.get_prepared()
+        if not prepared.has_users:
+            return jsonify({'error': 'No customer data'}), 404
+        result = prepared.memo(('cohorts', months), lambda: customers.cohort_matrix(prepared.df, months))
+        if result is None:
+            return jsonify({'error': 'No customer data'}), 404
+        return jsonify(result)
+    except analytics.NoData as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@flask_app.route('/api/profit/analysis', methods=['GET'])
+@depends_on('transactions')
+def api_profit_analysis():
+    """Calculate profit margins for products."""
+    return _analytics_view('profit')
+
 @flask_app.route('/api/seasonal/predictor', methods=['GET'])
+@depends_on('transactions')
 def api_seasonal_predictor():
     """Detect seasonal patterns for Bangladesh market."""
-    try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No data'}), 404
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df['month'] = df['date'].dt.month
-        df['total_amount'] = df['quantity'] * df['price']
-        
-        # Month-wise revenue
-        monthly = df.groupby('month')['total_amount'].sum().to_dict()
-        
-        # Identify peak months
-        peak_month = max(monthly.items(), key=lambda x: x[1])
-        
-        # Bangladesh-specific seasons
-        month_names = {1: 'জানুয়ারি', 2: 'ফেব্রুয়ারি', 3: 'মার্চ (রমজান)', 4: 'এপ্রিল (ঈদ)', 
-                      5: 'মে', 6: 'জুন', 7: 'জুলাই', 8: 'আগস্ট', 9: 'সেপ্টেম্বর', 
-                      10: 'অক্টোবর', 11: 'নভেম্বর (শীত)', 12: 'ডিসেম্বর (শীত)'}
-        
-        # Ramadan/Eid products (March-May surge)
-        eid_months = df[df['month'].isin([3, 4, 5])]
-        eid_top_products = eid_months.groupby('product')['total_amount'].sum().nlargest(3)
-        
-        # Winter products (Nov-Feb surge)
-        winter_months = df[df['month'].isin([11, 12, 1, 2])]
-        winter_top_products = winter_months.groupby('product')['total_amount'].sum().nlargest(3)
-        
-        # Current month prediction
-        current_month = pd.Timestamp.now().month
-        upcoming_season = ""
-        if current_month in [2, 3]:
-            upcoming_season = "রমজান আসছে - খাদ্য ও পোশাক স্টক বাড়ান"
-        elif current_month in [3, 4]:
-            upcoming_season = "ঈদ আসছে - পোশাক, প্রসাধনী, খেলনা স্টক বাড়ান"
-        elif current_month in [10, 11]:
-            upcoming_season = "শীত আসছে - ইলেকট্রনিক্স, পোশাক স্টক বাড়ান"
-        else:
-            upcoming_season = "স্বাভাবিক মৌসুম - নিয়মিত স্টক বজায় রাখুন"
-        
-        return jsonify({
-            'peak_month': {'month': peak_month[0], 'name': month_names.get(peak_month[0]), 'revenue': float(peak_month[1])},
-            'eid_top_products': [{'product': k, 'revenue': float(v)} for k, v in eid_top_products.items()],
-            'winter_top_products': [{'product': k, 'revenue': float(v)} for k, v in winter_top_products.items()],
-            'upcoming_season': upcoming_season,
-            'recommendation': upcoming_season
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return _analytics_view('seasonal')
 
 @flask_app.route('/api/marketing/planner', methods=['GET'])
+@depends_on('transactions')
 def api_marketing_planner():
     """Marketing campaign recommendations."""
-    try:
-        df = load_data('transactions')
-        if df is None or df.empty:
-            return jsonify({'error': 'No data'}), 404
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df['day_of_week'] = df['date'].dt.dayofweek  # 0=Monday, 6=Sunday
-        df['total_amount'] = df['quantity'] * df['price']
-        
-        # Best campaign days (Friday-Saturday বেশি বিক্রয়)
-        day_performance = df.groupby('day_of_week')['total_amount'].mean()
-        best_campaign_day = day_performance.idxmax()
-        day_names = ['সোমবার', 'মঙ্গলবার', 'বুধবার', 'বৃহস্পতিবার', 'শুক্রবার', 'শনিবার', 'রবিবার']
-        
-        # Products that need promotion (low recent sales)
-        today = pd.Timestamp.now()
-        recent = df[df['date'] >= (today - pd.Timedelta(days=30))]
-        old = df[(df['date'] >= (today - pd.Timedelta(days=60))) & (df['date'] < (today - pd.Timedelta(days=30)))]
-        
-        recent_sales = recent.groupby('product')['total_amount'].sum()
-        old_sales = old.groupby('product')['total_amount'].sum()
-        
-        declining = []
-        for product in df['product'].unique():
-            r = recent_sales.get(product, 0)
-            o = old_sales.get(product, 1)
-            if r < o:
-                decline_pct = ((o - r) / o * 100) if o > 0 else 0
-                declining.append({'product': product, 'decline': round(decline_pct, 2)})
-        
-        declining = sorted(declining, key=lambda x: x['decline'], reverse=True)[:3]
-        
-        # Discount strategy
-        discount_candidates = [item['product'] for item in declining]
-        
-        return jsonify({
-            'best_campaign_day': day_names[best_campaign_day],
-            'declining_products': declining,
-            'discount_recommendations': discount_candidates,
-            'recommended_discount': '15-20%',
-            'recommendation': f"{day_names[best_campaign_day]} তে ক্যাম্পেইন চালান এবং {', '.join(discount_candidates[:2])} এ ডিসকাউন্ট দিন"
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return _analytics_view('marketing')
 
 @flask_app.route('/api/compare', methods=['GET'])
+@depends_on('transactions')
 def api_compare():
     """Compare multiple products."""
     try:
         products_param = request.args.get('products', 'clothing,electronics')
         products = [p.strip() for p in products_param.split(',')]
         
-        df = load_data('transactions')
+        res = olap.run_query({
+            'group': ['product'],
+            'measures': ['units', 'avg_price', 'lines', 'avg_quantity'],
+            'filters': {'product': products},
+            'sort': 'product',
+        })
         comparison = {}
-        
-        for product in products:
-            product_data = df[df['product'] == product]
-            if not product_data.empty:
-                comparison[product] = {
-                    'total_sales': int(product_data['quantity'].sum()),
-                    'avg_price': float(product_data['price'].mean()),
-                    'transaction_count': len(product_data),
-                    'avg_quantity': float(product_data['quantity'].mean())
-                }
+        for product, units, avg_price, lines, avg_quantity in res['rows']:
+            comparison[product] = {
+                'total_sales': int(units or 0),
+                'avg_price': float(avg_price or 0),
+                'transaction_count': int(lines),
+                'avg_quantity': float(avg_quantity or 0)
+            }
         
         return jsonify({'comparison': comparison})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@flask_app.route('/api/chat', methods=['GET','POST'])
-def api_chat():
+@flask_app.route('/api/approx/summary', methods=['GET'])
+@depends_on('transactions')
+def api_approx_summary():
+    """Sketch-based summary: distinct users (?product=&start=&end=), top SKUs (?k=) and quantiles."""
+    try:
+        product = request.args.get('product') or None
+        start = request.args.get('start') or None
+        end = request.args.get('end') or None
+        k = min(max(request.args.get('k', 10, type=int) or 10, 1), sketches.TOP_K)
+        sk = sketches.get_store()
+        return jsonify({
+            'distinct_users': sk.distinct_users(product, start, end),
+            'distinct_orders': sk.distinct_orders(),
+            'top_skus_by_revenue': [{'name': n, 'revenue': round(v, 2)} for n, v in sk.sku_revenue.top(k)],
+            'top_skus_by_units': [{'name': n, 'units': round(v, 2)} for n, v in sk.sku_units.top(k)],
+            'quantiles': sk.quantiles(),
+            'rows': sk.rows,
+            'error_bounds': sk.error_bounds(),
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@flask_app.route('/api/query', methods=['GET', 'POST'])
+@depends_on('transactions')
+def api_query():
+    """Ad hoc aggregation over transactions, run in SQLite (see olap.py).
+
+    GET  /api/query?group=category,month&measures=revenue,units&product=clothing&start=2024-01-01&sort=-revenue&limit=100
+    POST {"group": [...], "measures": [...], "filters": {"product": [...]}, "start": ..., "end": ..., "sort": ..., "limit": ...}
+    """
+    try:
+        if request.method == 'POST':
+            q = request.get_json(silent=True)
+            if not isinstance(q, dict):
+                return jsonify({'error': 'Expected a JSON object'}), 400
+        else:
+            q = olap.query_from_args(request.args)
+        return jsonify(olap.run_query(q))
+    except olap.QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({'error': 'No transaction data available'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _chat_request():
+    """Parse a chat request and build its token-budgeted prompt.
+
+    Returns (question, final_prompt, lang, ctx) where `ctx` is the context text
+    actually sent, which also keys the response cache.
+    """
     prompt = None
     lang = 'en'
     if request.method == 'POST':
@@ -643,31 +661,31 @@ def api_chat():
     if not prompt:
         prompt = request.args.get('prompt', '')
         lang = request.args.get('lang', 'en')
-    
+
     # Optionally include dashboard context to ground answers
     product = request.args.get('product', None)
     include_ctx = request.args.get('include_context', 'true').lower() != 'false'
-    ctx = ''
+    sections = []
     if include_ctx:
         try:
-            ctx = gather_dashboard_context(product or 'clothing')
+            sections = gather_dashboard_sections(product or 'clothing')
         except Exception:
-            ctx = ''
+            sections = []
+    final_prompt = build_chat_prompt(prompt, sections, lang=lang)
+    ctx = final_prompt[len(prompt):] if final_prompt != prompt else ''
+    return prompt, final_prompt, lang, ctx
 
-    final_prompt = prompt
-    if ctx:
-        if lang == 'bn':
-            final_prompt = f"{prompt}\n\nড্যাশবোর্ড প্রসঙ্গ:\n{ctx}\n\nঅনুগ্রহ করে একজন ব্যবসা পরামর্শদাতা হিসেবে উত্তর দিন, প্রাসঙ্গিক হলে ড্যাশবোর্ডের মান উল্লেখ করুন এবং স্পষ্ট পরামর্শ ও পরবর্তী পদক্ষেপ প্রদান করুন। বাংলায় উত্তর দিন।"
-        else:
-            final_prompt = f"{prompt}\n\nDashboard context:\n{ctx}\n\nPlease answer as a business advisor, referencing the dashboard values when relevant, and provide clear suggestions and next steps."
+@flask_app.route('/api/chat', methods=['GET','POST'])
+def api_chat():
+    prompt, final_prompt, lang, ctx = _chat_request()
 
     model = get_llm()
     try:
         if model is None:
             # Fall back to generate_insight which handles dummy LLMs if possible
-            resp = generate_insight(None, final_prompt, lang=lang)
+            resp = generate_insight(None, final_prompt, lang=lang, question=prompt, context=ctx)
         else:
-            resp = generate_insight(model, final_prompt, lang=lang)
+            resp = generate_insight(model, final_prompt, lang=lang, question=prompt, context=ctx)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     return jsonify({'response': resp})
@@ -676,46 +694,39 @@ def api_chat():
 @flask_app.route('/api/chat/stream', methods=['POST','GET'])
 def api_chat_stream():
     # Streamed chat endpoint: returns a text/plain streamed body with incremental chunks
-    prompt = None
-    lang = 'en'
-    if request.method == 'POST':
-        data = request.get_json(silent=True) or {}
-        prompt = data.get('prompt')
-        lang = data.get('lang', 'en')
-    if not prompt:
-        prompt = request.args.get('prompt', '')
-        lang = request.args.get('lang', 'en')
-    
-    product = request.args.get('product', None)
-    include_ctx = request.args.get('include_context', 'true').lower() != 'false'
-    ctx = ''
-    if include_ctx:
-        try:
-            ctx = gather_dashboard_context(product or 'clothing')
-        except Exception:
-            ctx = ''
-    
-    final_prompt = prompt
-    if ctx:
-        if lang == 'bn':
-            final_prompt = f"{prompt}\n\nড্যাশবোর্ড প্রসঙ্গ:\n{ctx}\n\nঅনুগ্রহ করে একজন ব্যবসা পরামর্শদাতা হিসেবে উত্তর দিন, প্রাসঙ্গিক হলে ড্যাশবোর্ডের মান উল্লেখ করুন এবং স্পষ্ট পরামর্শ ও পরবর্তী পদক্ষেপ প্রদান করুন। সব উত্তর বাংলায় দিন।"
-        else:
-            final_prompt = f"{prompt}\n\nDashboard context:\n{ctx}\n\nPlease answer as a business advisor, referencing the dashboard values when relevant, and provide clear suggestions and next steps."
+    prompt, final_prompt, lang, ctx = _chat_request()
 
     model = get_llm()
+    # `?format=sse` (or an EventSource-style Accept header) switches the body to
+    # Server-Sent Events; the default stays raw text for the existing UI reader.
+    use_sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
 
     def gen():
         try:
             # Use streaming generator from llm.py
-            for chunk in generate_insight_stream(model, final_prompt):
+            for chunk in generate_insight_stream(model, final_prompt, lang=lang, question=prompt, context=ctx):
                 if chunk is None:
                     continue
                 # Ensure we send utf-8 text chunks
-                yield chunk
+                if use_sse:
+                    yield 'data: ' + json.dumps({'text': chunk}, ensure_ascii=False) + '\n\n'
+                else:
+                    yield chunk
+            if use_sse:
+                yield 'data: [DONE]\n\n'
         except Exception as e:
-            yield f"ERROR: {e}"
-
-    return Response(gen(), mimetype='text/plain; charset=utf-8')
+            yield f"data: {json.dumps({'error': str(e)})}\n\n" if use_sse else f"ERROR: {e}"
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    mimetype = 'text/event-stream; charset=utf-8' if use_sse else 'text/plain; charset=utf-8'
+    return Response(gen(), mimetype=mimetype, headers=headers)
+
+@flask_app.route('/api/llm/status', methods=['GET'])
+def api_llm_status():
+    """Per-route latency/error/circuit-breaker state, response cache stats and local model status."""
+    from llm_router import get_router
+    from llm_cache import get_cache
+    return jsonify({'router': get_router().snapshot(), 'cache': get_cache().stats(), 'local': _local_llm.status()})
 
 @flask_app.route('/', methods=['GET'])
 def index():
@@ -0,0 +1,82 @@
+# File: bench_catalog_search.py
+# Typeahead latency of catalog.SearchIndex over a synthetic catalog.
+#
+#   python bench_catalog_search.py                    # 100k products
+#   python bench_catalog_search.py --products 250000 --repeat 50
+#
+# Builds the index in memory (no database) from names made of brand/model
+# words plus Bengali category labels, then times keystroke-by-keystroke
+# prefixes, multi-word queries and misspellings. The first lookup of a
+# prefix fills the memo, so both cold and warm p50/p99 are reported.
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+import catalog
+
+BRANDS = ['Samsung', 'Xiaomi', 'Realme', 'Walton', 'Symphony', 'Apex', 'Bata', 'Aarong', 'Pran', 'Radhuni',
+          'Lotto', 'Yellow', 'Singer', 'Vision', 'Marcel', 'Minister', 'Square', 'ACI', 'Fresh', 'Teer']
+WORDS = ['Galaxy', 'Cotton', 'Shirt', 'Premium', 'Rice', 'Oil', 'Smart', 'Watch', 'Mat', 'Yoga', 'Kurti',
+         'Saree', 'Speaker', 'Wireless', 'Mixer', 'Blender', 'Tea', 'Honey', 'Lipstick', 'Doll', 'Bench']
+QUERIES = ['s', 'sa', 'sam', 'samsung g', 'samsung gal', 'cot sh', 'premium rice', 'মোবাইল', 'খেল',
+           'samsng', 'wireles speker', 'yoga']
+
+
+def synthetic_products(n, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = list(catalog.CATEGORY_LABELS_BN)
+    names = [f'{BRANDS[a]} {WORDS[b]} {WORDS[c]} {m}' for a, b, c, m in zip(
+        rng.integers(0, len(BRANDS), n), rng.integers(0, len(WORDS), n),
+        rng.integers(0, len(WORDS), n), np.arange(n))]
+    price = rng.lognormal(7, 1.2, n).round(2)
+    return pd.DataFrame({
+        'product_id': np.arange(1, n + 1),
+        'product_name': names,
+        'name_bn': None,
+        'category': rng.choice(categories, n),
+        'price': price,
+        'price_band': [catalog.price_band(p) for p in price],
+        'units_sold': rng.integers(0, 5000, n),
+    })
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def time_queries(index, queries, repeat):
+    cold, warm = [], []
+    for q in queries:
+        for prefix in [q[:i] for i in range(1, len(q) + 1)]:
+            t0 = time.perf_counter()
+            index.search(prefix, 10)
+            cold.append((time.perf_counter() - t0) * 1000)
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                index.search(prefix, 10)
+                warm.append((time.perf_counter() - t0) * 1000)
+    return cold, warm
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Benchmark catalog typeahead search')
+    ap.add_argument('--products', type=int, default=100000)
+    ap.add_argument('--repeat', type=int, default=20, help='warm repetitions per prefix')
+    args = ap.parse_args()
+
+    df = synthetic_products(args.products)
+    t0 = time.perf_counter()
+    index = catalog.SearchIndex(df)
+    print(f'index build: {len(index):,} products in {time.perf_counter() - t0:.2f} s')
+    cold, warm = time_queries(index, QUERIES, args.repeat)
+    for name, values in (('cold', cold), ('warm', warm)):
+        print(f'{name}: n={len(values):>6,}  p50 {statistics.median(values):.3f} ms'
+              f'  p99 {percentile(values, 99):.3f} ms  max {max(values):.3f} ms')
+    for q in ('samsung gal', 'samsng', 'মোবাইল'):
+        top = index.search(q, 3)
+        print(f'{q!r:16} -> ' + ', '.join(f"{r['name']} ({r['match']})" for r in top))
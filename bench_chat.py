@@ -0,0 +1,123 @@
+# File: bench_chat.py
+# Chat latency benchmark against the local mock LLM server.
+#
+#   python bench_chat.py                          # in-process app + mock, 8 concurrent, 64 requests
+#   python bench_chat.py -c 32 -n 256 --latency 0.5 --token-rate 30 --fail-rate 0.05
+#   python bench_chat.py --target http://127.0.0.1:5000 --mock http://127.0.0.1:8765
+#
+# Without --target the Flask app is started in-process on a free port with its
+# Gemini/OpenAI URLs pointed at the mock (GEMINI_API_URL, GEMINI_STREAM_URL,
+# OPENAI_BASE_URL). With --target, start the app yourself with those variables
+# (mock_llm_server.py prints them). Reports p50/p95/p99 total latency for
+# /api/chat and /api/chat/stream, plus time-to-first-token for the stream.
+
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def start_app():
+    from werkzeug.serving import make_server
+    from app import flask_app
+    srv = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f'http://127.0.0.1:{srv.server_port}'
+
+
+def one_request(session, base, stream, i, args):
+    params = {'include_context': 'true' if args.context else 'false', 'product': 'clothing'}
+    # Distinct prompts so the response cache cannot hide upstream latency
+    body = {'prompt': f'Why restock clothing? #{i}' if not args.same_prompt else 'Why restock clothing?'}
+    t0 = time.perf_counter()
+    ttft = None
+    if stream:
+        with session.post(base + '/api/chat/stream', params=params, json=body, stream=True, timeout=120) as r:
+            ok = r.status_code == 200
+            for chunk in r.iter_content(chunk_size=None):
+                if chunk and ttft is None:
+                    ttft = time.perf_counter() - t0
+    else:
+        r = session.post(base + '/api/chat', params=params, json=body, timeout=120)
+        ok = r.status_code == 200
+    return ok, time.perf_counter() - t0, ttft
+
+
+def run(base, stream, args):
+    import requests
+    local = threading.local()
+
+    def task(i):
+        if not hasattr(local, 's'):
+            local.s = requests.Session()
+        return one_request(local.s, base, stream, i, args)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(task, range(args.requests)))
+    wall = time.perf_counter() - t0
+    lat = [r[1] for r in results if r[0]]
+    ttft = [r[2] for r in results if r[0] and r[2] is not None]
+    errors = sum(1 for r in results if not r[0])
+    name = '/api/chat/stream' if stream else '/api/chat'
+    ms = lambda v: f'{v * 1000:8.1f}'
+    print(f'{name:17s} ok={len(lat):4d} err={errors:3d} rps={len(results) / wall:6.1f} '
+          f'p50={ms(percentile(lat, 50))} p95={ms(percentile(lat, 95))} p99={ms(percentile(lat, 99))} ms')
+    if stream and ttft:
+        print(f"{'  ttft':17s} {'':26s} p50={ms(percentile(ttft, 50))} p95={ms(percentile(ttft, 95))} "
+              f'p99={ms(percentile(ttft, 99))} ms  mean={statistics.mean(ttft) * 1000:.1f}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Chat endpoint latency benchmark')
+    ap.add_argument('-c', '--concurrency', type=int, default=8)
+    ap.add_argument('-n', '--requests', type=int, default=64)
+    ap.add_argument('--target', help='base URL of an already running app')
+    ap.add_argument('--mock', help='base URL of an already running mock_llm_server')
+    ap.add_argument('--latency', type=float, default=0.2)
+    ap.add_argument('--token-rate', type=float, default=50.0)
+    ap.add_argument('--fail-rate', type=float, default=0.0)
+    ap.add_argument('--backend', choices=['gemini', 'openai'], default='gemini')
+    ap.add_argument('--context', action='store_true', help='include dashboard context (needs the DB)')
+    ap.add_argument('--same-prompt', action='store_true', help='send identical prompts (exercises the cache)')
+    args = ap.parse_args()
+
+    mock_srv = None
+    mock = args.mock
+    if not mock:
+        from mock_llm_server import start_in_thread
+        mock_srv, mock = start_in_thread(latency=args.latency, token_rate=args.token_rate, fail_rate=args.fail_rate)
+
+    target = args.target
+    app_srv = None
+    if not target:
+        from mock_llm_server import env_for
+        env = env_for(mock)
+        if args.backend == 'openai':
+            env = {k: v for k, v in env.items() if not k.startswith('GEMINI')}
+            os.environ.pop('GEMINI_API_KEY', None)
+        os.environ.update(env)
+        os.environ.setdefault('LOCAL_LLM', 'false')
+        if not args.same_prompt:
+            os.environ.setdefault('LLM_CACHE', 'false')
+        app_srv, target = start_app()
+
+    print(f'target={target} mock={mock} concurrency={args.concurrency} requests={args.requests}')
+    run(target, False, args)
+    run(target, True, args)
+
+    if app_srv:
+        app_srv.shutdown()
+    if mock_srv:
+        mock_srv.shutdown()
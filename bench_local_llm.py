@@ -0,0 +1,65 @@
+# File: bench_local_llm.py
+# Tokens/sec of the local transformers pipeline at several batch sizes.
+#
+#   python bench_local_llm.py                     # fp32, batch 1/2/4/8
+#   python bench_local_llm.py --quantize          # dynamic int8 on CPU
+#   python bench_local_llm.py --batches 1,4,16 --new-tokens 64
+#
+# Each batch size sends that many concurrent prompts through
+# LocalInferenceService, so the numbers include micro-batching overhead.
+
+import argparse
+import threading
+import time
+
+from local_llm import LocalInferenceService
+
+
+PROMPTS = [
+    'Why should I restock clothing before Eid?',
+    'Give one pricing tip for electronics in winter.',
+    'How can a small shop reduce food waste?',
+    'Suggest a weekend promotion for toys.',
+]
+
+
+def run_batch(svc, n, new_tokens):
+    tok = svc._pipe.tokenizer
+    results = [None] * n
+
+    def worker(i):
+        prompt = PROMPTS[i % len(PROMPTS)]
+        out = svc(prompt, max_new_tokens=new_tokens)[0]['generated_text']
+        results[i] = len(tok(out)['input_ids']) - len(tok(prompt)['input_ids'])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return sum(results), elapsed
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Local LLM throughput benchmark')
+    ap.add_argument('--batches', default='1,2,4,8')
+    ap.add_argument('--new-tokens', type=int, default=48)
+    ap.add_argument('--quantize', action='store_true')
+    args = ap.parse_args()
+
+    sizes = [int(b) for b in args.batches.split(',')]
+    svc = LocalInferenceService(quantize=args.quantize, max_batch=max(sizes), batch_wait_ms=50,
+                                 enabled=True)
+    t0 = time.perf_counter()
+    svc.start()
+    if not svc.wait_ready():
+        raise SystemExit(f'local model failed to load: {svc.error}')
+    print(f'loaded in {time.perf_counter() - t0:.1f}s (quantized={args.quantize})')
+
+    run_batch(svc, 1, 4)  # warm-up
+    print(f"{'batch':>5} {'tokens':>7} {'seconds':>8} {'tok/s':>8}")
+    for n in sizes:
+        tokens, elapsed = run_batch(svc, n, args.new_tokens)
+        print(f'{n:>5} {tokens:>7} {elapsed:>8.2f} {tokens / elapsed:>8.1f}')
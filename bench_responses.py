@@ -0,0 +1,89 @@
+# File: bench_responses.py
+# Serialization time and bytes on the wire for large time-series payloads.
+#
+#   python bench_responses.py                  # synthetic forecast + social series
+#   python bench_responses.py --rows 2000,20000 --repeat 20
+#
+# "before" is the old path: DataFrame.to_dict(orient='records') through the
+# stdlib json encoder (what Flask's default provider does), uncompressed.
+# "after" is responses.dumps_bytes() (orjson when installed) plus the
+# gzip/brotli step the after_request hook applies. "columns" is the
+# ?format=columns payload (parallel arrays), plus msgpack/arrow when installed.
+
+import argparse
+import gzip
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import responses
+
+
+def forecast_frame(n):
+    ds = pd.date_range('2020-01-01', periods=n, freq='D')
+    yhat = 50 + 10 * np.sin(np.arange(n) / 14) + np.random.default_rng(0).normal(0, 2, n)
+    return pd.DataFrame({'ds': ds, 'yhat': yhat, 'yhat_lower': yhat - 5, 'yhat_upper': yhat + 5})
+
+
+def social_frame(n):
+    dates = pd.date_range('2020-01-01', periods=n, freq='D').strftime('%Y-%m-%d')
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({'date': dates, 'product': 'clothing', 'sentiment': rng.uniform(-1, 1, n).round(4)})
+
+
+def _old_default(o):
+    if isinstance(o, pd.Timestamp):
+        return o.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(type(o))
+
+
+def encode_before(df):
+    return json.dumps(df.to_dict(orient='records'), default=_old_default).encode('utf-8')
+
+
+def encode_after(df):
+    return responses.dumps_bytes(df)
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def report(name, df, repeat):
+    before, t_before = timed(lambda: encode_before(df), repeat)
+    after, t_after = timed(lambda: encode_after(df), repeat)
+    gz, t_gz = timed(lambda: gzip.compress(after, compresslevel=responses.GZIP_LEVEL), repeat)
+    line = (f'{name:10s} rows={len(df):>7,}  before {len(before):>10,} B {t_before * 1000:7.2f} ms'
+            f' | after {len(after):>10,} B {t_after * 1000:7.2f} ms'
+            f' | gzip {len(gz):>9,} B +{t_gz * 1000:6.2f} ms')
+    if responses.BROTLI_AVAILABLE:
+        br, t_br = timed(lambda: responses.brotli.compress(after, quality=responses.BROTLI_QUALITY), repeat)
+        line += f' | br {len(br):>9,} B +{t_br * 1000:6.2f} ms'
+    print(line)
+    sizes = [f'columns {len(responses.dumps_bytes(responses.frame_columns(df))):>10,} B']
+    if responses.MSGPACK_AVAILABLE:
+        sizes.append(f'msgpack {len(responses.msgpack.packb(responses.frame_columns(df))):>10,} B')
+    if responses.ARROW_AVAILABLE:
+        sizes.append(f'arrow {len(responses._arrow_ipc(df)):>10,} B')
+    print(' ' * 10 + ' | '.join(sizes))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Benchmark JSON encoding and compression of series payloads')
+    ap.add_argument('--rows', default='365,5000,50000', help='comma-separated row counts')
+    ap.add_argument('--repeat', type=int, default=5, help='best of N runs')
+    args = ap.parse_args()
+    print(f'orjson: {responses.ORJSON_AVAILABLE}  brotli: {responses.BROTLI_AVAILABLE}')
+    for n in [int(x) for x in args.rows.split(',') if x.strip()]:
+        report('forecast', forecast_frame(n), args.repeat)
+        report('social', social_frame(n), args.repeat)
@@ -0,0 +1,365 @@
+# File: catalog.py
+# Product catalog: the `products` table, paginated listing and typeahead search.
+#
+# One row per SKU (product_name) with category, price range, price band and
+# units sold. generate_big_db.py seeds it from PRODUCT_CATALOG; other
+# databases are filled from the transactions table on first use
+# (ensure_catalog). Every write bumps the 'products' data version.
+#
+# SearchIndex is built in memory from the table and rebuilt when that
+# version changes. Each product's searchable text is its English name, the
+# optional Bengali name and the category in both languages. Two structures:
+#   - a sorted token list with parallel product ids: a prefix is a bisect
+#     range, so "sam gal" -> products with a token starting "sam" AND one
+#     starting "gal". Candidate lists per token prefix are memoized.
+#   - trigram postings, used when prefixes find fewer than `limit` results
+#     (typos, infixes): np.bincount of the query's trigram postings gives
+#     the shared-trigram count for every product in one pass.
+# Results are ordered by units sold, then name.
+
+import bisect
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_version
+import inventory
+from database import DB_PATH
+
+
+CATEGORY_LABELS_BN = {
+    'clothing': 'কাপড়-চোপড়',
+    'mobile': 'মোবাইল ফোন',
+    'home_exercise': 'হোম এক্সারসাইজ সরঞ্জাম',
+    'exercise_accessories': 'ব্যায়াম আনুষাঙ্গিক',
+    'electronics': 'ইলেকট্রনিক্স',
+    'food': 'খাদ্য পণ্য',
+    'cosmetics': 'প্রসাধনী',
+    'toys': 'খেলনা',
+}
+# (upper bound exclusive, band) on the typical price in BDT
+PRICE_BANDS = ((1000, 'budget'), (10000, 'mid'), (float('inf'), 'premium'))
+PRICE_BAND_LABELS_BN = {'budget': 'সাশ্রয়ী', 'mid': 'মাঝারি', 'premium': 'প্রিমিয়াম'}
+SORTS = {
+    'popular': 'p.units_sold DESC, p.product_name',
+    'name': 'p.product_name',
+    'price': 'p.price, p.product_name',
+    '-price': 'p.price DESC, p.product_name',
+}
+CURRENCY = 'BDT'
+MIN_FUZZY_CHARS = 3
+PREFIX_CACHE_SIZE = 4096
+# Unicode categories treated as separators: punctuation, symbols, spaces, controls
+_SEPARATORS = 'PSZC'
+
+
+def ensure_products_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS products (
+        product_id INTEGER PRIMARY KEY,
+        product_name TEXT NOT NULL UNIQUE,
+        name_bn TEXT,
+        category TEXT,
+        price REAL,
+        price_min REAL,
+        price_max REAL,
+        price_band TEXT,
+        units_sold INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)')
+
+
+def price_band(price):
+    if price is None:
+        return None
+    for bound, band in PRICE_BANDS:
+        if price < bound:
+            return band
+    return PRICE_BANDS[-1][1]
+
+
+def upsert_products(rows, db_path=None, conn=None):
+    """Insert or update products: dicts with product_name[, name_bn, category, price, price_min, price_max, units_sold]."""
+    now = datetime.now().isoformat(timespec='seconds')
+    values = []
+    for r in rows:
+        name = str(r['product_name']).strip()
+        if not name:
+            raise ValueError('product_name is required')
+        price = float(r['price']) if r.get('price') is not None else None
+        values.append((name, r.get('name_bn'), r.get('category'), price,
+                       r.get('price_min', price), r.get('price_max', price), price_band(price),
+                       int(r.get('units_sold') or 0), now))
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_products_table(conn)
+        conn.executemany('''INSERT INTO products
+            (product_name, name_bn, category, price, price_min, price_max, price_band, units_sold, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_name) DO UPDATE SET
+                name_bn = COALESCE(excluded.name_bn, products.name_bn),
+                category = COALESCE(excluded.category, products.category),
+                price = COALESCE(excluded.price, products.price),
+                price_min = COALESCE(excluded.price_min, products.price_min),
+                price_max = COALESCE(excluded.price_max, products.price_max),
+                price_band = COALESCE(excluded.price_band, products.price_band),
+                units_sold = CASE WHEN excluded.units_sold > 0 THEN excluded.units_sold ELSE products.units_sold END,
+                updated_at = excluded.updated_at''', values)
+        data_version.bump('products', conn)
+    finally:
+        if own:
+            conn.close()
+    return len(values)
+
+
+def _transaction_columns(conn):
+    return {row[1] for row in conn.execute('PRAGMA table_info(transactions)')}
+
+
+def sync_from_transactions(db_path=None, replace=False):
+    """(Re)build products from the SKUs seen in transactions; returns the number of products."""
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        cols = _transaction_columns(conn)
+        if not cols:
+            return 0
+        name = 'COALESCE(product_name, product)' if 'product_name' in cols else 'product'
+        category = 'category' if 'category' in cols else 'product'
+        rows = conn.execute(f'''SELECT {name}, MAX({category}), AVG(price), MIN(price), MAX(price), SUM(quantity)
+            FROM transactions WHERE {name} IS NOT NULL GROUP BY {name}''').fetchall()
+        ensure_products_table(conn)
+        if replace:
+            conn.execute('DELETE FROM products')
+        items = [{'product_name': n, 'category': c, 'price': round(p, 2) if p is not None else None,
+                  'price_min': lo, 'price_max': hi, 'units_sold': u} for n, c, p, lo, hi, u in rows]
+        return upsert_products(items, conn=conn) if items or replace else 0
+    finally:
+        conn.close()
+
+
+def seed_catalog(catalog, db_path=None):
+    """Replace products with a {category: [{'name', 'price', 'variation'[, 'name_bn']}]} catalog.
+
+    Units sold are taken from the transactions already in the database.
+    """
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        units = {}
+        if 'product_name' in _transaction_columns(conn):
+            units = dict(conn.execute('SELECT product_name, SUM(quantity) FROM transactions GROUP BY product_name'))
+        ensure_products_table(conn)
+        conn.execute('DELETE FROM products')
+        items = [{'product_name': p['name'], 'name_bn': p.get('name_bn'), 'category': category,
+                  'price': p['price'], 'price_min': p['price'] - p.get('variation', 0),
+                  'price_max': p['price'] + p.get('variation', 0), 'units_sold': units.get(p['name'], 0)}
+                 for category, entries in catalog.items() for p in entries]
+        return upsert_products(items, conn=conn)
+    finally:
+        conn.close()
+
+
+def ensure_catalog(db_path=None):
+    """Fill an empty products table from transactions (databases that were never seeded)."""
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_products_table(conn)
+        empty = conn.execute('SELECT NOT EXISTS (SELECT 1 FROM products)').fetchone()[0]
+    finally:
+        conn.close()
+    if empty:
+        sync_from_transactions(db_path)
+
+
+def load_products(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_products_table(conn)
+        return pd.read_sql('''SELECT product_id, product_name, name_bn, category, price, price_band, units_sold
+            FROM products''', conn)
+    finally:
+        conn.close()
+
+
+def list_products(page=1, page_size=50, category=None, band=None, sort='popular', db_path=None):
+    """One page of the catalog joined with current stock -> dict(products, page, page_size, total)."""
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SORTS)}")
+    ensure_catalog(db_path)
+    where, params = [], []
+    if category:
+        where.append('p.category = ?')
+        params.append(category)
+    if band:
+        where.append('p.price_band = ?')
+        params.append(band)
+    clause = f"WHERE {' AND '.join(where)}" if where else ''
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        inventory.ensure_stock_table(conn)
+        total = conn.execute(f'SELECT COUNT(*) FROM products p {clause}', params).fetchone()[0]
+        rows = conn.execute(f'''SELECT p.product_id, p.product_name, p.name_bn, p.category, p.price,
+                p.price_min, p.price_max, p.price_band, p.units_sold, s.current_stock
+            FROM products p LEFT JOIN stock s ON s.product_name = p.product_name
+            {clause} ORDER BY {SORTS[sort]} LIMIT ? OFFSET ?''',
+                            params + [page_size, (page - 1) * page_size]).fetchall()
+    finally:
+        conn.close()
+    products = [{
+        'id': pid, 'name': name, 'name_bn': name_bn, 'category': cat,
+        'category_bn': CATEGORY_LABELS_BN.get(cat), 'price': price, 'price_min': lo, 'price_max': hi,
+        'price_band': pb, 'currency': CURRENCY, 'units_sold': units, 'stock': stock,
+    } for pid, name, name_bn, cat, price, lo, hi, pb, units, stock in rows]
+    return {'products': products, 'page': page, 'page_size': page_size, 'total': total}
+
+
+def normalize(text):
+    """NFKC + casefold, punctuation -> spaces.
+
+    Separators are chosen by Unicode category rather than \\w, which would
+    split Bengali words at their vowel signs.
+    """
+    text = unicodedata.normalize('NFKC', str(text or '')).casefold()
+    return ''.join(' ' if unicodedata.category(ch)[0] in _SEPARATORS else ch for ch in text).strip()
+
+
+def tokenize(text):
+    return normalize(text).split()
+
+
+def trigrams(text):
+    grams = set()
+    for token in tokenize(text):
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """Prefix + trigram index over a products frame (see module comment)."""
+
+    def __init__(self, products):
+        self.products = products.reset_index(drop=True)
+        df = self.products
+        n = len(df)
+        texts = [' '.join(filter(None, (name, name_bn, cat, CATEGORY_LABELS_BN.get(cat))))
+                 for name, name_bn, cat in zip(df['product_name'], df['name_bn'], df['category'])]
+
+        pairs = sorted({(tok, i) for i, text in enumerate(texts) for tok in tokenize(text)})
+        self._tokens = [t for t, _ in pairs]
+        self._ids = np.fromiter((i for _, i in pairs), dtype=np.int64, count=len(pairs))
+
+        postings = {}
+        for i, text in enumerate(texts):
+            for g in trigrams(text):
+                postings.setdefault(g, []).append(i)
+        self._trigrams = {g: np.asarray(ids, dtype=np.int64) for g, ids in postings.items()}
+
+        # rank[i] = position of product i in (units sold desc, name) order
+        units = df['units_sold'].fillna(0).to_numpy(dtype=np.int64)
+        order = np.lexsort((df['product_name'].str.casefold().to_numpy(dtype=str), -units))
+        self._rank = np.empty(n, dtype=np.int64)
+        self._rank[order] = np.arange(n)
+        self._category = df['category'].to_numpy(dtype=object)
+        self._prefix_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    def _by_rank(self, ids):
+        return ids[np.argsort(self._rank[ids], kind='stable')]
+
+    def _prefix(self, token):
+        """Product ids having a token that starts with `token`, best ranked first."""
+        with self._lock:
+            hit = self._prefix_cache.get(token)
+            if hit is not None:
+                self._prefix_cache.move_to_end(token)
+                return hit
+        lo = bisect.bisect_left(self._tokens, token)
+        hi = bisect.bisect_left(self._tokens, token + '\U0010ffff', lo)
+        ids = self._by_rank(np.unique(self._ids[lo:hi]))
+        with self._lock:
+            self._prefix_cache[token] = ids
+            while len(self._prefix_cache) > PREFIX_CACHE_SIZE:
+                self._prefix_cache.popitem(last=False)
+        return ids
+
+    def _fuzzy(self, query):
+        """(ids, scores) of products sharing at least half of the query's trigrams."""
+        grams = [self._trigrams[g] for g in trigrams(query) if g in self._trigrams]
+        total = len(trigrams(query))
+        if not grams or not total:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        counts = np.bincount(np.concatenate(grams), minlength=len(self))
+        ids = np.flatnonzero(counts >= max(1, (total + 1) // 2))
+        scores = counts[ids] / total
+        order = np.lexsort((self._rank[ids], -scores))
+        return ids[order], scores[order]
+
+    def search(self, query, limit=10, category=None):
+        """Typeahead matches for `query` -> list of product dicts with 'match' = prefix | fuzzy."""
+        tokens = tokenize(query)
+        if not tokens or limit <= 0:
+            return []
+        ids = None
+        for token in tokens:
+            found = self._prefix(token)
+            # intersect while keeping the rank order of the running candidate list
+            ids = found if ids is None else ids[np.isin(ids, found, assume_unique=True)]
+            if not len(ids):
+                break
+        if category:
+            ids = ids[self._category[ids] == category]
+        hits = [(int(i), 'prefix', 1.0) for i in ids[:limit]]
+        if len(hits) < limit and len(normalize(query)) >= MIN_FUZZY_CHARS:
+            seen = {i for i, _, _ in hits}
+            fuzzy_ids, scores = self._fuzzy(query)
+            for i, score in zip(fuzzy_ids.tolist(), scores.tolist()):
+                if len(hits) >= limit:
+                    break
+                if i in seen or (category and self._category[i] != category):
+                    continue
+                hits.append((i, 'fuzzy', round(score, 3)))
+        return [self._result(i, match, score) for i, match, score in hits]
+
+    def _result(self, i, match, score):
+        row = self.products.iloc[i]
+        price = row['price']
+        return {
+            'id': int(row['product_id']),
+            'name': row['product_name'],
+            'name_bn': row['name_bn'],
+            'category': row['category'],
+            'category_bn': CATEGORY_LABELS_BN.get(row['category']),
+            'price': None if pd.isna(price) else float(price),
+            'price_band': row['price_band'],
+            'match': match,
+            'score': score,
+        }
+
+
+_index = {'stamp': None, 'index': None}
+_index_lock = threading.Lock()
+
+
+def get_index(db_path=None):
+    """Shared SearchIndex, rebuilt when the products version changes."""
+    stamp = data_version.version_key(('products',), db_path)
+    with _index_lock:
+        if _index['index'] is not None and _index['stamp'] == stamp:
+            return _index['index']
+    # Only on (re)build: seeding an empty catalog bumps 'products', so re-read the stamp
+    ensure_catalog(db_path)
+    stamp = data_version.version_key(('products',), db_path)
+    index = SearchIndex(load_products(db_path))
+    with _index_lock:
+        _index['stamp'] = stamp
+        _index['index'] = index
+    return index
@@ -0,0 +1,218 @@
+# File: customers.py
+# Customer analytics: per-customer RFM table, quantile scores and segments.
+#
+# The table keeps one row per user_id (first/last purchase, order count,
+# total spend), built with one vectorized groupby. It is keyed on the
+# transactions data version (data_version.py): every write path bumps it when
+# it rewrites the table, so a refresh with an unchanged version does not even
+# open the database, and a new version rebuilds the aggregates. Scores and
+# segments are recomputed from the aggregates (also when the date rolls
+# over), which is a handful of array ops even for millions of customers.
+#
+# cohort_matrix() builds the first-purchase-month cohort retention/revenue
+# matrix; app.py memoizes it on the prepared analytics frame (per data version).
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_version
+from database import DB_PATH
+
+
+SEGMENTS = ('champions', 'loyal', 'new', 'promising', 'at_risk', 'hibernating', 'lost')
+SEGMENT_LABELS_BN = {
+    'champions': 'সেরা ক্রেতা',
+    'loyal': 'নিয়মিত ক্রেতা',
+    'new': 'নতুন ক্রেতা',
+    'promising': 'সম্ভাবনাময়',
+    'at_risk': 'ঝুঁকিতে',
+    'hibernating': 'নিষ্ক্রিয়প্রায়',
+    'lost': 'হারানো',
+}
+SORT_KEYS = ('monetary', 'frequency', 'recency')
+AT_RISK_DAYS = 60
+
+
+def _score(values, higher_is_better=True):
+    """Quintile score 1..5 from percentile ranks (ties share a score)."""
+    pct = values.rank(pct=True, method='average')
+    if not higher_is_better:
+        pct = 1 - pct + 1.0 / max(len(values), 1)
+    return np.clip(np.ceil(pct * 5), 1, 5).astype(np.int8)
+
+
+def _aggregate(df):
+    g = df.groupby('user_id')
+    return pd.DataFrame({
+        'first_purchase': g['date'].min(),
+        'last_purchase': g['date'].max(),
+        'frequency': g.size(),
+        'monetary': g['amount'].sum(),
+    })
+
+
+def score_table(agg, now=None):
+    """Add recency, R/F/M scores and segment columns to per-customer aggregates."""
+    now = (now or pd.Timestamp.now()).normalize()
+    t = agg.copy()
+    t['recency'] = (now - t['last_purchase']).dt.days
+    t['r_score'] = _score(t['recency'], higher_is_better=False)
+    t['f_score'] = _score(t['frequency'])
+    t['m_score'] = _score(t['monetary'])
+    r = t['r_score'].to_numpy()
+    f = t['f_score'].to_numpy()
+    fm = np.rint((t['f_score'].to_numpy() + t['m_score'].to_numpy()) / 2)
+    t['segment'] = np.select(
+        [(r >= 4) & (fm >= 4), (r >= 3) & (fm >= 3), (r >= 4) & (f <= 1), r >= 3,
+         (r <= 2) & (fm >= 3), r == 2],
+        ['champions', 'loyal', 'new', 'promising', 'at_risk', 'hibernating'],
+        'lost')
+    return t
+
+
+def cohort_matrix(df, max_months=12):
+    """Retention and revenue by first-purchase month x months since first purchase.
+
+    `df` needs user_id, date (datetime) and total_amount. Everything is one
+    pass of integer month arithmetic plus two groupbys; cells a cohort has
+    not reached yet (beyond the last month in the data) are None.
+    """
+    df = df[df['user_id'].notna()]
+    if df.empty:
+        return None
+    month_idx = (df['date'].dt.year * 12 + df['date'].dt.month - 1).to_numpy()
+    users = df['user_id'].to_numpy()
+    first_idx = pd.Series(month_idx).groupby(users).transform('min').to_numpy()
+    age = month_idx - first_idx
+    keep = age < max_months
+    frame = pd.DataFrame({'cohort': first_idx[keep], 'age': age[keep], 'user_id': users[keep],
+                          'amount': df['total_amount'].to_numpy()[keep]})
+
+    active = (frame.drop_duplicates(['user_id', 'age'])
+              .groupby(['cohort', 'age']).size().unstack(fill_value=0))
+    revenue = frame.groupby(['cohort', 'age'])['amount'].sum().unstack(fill_value=0.0)
+    ages = np.arange(max_months)
+    active = active.reindex(columns=ages, fill_value=0)
+    revenue = revenue.reindex(index=active.index, columns=ages, fill_value=0.0)
+
+    sizes = active[0].to_numpy().astype(float)
+    cohorts = active.index.to_numpy()
+    # Months each cohort has been observable for; later cells are unknown, not zero
+    observed = (int(month_idx.max()) - cohorts)[:, None] >= ages[None, :]
+    retention = np.where(observed, active.to_numpy() / sizes[:, None], np.nan)
+    revenue_arr = np.where(observed, revenue.to_numpy(), np.nan)
+    ltv = np.where(observed, np.cumsum(revenue.to_numpy(), axis=1) / sizes[:, None], np.nan)
+
+    def rows(arr, digits):
+        return [[None if np.isnan(v) else round(float(v), digits) for v in row] for row in arr]
+
+    return {
+        'cohorts': [f'{c // 12:04d}-{c % 12 + 1:02d}' for c in cohorts],
+        'cohort_sizes': [int(n) for n in sizes],
+        'months': [int(a) for a in ages],
+        'retention': rows(retention, 4),
+        'revenue': rows(revenue_arr, 2),
+        'ltv': rows(ltv, 2),
+    }
+
+
+class CustomerTable:
+    """Per-customer RFM table for the transactions table, rebuilt per data version."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DB_PATH
+        self.agg = None
+        self.table = None
+        self.stamp = None  # transactions data version the aggregates were built from
+        self.as_of = None
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def _read(self, conn):
+        df = pd.read_sql('SELECT user_id, date, quantity, price FROM transactions WHERE user_id IS NOT NULL', conn)
+        df['date'] = pd.to_datetime(df['date'])
+        df['amount'] = df['quantity'] * df['price']
+        return df
+
+    def refresh(self, now=None):
+        """Rebuild the aggregates if the transactions version changed; rescore on a new day."""
+        with self._lock:
+            stamp = data_version.version_key(('transactions',), self.db_path)
+            changed = stamp != self.stamp
+            if changed:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    cols = [r[1] for r in conn.execute('PRAGMA table_info(transactions)')]
+                    rows = self._read(conn) if 'user_id' in cols else None
+                finally:
+                    conn.close()
+                self.agg = _aggregate(rows) if rows is not None and not rows.empty else None
+                self.table = None
+                self.stamp = stamp
+            now = now or pd.Timestamp.now()
+            if self.agg is not None and (changed or self.as_of != now.date()):
+                self.table = score_table(self.agg, now)
+                self.as_of = now.date()
+                self._orders = {}
+            return self
+
+    def _order(self, key):
+        if key not in self._orders:
+            values = self.table[key].to_numpy()
+            # recency: most recent first; others: largest first
+            self._orders[key] = np.argsort(values if key == 'recency' else -values, kind='stable')
+        return self._orders[key]
+
+    def segment_counts(self):
+        if self.table is None:
+            return {}
+        counts = self.table['segment'].value_counts()
+        return {s: int(counts.get(s, 0)) for s in SEGMENTS}
+
+    def page(self, segment=None, page=1, page_size=50, sort='monetary'):
+        """One page of customers, optionally filtered to a segment, in `sort` order."""
+        with self._lock:
+            table = self.table
+            order = self._order(sort)
+        if segment:
+            order = order[(table['segment'].to_numpy() == segment)[order]]
+        total = len(order)
+        start = (page - 1) * page_size
+        rows = table.iloc[order[start:start + page_size]]
+        customers = [{
+            'customer_id': int(uid),
+            'recency': int(rec),
+            'frequency': int(freq),
+            'monetary': round(float(mon), 2),
+            'first_purchase': first.strftime('%Y-%m-%d'),
+            'last_purchase': last.strftime('%Y-%m-%d'),
+            'rfm': f'{r}{f}{m}',
+            'segment': seg,
+        } for uid, rec, freq, mon, first, last, r, f, m, seg in zip(
+            rows.index, rows['recency'], rows['frequency'], rows['monetary'],
+            rows['first_purchase'], rows['last_purchase'],
+            rows['r_score'], rows['f_score'], rows['m_score'], rows['segment'])]
+        return {
+            'customers': customers,
+            'segment': segment,
+            'page': page,
+            'page_size': page_size,
+            'total': total,
+            'pages': (total + page_size - 1) // page_size,
+        }
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    """Process-wide CustomerTable, refreshed on every call (cheap when nothing changed)."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = CustomerTable()
+    return _table.refresh()
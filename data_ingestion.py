@@ -1,24 +1,20 @@
 import pandas as pd
 import numpy as np
-from pytrends.request import TrendReq
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
 from database import DB_PATH, load_data
+import catalog
+import data_version
+import sentiment_ingest
+import sketches
+import trends_ingest
 import sqlite3
 
-nltk.download('vader_lexicon', quiet=True)
-
-def ingest_trends(products=['clothing', 'electronics'], regions='BD'):
-    pytrends = TrendReq(hl='en-US', tz=360)
-    conn = sqlite3.connect(DB_PATH)
-    for product in products:
-        pytrends.build_payload([product], cat=0, timeframe='today 5-y', geo=regions)
-        data = pytrends.interest_over_time()
-        if not data.empty:
-            data = data.reset_index()
-            data['product'] = product
-            data.to_sql('trends', conn, if_exists='append', index=False)
-    conn.close()
+def ingest_trends(products=['clothing', 'electronics'], regions='BD', source=None, force=False):
+    """Fetch only new Google Trends points per product and upsert them (see trends_ingest.py)."""
+    report = trends_ingest.ingest(products, geo=regions, source=source, force=force)
+    for product, r in report.items():
+        if r['status'] == 'error':
+            print(f"⚠️ Trends fetch failed for {product}: {r['error']}")
+    return report
 
 def ingest_mock_transactions():
     """Generate realistic sample transaction data for Bangladeshi e-commerce"""
@@ -108,13 +104,20 @@ def ingest_mock_transactions():
     
     conn = sqlite3.connect(DB_PATH)
     df.to_sql('transactions', conn, if_exists='replace', index=False)
+    data_version.bump('transactions', conn)
     conn.close()
     print(f"\n✅ Loaded {len(df)} transactions into database")
+    try:
+        sketches.rebuild(df)
+    except Exception as e:
+        print(f"⚠️ Could not rebuild approximate-analytics sketches: {e}")
+    try:
+        catalog.sync_from_transactions(replace=True)
+    except Exception as e:
+        print(f"⚠️ Could not refresh the product catalog: {e}")
 
 def ingest_social_buzz(products=['clothing', 'mobile', 'home_exercise', 'exercise_accessories', 'electronics', 'food', 'cosmetics', 'toys']):
-    """Generate realistic social sentiment data"""
-    sia = SentimentIntensityAnalyzer()
-    conn = sqlite3.connect(DB_PATH)
+    """Generate realistic social sentiment data (fills missing weeks only; real comments go through sentiment_ingest)"""
     dates = pd.date_range(start='2025-01-01', end='2026-01-15', freq='W')  # Weekly data
     
     # Realistic product sentiments in Bangladdeshi market
@@ -153,23 +156,26 @@ def ingest_social_buzz(products=['clothing', 'mobile', 'home_exercise', 'exercis
         ]
     }
     
+    # Score each distinct phrase once (lexicon loads lazily), then add per-week noise
+    with sentiment_ingest.SentimentScorer(workers=1) as scorer:
+        phrases = sorted({c for p in products for c in product_sentiments.get(p, ['Good product'])})
+        base_scores = dict(zip(phrases, scorer.score(phrases)))
+
+    rows = []
     for product in products:
-        sentiments = []
-        for date in dates:
-            # Pick random comment for product
-            comment = np.random.choice(product_sentiments.get(product, ['Good product']))
-            sentiment_score = sia.polarity_scores(comment)['compound']
-            
-            # Add some noise but keep mostly positive (0.4-0.95 range)
-            sentiment_score = max(0.35, min(0.95, sentiment_score + np.random.uniform(-0.15, 0.25)))
-            sentiments.append(sentiment_score)
-        
-        df = pd.DataFrame({
-            'date': dates,
-            'product': product,
-            'sentiment': sentiments
-        })
-        df.to_sql('social_sentiment', conn, if_exists='append', index=False)
-    
-    conn.close()
-    print(f"✅ Generated social sentiment data for {len(products)} products")
+        comments = np.random.choice(product_sentiments.get(product, ['Good product']), len(dates))
+        scores = np.array([base_scores[c] for c in comments]) + np.random.uniform(-0.15, 0.25, len(dates))
+        # Keep mostly positive (0.35-0.95 range)
+        scores = np.clip(scores, 0.35, 0.95)
+        rows.extend(zip(dates.strftime('%Y-%m-%d'), [product] * len(dates), scores.tolist()))
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        sentiment_ingest.ensure_tables(conn)
+        added = sentiment_ingest.upsert_weekly(conn, rows, replace=False)
+        conn.commit()
+        if added:
+            data_version.bump('social_sentiment', conn)
+    finally:
+        conn.close()
+    print(f"✅ Generated social sentiment data for {len(products)} products ({added} new weeks)")
@@ -0,0 +1,151 @@
+# File: data_version.py
+# Per-table data versions and HTTP conditional caching for the Flask app.
+#
+# Every write path bumps the version of the table it wrote (bump()). The
+# `data_versions` table lives in the same SQLite file, so a bump made on the
+# writer's connection commits together with the data.
+#
+# Views declare what they read with @depends_on('transactions', ...). The
+# before_request hook registered by init_app() builds an ETag from those
+# tables' versions (plus the query string and the current date, since
+# analytics views are relative to "today"; both sides take it from today(),
+# in server-local time) and answers If-None-Match /
+# If-Modified-Since with 304 before the view runs, i.e. before any pandas
+# work. Fresh responses carry ETag, Last-Modified and Cache-Control: no-cache
+# so browsers revalidate on every refresh.
+
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from database import DB_PATH
+
+
+def today():
+    """Current server-local date: the "today" of analytics windows and of the ETag."""
+    return datetime.now().date()
+
+
+def ensure_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL)''')
+
+
+def bump(table, conn=None, db_path=None):
+    """Increment `table`'s version. Pass the writer's `conn` to commit with its write."""
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_table(conn)
+        conn.execute('''INSERT INTO data_versions (table_name, version, updated_at) VALUES (?, 1, ?)
+            ON CONFLICT(table_name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at''',
+                     (table, datetime.now(timezone.utc).isoformat(timespec='seconds')))
+        conn.commit()
+    finally:
+        if own:
+            conn.close()
+
+
+def get_versions(tables, db_path=None):
+    """{table: (version, updated_at datetime | None)} for the given tables.
+
+    Databases created before versioning have no data_versions table; their
+    tables report the file's mtime as version so caches still invalidate.
+    """
+    db_path = db_path or DB_PATH
+    try:
+        mtime = os.stat(db_path).st_mtime_ns
+    except OSError:
+        return {t: (0, None) for t in tables}
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        rows = dict((name, (ver, ts)) for name, ver, ts in conn.execute(
+            f"SELECT table_name, version, updated_at FROM data_versions WHERE table_name IN ({', '.join('?' * len(tables))})",
+            tuple(tables)))
+    except sqlite3.OperationalError:
+        rows = None
+    finally:
+        conn.close()
+    if rows is None:
+        stamp = datetime.fromtimestamp(mtime / 1e9, timezone.utc)
+        return {t: (f'm{mtime}', stamp) for t in tables}
+    return {t: (rows[t][0], datetime.fromisoformat(rows[t][1])) if t in rows else (0, None) for t in tables}
+
+
+def version_key(tables, db_path=None):
+    """Hashable stamp of the given tables' versions (for in-process caches)."""
+    versions = get_versions(tuple(tables), db_path)
+    return tuple(versions[t][0] for t in tables)
+
+
+def depends_on(*tables):
+    """Mark a view as derived from `tables` (place it under @flask_app.route)."""
+    def decorate(view):
+        view.data_tables = tables
+        return view
+    return decorate
+
+
+def _validators(tables):
+    versions = get_versions(tables)
+    from flask import request
+    raw = '|'.join([request.path, request.query_string.decode('latin-1'), today().isoformat()] +
+                   [f'{t}={versions[t][0]}' for t in tables])
+    etag = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+    # Views depend on "today", so the resource never looks older than local midnight
+    midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0).astimezone(timezone.utc)
+    stamps = [v[1] for v in versions.values() if v[1] is not None] + [midnight]
+    return etag, max(stamps).replace(microsecond=0)
+
+
+def init_app(app):
+    """Register the conditional-request hooks on a Flask app."""
+    from flask import g, request
+
+    @app.before_request
+    def _conditional_get():
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        view = app.view_functions.get(request.endpoint)
+        tables = getattr(view, 'data_tables', None)
+        if not tables:
+            return None
+        try:
+            etag, last_modified = _validators(tables)
+        except Exception:
+            return None  # never fail a request because versioning is unavailable
+        g.data_validators = (etag, last_modified)
+        if request.if_none_match:
+            hit = request.if_none_match.contains_weak(etag)
+        elif request.if_modified_since:
+            since = request.if_modified_since
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            hit = last_modified <= since
+        else:
+            hit = False
+        if hit:
+            resp = app.response_class(status=304)
+            _set_headers(resp, etag, last_modified)
+            return resp
+        return None
+
+    @app.after_request
+    def _add_validators(resp):
+        validators = g.pop('data_validators', None)
+        if validators and resp.status_code == 200:
+            _set_headers(resp, *validators)
+        return resp
+
+    return app
+
+
+def _set_headers(resp, etag, last_modified):
+    resp.set_etag(etag, weak=True)
+    resp.headers['Last-Modified'] = format_datetime(last_modified, usegmt=True)
+    resp.headers['Cache-Control'] = 'no-cache'
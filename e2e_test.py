@@ -25,3 +25,11 @@ try:
             print('STREAM CHUNK:', line)
 except Exception as e:
     print('STREAM ERR', e)
+
+# analytics windows reaching past today (the cube must clamp, not 500)
+for qs in ('start=2026-10-01&end=2099-12-31', 'compare=2099-01-01:2099-12-31'):
+    try:
+        r = requests.get(f'http://127.0.0.1:5000/api/analytics/kpis?{qs}', timeout=30)
+        print('KPIS', qs, r.status_code, r.json().get('window') if r.ok else r.text[:200])
+    except Exception as e:
+        print('KPIS ERR', qs, e)
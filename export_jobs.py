@@ -0,0 +1,321 @@
+# File: export_jobs.py
+# Background export jobs with a deduplicated, self-evicting artifact cache.
+#
+# A job is identified by a hash of (kind, normalized params, data version of
+# the tables the export reads), and that id is also the artifact's file name
+# (exports/<kind>_<id>.<ext>). So:
+#   - submitting the same export twice while nothing changed returns the
+#     same job, queued, running or finished, and never builds twice;
+#   - a finished artifact is found on disk by any gunicorn worker, even one
+#     that never saw the job;
+#   - a data change produces a new id, so stale artifacts are never served.
+# Artifacts are written to <name>.part and renamed when complete. The table
+# versions are read again after the build; if the data changed while it ran,
+# the artifact is discarded and the job fails as stale (job.stale), since
+# it may hold newer rows than its id says.
+#
+# Builds run on a small thread pool (EXPORT_WORKERS). After each build
+# evict() trims the exports directory: files older than EXPORT_MAX_AGE go
+# first, then the least recently used until the directory is under
+# EXPORT_MAX_BYTES. A cache hit touches the file's mtime so it counts as used.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import data_version
+import export_utils
+import reports
+
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+EXPORT_MAX_BYTES = int(os.environ.get('EXPORT_MAX_BYTES', 512 * 1024 * 1024))
+EXPORT_MAX_AGE = float(os.environ.get('EXPORT_MAX_AGE', 24 * 3600))
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class ExportError(ValueError):
+    """Unknown export kind or invalid parameters."""
+
+
+def _day(value):
+    return pd.to_datetime(value).strftime('%Y-%m-%d') if value else None
+
+
+def _sales_params(params):
+    return {'start_date': _day(params.get('start_date')), 'end_date': _day(params.get('end_date'))}
+
+
+def _forecast_params(params):
+    return {'product': str(params.get('product') or 'clothing').strip()}
+
+
+def _build_sales_excel(params, path):
+    export_utils.export_sales_excel(params['start_date'], params['end_date'], filepath=path)
+
+
+def _build_sales_stream(produce):
+    def build(params, path):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for part in produce(params['start_date'], params['end_date']):
+                f.write(part)
+    return build
+
+
+def _products_params(params):
+    products = params.get('products')
+    if isinstance(products, str):
+        products = products.split(',')
+    products = sorted({str(p).strip() for p in products or [] if str(p).strip()})
+    return {'products': products or None}
+
+
+def _build_product_reports(params, path):
+    """One PDF per product (reports.generate_reports) zipped with a summary.json."""
+    workdir = path + '.d'
+    try:
+        result = reports.generate_reports(params['products'], output_dir=workdir)
+        if not result['reports']:
+            raise RuntimeError('no reports were produced' +
+                               (f": {result['failed'][0]['error']}" if result['failed'] else ''))
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for f in result['files']:
+                zf.write(f, os.path.basename(f))
+            summary = {k: v for k, v in result.items() if k != 'files'}
+            zf.writestr('summary.json', json.dumps(summary, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _build_forecast(params, path):
+    from models import forecast_demand
+    export_utils.generate_forecast_pdf(params['product'], forecast_demand(params['product']), filepath=path)
+
+
+# kind -> (params normalizer, builder(params, path), file extension, tables read)
+KINDS = {
+    'sales_excel': (_sales_params, _build_sales_excel, 'xlsx', ('transactions',)),
+    'sales_csv': (_sales_params, _build_sales_stream(export_utils.iter_sales_csv), 'csv', ('transactions',)),
+    'sales_ndjson': (_sales_params, _build_sales_stream(export_utils.iter_sales_ndjson), 'ndjson', ('transactions',)),
+    'forecast': (_forecast_params, _build_forecast, 'pdf' if reports.PDF_AVAILABLE else 'txt', ('transactions',)),
+    'product_reports': (_products_params, _build_product_reports, 'zip', ('transactions',)),
+}
+
+
+class ExportJob:
+    def __init__(self, job_id, kind, params, path, status='queued'):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.path = path
+        self.status = status
+        self.error = None
+        self.stale = False
+        self.versions = None  # table versions the id was computed from
+        self.created_at = time.time()
+        self.finished_at = self.created_at if status == 'done' else None
+        self.done = threading.Event()
+        if status == 'done':
+            self.done.set()
+
+    def wait(self, timeout=None):
+        """Block until the job finished (done or failed); True if it did within `timeout`."""
+        return self.done.wait(timeout)
+
+    def to_dict(self):
+        out = {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == 'done':
+            try:
+                out['size'] = os.path.getsize(self.path)
+            except OSError:
+                pass
+            out['download'] = f'/api/export/jobs/{self.id}/download'
+        if self.error:
+            out['error'] = self.error
+        if self.stale:
+            out['stale'] = True
+        return out
+
+
+class ExportQueue:
+    """Job registry + worker pool + artifact cache over one exports directory."""
+
+    def __init__(self, directory=EXPORT_DIR, workers=EXPORT_WORKERS,
+                 max_bytes=EXPORT_MAX_BYTES, max_age=EXPORT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def _path(self, kind, job_id):
+        return os.path.join(self.directory, f'{kind}_{job_id}.{KINDS[kind][2]}')
+
+    def job_id(self, kind, params):
+        """(id, normalized params) for an export request (raises ExportError)."""
+        job_id, params, _ = self._identify(kind, params)
+        return job_id, params
+
+    def _identify(self, kind, params):
+        if kind not in KINDS:
+            raise ExportError(f"kind must be one of: {', '.join(KINDS)}")
+        normalize, _, _, tables = KINDS[kind]
+        try:
+            params = normalize(params or {})
+        except (ValueError, TypeError) as e:
+            raise ExportError(f'Invalid export parameters: {e}')
+        versions = data_version.version_key(tables)
+        raw = json.dumps([kind, params, list(tables), [str(v) for v in versions]], sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:24], params, versions
+
+    def submit(self, kind, params=None):
+        """Existing job or cached artifact for these params, else a newly queued build."""
+        job_id, params, versions = self._identify(kind, params)
+        path = self._path(kind, job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == 'failed':
+                job = None  # retry failed builds
+            if job is not None and job.status == 'done' and not os.path.exists(path):
+                job = None  # evicted since
+            if job is None and os.path.exists(path):
+                job = ExportJob(job_id, kind, params, path, status='done')
+            if job is not None:
+                self._jobs[job_id] = job
+                if job.status == 'done':
+                    self.hits += 1
+                    _touch(path)
+                return job
+            job = ExportJob(job_id, kind, params, path)
+            job.versions = versions
+            self._jobs[job_id] = job
+            self.builds += 1
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """Job by id (also finds artifacts built by another process); None if unknown or evicted."""
+        if len(job_id) != 24 or job_id.strip('0123456789abcdef'):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            if job.status == 'done' and not os.path.exists(job.path):
+                with self._lock:
+                    self._jobs.pop(job_id, None)
+                return None
+            return job
+        for kind in KINDS:
+            path = self._path(kind, job_id)
+            if os.path.exists(path):
+                job = ExportJob(job_id, kind, None, path, status='done')
+                with self._lock:
+                    self._jobs.setdefault(job_id, job)
+                return job
+        return None
+
+    def _run(self, job):
+        job.status = 'running'
+        tmp = job.path + '.part'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            KINDS[job.kind][1](job.params, tmp)
+            if data_version.version_key(KINDS[job.kind][3]) != job.versions:
+                job.stale = True
+                raise RuntimeError('data changed while the export was building; submit it again')
+            os.replace(tmp, job.path)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+        self.evict(keep=job.path)
+
+    def evict(self, keep=None):
+        """Drop artifacts past max_age, then least recently used ones beyond max_bytes (never `keep`)."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        now = time.time()
+        files = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            if path == keep or (path.endswith('.part') and now - mtime <= self.max_age):
+                continue  # just built / build in progress (stale .part files do go)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            cutoff = now - self.max_age
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.finished_at is not None and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+        return removed
+
+    def stats(self):
+        with self._lock:
+            counts = {s: 0 for s in STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {'jobs': counts, 'cache_hits': self.hits, 'builds': self.builds}
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Process-wide ExportQueue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ExportQueue()
+    return _queue
@@ -2,71 +2,198 @@
 # Utility functions for exporting reports in various formats
 
 import os
+import sqlite3
 from datetime import datetime
 import pandas as pd
-from database import load_data
+from database import DB_PATH, load_data
 
 
-def export_sales_excel(start_date=None, end_date=None, output_dir='exports'):
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 50000))
+
+
+def date_bounds(start_date=None, end_date=None):
+    """
+    Validate optional date filters (raises ValueError / TypeError on bad input).
+
+    Returns:
+        tuple: ('YYYY-MM-DD' | None, exclusive end 'YYYY-MM-DD' | None)
+    """
+    start = pd.to_datetime(start_date).strftime('%Y-%m-%d') if start_date else None
+    end = (pd.to_datetime(end_date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d') if end_date else None
+    return start, end
+
+
+def iter_sales_chunks(start_date=None, end_date=None, chunksize=None, db_path=None):
+    """
+    Yield transactions in DataFrame chunks, with the date filter applied in SQL.
+
+    Args:
+        start_date: Start date filter, inclusive (optional)
+        end_date: End date filter, inclusive (optional)
+        chunksize: Rows per chunk (defaults to EXPORT_CHUNK_ROWS)
+        db_path: SQLite database (defaults to database.DB_PATH)
+
+    Yields:
+        DataFrame: Up to `chunksize` rows, 'date' as text as stored
+    """
+    start, end = date_bounds(start_date, end_date)
+    where, params = [], []
+    if start:
+        where.append('date >= ?')
+        params.append(start)
+    if end:
+        where.append('date < ?')
+        params.append(end)
+    clause = f"WHERE {' AND '.join(where)}" if where else ''
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        if where:
+            # Regenerated tables lose their indexes (to_sql replace); cheap no-op otherwise
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)')
+        for chunk in pd.read_sql(f'SELECT * FROM transactions {clause}', conn, params=params,
+                                 chunksize=chunksize or EXPORT_CHUNK_ROWS):
+            yield chunk
+    finally:
+        conn.close()
+
+
+class SalesAggregator:
+    """Per-product summary and per-day sales, accumulated one chunk at a time.
+
+    State is sized by products and days, never by rows, so it stays small for
+    any export size.
+    """
+
+    def __init__(self):
+        self._summary = None
+        self._daily = None
+
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        summary = chunk.groupby('product').agg(
+            quantity_sum=('quantity', 'sum'), count=('quantity', 'size'),
+            price_sum=('price', 'sum'), price_min=('price', 'min'), price_max=('price', 'max'))
+        daily = chunk.assign(date=chunk['date'].astype(str).str[:10]).groupby(['date', 'product']).agg(
+            quantity=('quantity', 'sum'), price_sum=('price', 'sum'), count=('price', 'size'))
+        if self._summary is None:
+            self._summary, self._daily = summary, daily
+            return
+        both = pd.concat([self._summary, summary]).groupby(level=0)
+        self._summary = both.agg({'quantity_sum': 'sum', 'count': 'sum', 'price_sum': 'sum',
+                                  'price_min': 'min', 'price_max': 'max'})
+        self._daily = pd.concat([self._daily, daily]).groupby(level=[0, 1]).sum()
+
+    def summary(self):
+        """Quantity sum/mean/count and price mean/min/max per product."""
+        if self._summary is None:
+            return pd.DataFrame(columns=['product', 'quantity_sum', 'quantity_mean', 'quantity_count',
+                                         'price_mean', 'price_min', 'price_max'])
+        s = self._summary
+        return pd.DataFrame({
+            'quantity_sum': s['quantity_sum'],
+            'quantity_mean': s['quantity_sum'] / s['count'],
+            'quantity_count': s['count'],
+            'price_mean': s['price_sum'] / s['count'],
+            'price_min': s['price_min'],
+            'price_max': s['price_max'],
+        }).round(2).reset_index()
+
+    def daily(self):
+        """Units and mean price per (date, product)."""
+        if self._daily is None:
+            return pd.DataFrame(columns=['date', 'product', 'quantity', 'price'])
+        d = self._daily.sort_index()
+        return pd.DataFrame({'quantity': d['quantity'],
+                             'price': (d['price_sum'] / d['count']).round(2)}).reset_index()
+
+
+def _sheet_rows(df):
+    """DataFrame -> row tuples for openpyxl (NaN -> empty cell)."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def export_sales_excel(start_date=None, end_date=None, output_dir='exports', chunksize=None, filepath=None):
     """
     Export sales data to Excel format.
-    
+
+    Rows are streamed chunk by chunk into a write-only openpyxl workbook while
+    the Summary Statistics and Daily Sales sheets are aggregated on the way,
+    so memory does not grow with the size of the export.
+
     Args:
         start_date: Start date filter (optional)
         end_date: End date filter (optional)
         output_dir: Directory to save the export file
-    
+        chunksize: Rows per database read (defaults to EXPORT_CHUNK_ROWS)
+        filepath: Exact output path (overrides output_dir and the timestamped name)
+
     Returns:
         str: Path to the generated Excel file
     """
     try:
-        # Create exports directory if it doesn't exist
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        # Load transaction data
-        df = load_data('transactions')
-        
-        # Convert date column to datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Apply date filters if provided
-        if start_date:
-            df = df[df['date'] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df['date'] <= pd.to_datetime(end_date)]
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'sales_export_{timestamp}.xlsx'
-        filepath = os.path.join(output_dir, filename)
-        
-        # Create Excel writer with multiple sheets
-        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-            # Main data sheet
-            df.to_excel(writer, sheet_name='Sales Data', index=False)
-            
-            # Summary statistics sheet
-            summary = df.groupby('product').agg({
-                'quantity': ['sum', 'mean', 'count'],
-                'price': ['mean', 'min', 'max']
-            }).round(2)
-            summary.to_excel(writer, sheet_name='Summary Statistics')
-            
-            # Daily sales sheet
-            daily = df.groupby([df['date'].dt.date, 'product']).agg({
-                'quantity': 'sum',
-                'price': 'mean'
-            }).reset_index()
-            daily.to_excel(writer, sheet_name='Daily Sales', index=False)
-        
+        from openpyxl import Workbook
+
+        if filepath is None:
+            # Create exports directory if it doesn't exist
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+
+            # Generate filename with timestamp
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'sales_export_{timestamp}.xlsx'
+            filepath = os.path.join(output_dir, filename)
+
+        wb = Workbook(write_only=True)
+        data_sheet = wb.create_sheet('Sales Data')
+        totals = SalesAggregator()
+        header_written = False
+        for chunk in iter_sales_chunks(start_date, end_date, chunksize):
+            totals.add(chunk)
+            if not header_written:
+                data_sheet.append(list(chunk.columns))
+                header_written = True
+            chunk['date'] = pd.to_datetime(chunk['date'])
+            for row in _sheet_rows(chunk):
+                data_sheet.append(row)
+
+        for title, frame in (('Summary Statistics', totals.summary()), ('Daily Sales', totals.daily())):
+            sheet = wb.create_sheet(title)
+            sheet.append(list(frame.columns))
+            for row in _sheet_rows(frame):
+                sheet.append(row)
+
+        wb.save(filepath)
         return filepath
-    
+
     except Exception as e:
         raise RuntimeError(f"Failed to export Excel: {str(e)}")
 
 
-def generate_forecast_pdf(product, forecast_data, output_dir='exports'):
+def iter_sales_csv(start_date=None, end_date=None, chunksize=None):
+    """Yield the filtered transactions as CSV text, one chunk at a time (header first)."""
+    header = True
+    for chunk in iter_sales_chunks(start_date, end_date, chunksize):
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+
+def iter_sales_ndjson(start_date=None, end_date=None, chunksize=None):
+    """Yield the filtered transactions as newline-delimited JSON, one chunk at a time."""
+    for chunk in iter_sales_chunks(start_date, end_date, chunksize):
+        if chunk.empty:
+            continue
+        text = chunk.to_json(orient='records', lines=True, force_ascii=False)
+        yield text if text.endswith('\n') else text + '\n'
+
+
+STREAM_FORMATS = {
+    'csv': (iter_sales_csv, 'text/csv'),
+    'ndjson': (iter_sales_ndjson, 'application/x-ndjson'),
+}
+
+
+def generate_forecast_pdf(product, forecast_data, output_dir='exports', filepath=None):
     """
     Generate a PDF report for forecast data.
     
@@ -74,20 +201,28 @@ def generate_forecast_pdf(product, forecast_data, output_dir='exports'):
         product: Product name
         forecast_data: DataFrame with forecast results
         output_dir: Directory to save the PDF
+        filepath: Exact output path (overrides output_dir and the timestamped name)
     
     Returns:
-        str: Path to the generated PDF file
+        str: Path to the generated PDF file (a .txt report when reportlab is not installed)
     """
     try:
-        # This is a placeholder - full PDF generation would require reportlab
-        # For now, we'll create a simple text report
-        
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'forecast_{product}_{timestamp}.txt'
-        filepath = os.path.join(output_dir, filename)
+        import reports
+        as_pdf = reports.PDF_AVAILABLE and hasattr(forecast_data, 'columns')
+
+        if filepath is None:
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"forecast_{product}_{timestamp}.{'pdf' if as_pdf else 'txt'}"
+            filepath = os.path.join(output_dir, filename)
+
+        if as_pdf:
+            reports.table_pdf('Demand Forecast Report',
+                              f"Product: {product} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                              forecast_data, filepath)
+            return filepath
         
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(f"=== Demand Forecast Report ===\n")
@@ -7,6 +7,8 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from database import init_db
+import data_version
+import sentiment_ingest
 import pandas as pd
 import numpy as np
 import sqlite3
@@ -199,14 +201,24 @@ for category in PRODUCT_CATALOG.keys():
 # Save to database
 conn = sqlite3.connect('ecommerce.db')
 df.to_sql('transactions', conn, if_exists='replace', index=False)
+data_version.bump('transactions', conn)
 conn.close()
 
+# Approximate-analytics sketches (?approx=1) for the new transactions
+from sketches import rebuild as rebuild_sketches
+rebuild_sketches(df, 'ecommerce.db')
+
+# Product catalog (/api/products, search index) from PRODUCT_CATALOG
+from catalog import seed_catalog
+seed_catalog(PRODUCT_CATALOG, 'ecommerce.db')
+
 print(f"\n✅ Loaded {len(df):,} transactions into database")
 
 # === Social Sentiment ===
 print("\n🔄 Generating social sentiment data...")
 
 conn = sqlite3.connect('ecommerce.db')
+sentiment_ingest.ensure_tables(conn)
 sentiment_dates = pd.date_range(start='2023-01-15', end='2026-01-15', freq='W')
 
 base_sentiments = {
@@ -236,8 +248,10 @@ for category in PRODUCT_CATALOG.keys():
         'product': category,  # Keep for compatibility
         'sentiment': sentiments
     })
-    sentiment_df.to_sql('social_sentiment', conn, if_exists='append', index=False)
+    sentiment_ingest.upsert_weekly(conn, sentiment_df.assign(date=sentiment_df['date'].dt.strftime('%Y-%m-%d'))
+                                   .itertuples(index=False, name=None))
 
+data_version.bump('social_sentiment', conn)
 conn.close()
 
 print(f"✅ Generated social sentiment data for {len(PRODUCT_CATALOG)} categories")
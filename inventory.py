@@ -0,0 +1,173 @@
+# File: inventory.py
+# Per-SKU inventory engine: stock table, demand statistics and reorder points.
+#
+# Stock lives in the `stock` table (one row per product_name). Demand is a
+# dense SKU x day matrix of units over the last `lookback` days, built with
+# one np.bincount, so mean/std of daily demand, days until stock-out, safety
+# stock and reorder points are computed for every SKU at once:
+#
+#     safety_stock  = z(service_level) * std_daily * sqrt(lead_time)
+#     reorder_point = mean_daily * lead_time + safety_stock
+#
+# The critical list is a top-k partial sort (np.argpartition) on days left.
+# SKUs with no stock row use DEFAULT_STOCK / DEFAULT_LEAD_TIME and are
+# reported with stock_known=False.
+
+import sqlite3
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import data_version
+from database import DB_PATH
+
+
+DEFAULT_STOCK = 100
+DEFAULT_LEAD_TIME = 7
+DEFAULT_LOOKBACK = 56
+DEFAULT_SERVICE_LEVEL = 0.95
+NO_DEMAND_DAYS = 999
+
+
+def ensure_stock_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS stock (
+        product_name TEXT PRIMARY KEY,
+        category TEXT,
+        current_stock INTEGER NOT NULL DEFAULT 0,
+        lead_time_days INTEGER,
+        updated_at TEXT)''')
+
+
+def load_stock(db_path=None):
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_stock_table(conn)
+        return pd.read_sql('SELECT product_name, category, current_stock, lead_time_days FROM stock', conn)
+    finally:
+        conn.close()
+
+
+def upsert_stock(rows, db_path=None):
+    """Insert or update stock rows: dicts with product_name, current_stock[, category, lead_time_days]."""
+    now = datetime.now().isoformat(timespec='seconds')
+    values = []
+    for r in rows:
+        name = str(r['product_name']).strip()
+        if not name:
+            raise ValueError('product_name is required')
+        stock = int(r['current_stock'])
+        if stock < 0:
+            raise ValueError('current_stock must be >= 0')
+        lead = r.get('lead_time_days')
+        lead = int(lead) if lead is not None else None
+        if lead is not None and lead < 0:
+            raise ValueError('lead_time_days must be >= 0')
+        values.append((name, r.get('category'), stock, lead, now))
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_stock_table(conn)
+        conn.executemany('''INSERT INTO stock (product_name, category, current_stock, lead_time_days, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(product_name) DO UPDATE SET
+                category = COALESCE(excluded.category, stock.category),
+                current_stock = excluded.current_stock,
+                lead_time_days = COALESCE(excluded.lead_time_days, stock.lead_time_days),
+                updated_at = excluded.updated_at''', values)
+        data_version.bump('stock', conn)
+    finally:
+        conn.close()
+    return len(values)
+
+
+class DemandStats:
+    """Mean / std of daily units per SKU over a lookback window ending today."""
+
+    def __init__(self, df, today, lookback=DEFAULT_LOOKBACK):
+        sku_col = 'product_name' if 'product_name' in df.columns else 'product'
+        start = today - pd.Timedelta(days=lookback - 1)
+        # SKUs with no sales in the window still get a row (zero demand)
+        codes, skus = pd.factorize(df[sku_col], sort=True)
+        self.skus = pd.Index(skus, name='product_name')
+        self.category = (df[['product']].assign(_code=codes)
+                         .drop_duplicates('_code').set_index('_code')['product']
+                         .reindex(range(len(skus))).to_numpy())
+        days = df['date'].dt.normalize()
+        in_window = ((days >= start) & (days <= today)).to_numpy() & (codes >= 0)
+        offsets = (days - start).dt.days.to_numpy()[in_window]
+        flat = codes[in_window] * lookback + offsets
+        units = np.bincount(flat, weights=df['quantity'].to_numpy(dtype=float)[in_window],
+                            minlength=len(skus) * lookback).reshape(len(skus), lookback)
+        self.lookback = lookback
+        self.mean = units.mean(axis=1)
+        self.std = units.std(axis=1, ddof=1) if lookback > 1 else np.zeros(len(skus))
+        self.units_total = units.sum(axis=1)
+
+
+def plan(stats, stock, service_level=DEFAULT_SERVICE_LEVEL):
+    """Vectorized stock plan for every SKU -> DataFrame indexed by product_name."""
+    z = NormalDist().inv_cdf(service_level)
+    s = stock.set_index('product_name').reindex(stats.skus)
+    known = s['current_stock'].notna().to_numpy()
+    on_hand = s['current_stock'].fillna(DEFAULT_STOCK).to_numpy(dtype=float)
+    lead = s['lead_time_days'].fillna(DEFAULT_LEAD_TIME).to_numpy(dtype=float)
+
+    mean, std = stats.mean, stats.std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.where(mean > 0, np.floor(on_hand / mean), NO_DEMAND_DAYS)
+    days_left = np.minimum(days_left, NO_DEMAND_DAYS)
+    safety = z * std * np.sqrt(lead)
+    reorder_point = mean * lead + safety
+    # Order up to the reorder point plus one more lead time of demand
+    order_qty = np.maximum(0, np.ceil(reorder_point + mean * lead - on_hand))
+    status = np.select([(on_hand <= safety) | (days_left < lead), on_hand <= reorder_point],
+                       ['critical', 'warning'], 'ok')
+    return pd.DataFrame({
+        'category': stats.category,
+        'current_stock': on_hand,
+        'stock_known': known,
+        'lead_time_days': lead,
+        'daily_mean': mean,
+        'daily_std': std,
+        'days_until_stockout': days_left.astype(int),
+        'safety_stock': np.ceil(safety),
+        'reorder_point': np.ceil(reorder_point),
+        'order_qty': order_qty,
+        'status': status,
+    }, index=stats.skus)
+
+
+def top_critical(table, k=20, status=None):
+    """The k SKUs closest to stock-out (argpartition, then sort only those k)."""
+    if status:
+        table = table[table['status'] == status]
+    n = len(table)
+    if n == 0 or k <= 0:
+        return table.iloc[:0]
+    key = table['days_until_stockout'].to_numpy()
+    k = min(k, n)
+    idx = np.argpartition(key, k - 1)[:k] if k < n else np.arange(n)
+    idx = idx[np.argsort(key[idx], kind='stable')]
+    return table.iloc[idx]
+
+
+def to_records(table):
+    return [{
+        'product_name': name,
+        'category': cat,
+        'current_stock': int(stock),
+        'stock_known': bool(known),
+        'lead_time_days': int(lead),
+        'daily_avg_sales': round(float(mean), 2),
+        'daily_std': round(float(std), 2),
+        'days_until_stockout': int(days),
+        'safety_stock': int(ss),
+        'reorder_point': int(rop),
+        'order_qty': int(qty),
+        'status': st,
+    } for name, cat, stock, known, lead, mean, std, days, ss, rop, qty, st in zip(
+        table.index, table['category'], table['current_stock'], table['stock_known'],
+        table['lead_time_days'], table['daily_mean'], table['daily_std'],
+        table['days_until_stockout'], table['safety_stock'], table['reorder_point'],
+        table['order_qty'], table['status'])]
@@ -1,7 +1,11 @@
 # File: llm.py
 import os
 import json
-import requests
+
+from llm_clients import get_session, get_genai_client, timeout as _timeout
+from llm_cache import CACHE_ENABLED, get_cache, make_key, replay_chunks
+from llm_router import get_router
+from prompt_builder import SYSTEM_PROMPT, compose_completion_prompt
 
 # Import configuration
 try:
@@ -56,50 +60,62 @@ except ImportError:
     _load_local_env()
 
 
-def load_llm():
+def load_llm(quantize=False, raise_errors=False):
     """Try to construct a lightweight local pipeline; return None if unavailable.
 
     Prefer using an external API (OpenAI) when `OPENAI_API_KEY` is set —
     `generate_insight` will choose the best available backend.
+    With `quantize=True` the model's Linear layers are converted to dynamic
+    int8 (CPU only), roughly halving memory and speeding up generation.
+    Callers that want to know *why* loading failed pass `raise_errors=True`.
     """
     try:
         from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-        model_name = "EleutherAI/gpt-neo-125M"
+        model_name = os.environ.get('LOCAL_LLM_MODEL', "EleutherAI/gpt-neo-125M")
         tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Batched generation needs a pad token; decoder-only models pad on the left
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = 'left'
         model = AutoModelForCausalLM.from_pretrained(model_name)
+        if quantize:
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
         return pipeline('text-generation', model=model, tokenizer=tokenizer)
     except Exception:
+        if raise_errors:
+            raise
         return None
 
 
 
-def _generate_with_openai(prompt, model_name=None):
+def _openai_url():
+    """Chat-completions URL; OPENAI_BASE_URL points at proxies or mock_llm_server.py."""
+    return os.environ.get('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/') + '/chat/completions'
+
+
+def _generate_with_openai(prompt, model_name=None, timeout_s=30):
     key = os.environ.get('OPENAI_API_KEY')
     if not key:
         raise RuntimeError('OPENAI_API_KEY not set')
     model_name = model_name or os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
-    url = 'https://api.openai.com/v1/chat/completions'
+    url = _openai_url()
     headers = {
         'Authorization': f'Bearer {key}',
         'Content-Type': 'application/json'
     }
-    system = (
-        "You are a senior retail business analyst advising a product manager. "
-        "Be professional, helpful and clear. Start with a one-line summary, then provide up to 3 concise recommendations, "
-        "and finish with 1 suggested next action the user can take. Reference any dashboard context if provided. "
-        "Keep language plain, use numbered or bullet lists where helpful, and be concise (two to five paragraphs)."
-    )
     payload = {
         'model': model_name,
         'messages': [
-            {'role': 'system', 'content': system},
+            {'role': 'system', 'content': SYSTEM_PROMPT},
             {'role': 'user', 'content': prompt}
         ],
         'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)),
         'max_tokens': int(os.environ.get('LLM_MAX_TOKENS', 512)),
         'top_p': float(os.environ.get('LLM_TOP_P', 0.95))
     }
-    resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=30)
+    resp = get_session('openai').post(url, headers=headers, data=json.dumps(payload), timeout=_timeout(timeout_s))
     resp.raise_for_status()
     data = resp.json()
     # Extract assistant message
@@ -107,13 +123,34 @@ def _generate_with_openai(prompt, model_name=None):
     return _polish_answer(out)
 
 
-def _generate_with_gemini(prompt, model_name=None):
-    """Call a Gemini-compatible endpoint.
-
-    Behaviors:
-    - If `GEMINI_API_URL` is set, POST JSON {"prompt": prompt} to it.
-    - Otherwise attempt a Google Generative API endpoint using `GEMINI_MODEL` or a sensible default.
-    The function attempts several common response shapes and returns the assistant text.
+def _pick_gemini_text(obj):
+    """Extract text from the common Gemini-compatible response shapes."""
+    if not obj:
+        return None
+    if isinstance(obj, dict):
+        if 'candidates' in obj and obj['candidates']:
+            return _gemini_chunk_text(obj)
+        if 'output' in obj and isinstance(obj['output'], list) and obj['output']:
+            first = obj['output'][0]
+            if isinstance(first, dict):
+                return first.get('content') or first.get('text')
+        if 'outputs' in obj and isinstance(obj['outputs'], list) and obj['outputs']:
+            first = obj['outputs'][0]
+            if isinstance(first, dict):
+                return first.get('content') or first.get('text')
+        if 'response' in obj and isinstance(obj['response'], str):
+            return obj['response']
+    if isinstance(obj, str):
+        return obj
+    return None
+
+
+def _gemini_routes(prompt, model_name=None):
+    """Return [(route_name, fn(timeout_s) -> text)] for every way of reaching Gemini.
+
+    Declared order mirrors the historical fallback chain: custom URL, then the
+    google.genai client, then each model x REST endpoint template. The router
+    reorders them by what actually worked recently.
     """
     key = os.environ.get('GEMINI_API_KEY')
     if not key:
@@ -122,142 +159,144 @@ def _generate_with_gemini(prompt, model_name=None):
     custom_url = os.environ.get('GEMINI_API_URL')
     headers = {'Content-Type': 'application/json'}
     use_bearer = key.startswith('ya29.') or key.lower().startswith('oauth') or os.environ.get('GEMINI_USE_BEARER', '').lower() == 'true'
+    params = {}
     if use_bearer:
         headers['Authorization'] = f'Bearer {key}'
+    else:
+        params['key'] = key
 
     # Compose a gentle system prefix to improve response quality and structure
-    system = (
-        "You are a senior retail business analyst. Answer professionally and helpfully: start with a one-line summary, "
-        "then list up to 3 actionable recommendations, and finish with a clear next step. Keep answers concise and structured."
-    )
-    composed_prompt = system + "\n\nUser: " + prompt + "\n\nAssistant:"
-    body = {'prompt': composed_prompt}
-
-    # Helper to extract text from common response shapes
-    def _pick_text(obj):
-        if not obj:
-            return None
-        if isinstance(obj, dict):
-            if 'candidates' in obj and obj['candidates']:
-                c = obj['candidates'][0]
-                return c.get('content') or c.get('output') or c.get('text')
-            if 'output' in obj and isinstance(obj['output'], list) and obj['output']:
-                first = obj['output'][0]
-                if isinstance(first, dict):
-                    return first.get('content') or first.get('text')
-            if 'outputs' in obj and isinstance(obj['outputs'], list) and obj['outputs']:
-                first = obj['outputs'][0]
-                if isinstance(first, dict):
-                    return first.get('content') or first.get('text')
-            if 'response' in obj and isinstance(obj['response'], str):
-                return obj['response']
-        if isinstance(obj, str):
-            return obj
-        return None
+    composed_prompt = compose_completion_prompt(prompt)
+    session = get_session('gemini')
 
-    import requests
+    # Allow GEMINI_MODEL to be comma-separated list; try each model in order
+    # Try gemini-2.5-flash-lite first, then fall back to gemini-2.0-flash
+    raw_models = model_name or os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite,gemini-2.0-flash')
+    model_list = [m.strip() for m in raw_models.split(',') if m.strip()]
 
-    # 1) custom URL
-    if custom_url:
-        url = custom_url
-        params = {}
-        if not use_bearer:
-            params['key'] = key
-        resp = requests.post(url, headers=headers, params=params, json=body, timeout=30)
-        resp.raise_for_status()
-        j = resp.json()
-        txt = _pick_text(j)
-        if txt:
-            return _polish_answer(txt)
-
-    # 1b) If google.genai client is available, prefer it (works with plain API keys)
-    try:
-        from google.genai import Client as GenAIClient  # type: ignore
-        try:
-            model_name = model_name or os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite')
-            client = GenAIClient(api_key=key)
-            # Use composed prompt so the model follows the system guidance
-            resp = client.models.generate_content(model=model_name, contents=composed_prompt)
+    def post(url, body):
+        def call(timeout_s):
+            resp = session.post(url, headers=headers, params=params, json=body, timeout=_timeout(timeout_s))
+            if resp.status_code != 200:
+                raise RuntimeError(f'{resp.status_code} from {url}: {resp.text[:200]}')
+            return _polish_answer(_pick_gemini_text(resp.json()))
+        return call
+
+    def genai(model):
+        def call(timeout_s):
+            client = get_genai_client(key)
+            try:
+                from google.genai import types as genai_types
+                # HttpOptions.timeout is in milliseconds
+                config = genai_types.GenerateContentConfig(
+                    http_options=genai_types.HttpOptions(timeout=int(timeout_s * 1000)))
+            except (ImportError, AttributeError, TypeError) as e:
+                # An SDK without per-request timeouts would hang past the router's
+                # deadline; fail fast so the REST routes are used instead
+                raise RuntimeError(f'google.genai has no request timeout support: {e}')
+            resp = client.models.generate_content(model=model, contents=composed_prompt, config=config)
             # Prefer .text if present, else try common attributes
             if hasattr(resp, 'text') and resp.text:
                 return _polish_answer(resp.text)
-            if hasattr(resp, 'output'):
-                # attempt to extract text from output structure
-                try:
-                    out = getattr(resp, 'output')
-                    if isinstance(out, (list, tuple)) and out:
-                        first = out[0]
-                        if isinstance(first, dict):
-                            return first.get('content') or first.get('text') or str(first)
-                except Exception:
-                    pass
-            # fallback to str(resp)
+            out = getattr(resp, 'output', None)
+            if isinstance(out, (list, tuple)) and out and isinstance(out[0], dict):
+                return out[0].get('content') or out[0].get('text') or str(out[0])
             return str(resp)
-        except Exception:
-            # if client fails, fall through to HTTP attempts
-            pass
+        return call
+
+    routes = []
+    # 1) custom URL
+    if custom_url:
+        routes.append(('gemini:custom', post(custom_url, {'prompt': composed_prompt})))
+    # 1b) google.genai client (works with plain API keys) when installed
+    try:
+        import google.genai  # type: ignore  # noqa: F401
+        routes.extend((f'gemini:genai:{m}', genai(m)) for m in model_list)
     except Exception:
-        # google.genai not installed; continue with HTTP
         pass
-
-    # 2) try known Google Generative Language endpoints
-    # Allow GEMINI_MODEL to be comma-separated list; try each model in order
-    # Try gemini-2.5-flash-lite first, then fall back to gemini-2.0-flash
-    raw_models = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite,gemini-2.0-flash')
-    model_list = [m.strip() for m in raw_models.split(',') if m.strip()]
-    # endpoints to try for each model (include v1, v1beta2, and generativeai v1)
+    # 2) known Google Generative Language endpoints (v1beta2, v1 and generativeai v1)
     endpoint_templates = [
         'https://generativelanguage.googleapis.com/v1beta2/models/{model}:generate',
         'https://generativelanguage.googleapis.com/v1/models/{model}:generate',
         'https://generativeai.googleapis.com/v1/models/{model}:generate',
     ]
-
-    last_err = None
+    payload = {'prompt': {'text': composed_prompt}, 'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)), 'maxOutputTokens': int(os.environ.get('LLM_MAX_TOKENS', 512))}
     for model in model_list:
         for tpl in endpoint_templates:
-            url_try = tpl.format(model=model)
-            try:
-                params = {}
-                if not use_bearer:
-                    params['key'] = key
-                payload = {'prompt': {'text': composed_prompt}, 'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)), 'maxOutputTokens': int(os.environ.get('LLM_MAX_TOKENS', 512))}
-                resp = requests.post(url_try, headers=headers, params=params, json=payload, timeout=30)
-                # Log non-200 responses for debugging
-                if resp.status_code != 200:
-                    try:
-                        body = resp.text
-                    except Exception:
-                        body = '<unreadable body>'
-                    last_err = (resp.status_code, url_try, body)
-                    continue
-                j = resp.json()
-                txt = _pick_text(j)
-                if txt:
-                    return _polish_answer(txt)
-            except Exception as e:
-                last_err = e
-                continue
-    # If we reach here, record helpful error
-    if last_err:
-        raise RuntimeError(f'Gemini API request failed or returned no usable text: {last_err}')
+            url = tpl.format(model=model)
+            routes.append((f"gemini:{url.split('/models/')[0].split('//')[1]}:{model}", post(url, payload)))
+    return routes
+
+
+def _generate_with_gemini(prompt, model_name=None):
+    """Call a Gemini-compatible endpoint through the latency-aware router.
+
+    Behaviors:
+    - If `GEMINI_API_URL` is set, POST JSON {"prompt": prompt} to it.
+    - Otherwise try the google.genai client and the Google Generative API endpoints
+      for each model in `GEMINI_MODEL` (comma-separated).
+    All routes share one overall deadline (`LLM_DEADLINE`); see llm_router.py.
+    """
+    try:
+        return get_router().run('gemini', _gemini_routes(prompt, model_name))
+    except RuntimeError as e:
+        raise RuntimeError(f'Gemini API request failed or returned no usable text: {e}')
+
+
+OFFLINE_PREFIX = "(Assistant offline)"
+
+
+def _active_model():
+    """Identify the backend/model that would answer right now (part of the cache key)."""
+    if os.environ.get('GEMINI_API_KEY'):
+        return 'gemini:' + os.environ.get('GEMINI_MODEL', '')
+    if os.environ.get('OPENAI_API_KEY'):
+        return 'openai:' + os.environ.get('OPENAI_MODEL', '')
+    return 'local'
+
+
+def _cache_key(prompt, lang, question, context):
+    # When the caller passes the raw question and dashboard context separately
+    # the key is (normalized question, lang, model, context hash); otherwise the
+    # full composed prompt stands in for the question.
+    return make_key(question if question is not None else prompt, lang, _active_model(), context)
+
 
+def generate_insight(llm, prompt, lang='en', question=None, context=None):
+    """Generate an insight string, served from the response cache when possible.
 
-def generate_insight(llm, prompt, lang='en'):
+    `question` and `context` are optional: pass the user's raw question and
+    the dashboard context text so equivalent questions share a cache entry.
+    """
+    if not CACHE_ENABLED:
+        return _generate_insight_uncached(llm, prompt, lang)
+    cache = get_cache()
+    key = _cache_key(prompt, lang, question, context)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    text = _generate_insight_uncached(llm, prompt, lang)
+    if text and not text.startswith(OFFLINE_PREFIX):
+        cache.set(key, text)
+    return text
+
+
+def _generate_insight_uncached(llm, prompt, lang='en'):
     """Generate an insight string.
 
-    Priority: OpenAI API (if API key present) -> local `llm` pipeline -> dummy response.
+    Priority: Gemini / OpenAI APIs (if keys present) -> local `llm` pipeline -> dummy response.
     """
-    # 1) OpenAI API if configured
+    # 1) Remote APIs: Gemini routes first (user said they added Gemini API),
+    # then OpenAI, all under one deadline with optional hedging
     try:
-        # Prefer Gemini if available (user said they added Gemini API)
+        routes = []
         if os.environ.get('GEMINI_API_KEY'):
-            try:
-                return _generate_with_gemini(prompt)
-            except Exception:
-                # fall through to OpenAI or local
-                pass
+            routes.extend(_gemini_routes(prompt))
         if os.environ.get('OPENAI_API_KEY'):
-            return _generate_with_openai(prompt)
+            model = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+            routes.append((f'openai:{model}', lambda timeout_s: _generate_with_openai(prompt, timeout_s=timeout_s)))
+        if routes:
+            return get_router().run('chat', routes)
     except Exception:
         # If API call fails, fall back to other methods
         pass
@@ -273,38 +312,97 @@ def generate_insight(llm, prompt, lang='en'):
             pass
 
     # 3) Dummy fallback
-    return f"(Assistant offline) Short answer: {prompt[:200]}"
+    return f"{OFFLINE_PREFIX} Short answer: {prompt[:200]}"
+
 
+def generate_insight_stream(llm, prompt, lang='en', question=None, context=None):
+    """Stream an answer; cached answers are replayed as word-aligned chunks.
 
-def generate_insight_stream(llm, prompt):
+    A fresh answer is stored once the upstream stream completes normally.
+    """
+    if not CACHE_ENABLED:
+        yield from _generate_insight_stream_uncached(llm, prompt, lang)
+        return
+    cache = get_cache()
+    key = _cache_key(prompt, lang, question, context)
+    cached = cache.get(key)
+    if cached is not None:
+        yield from replay_chunks(cached)
+        return
+    parts = []
+    status = {}
+    for chunk in _generate_insight_stream_uncached(llm, prompt, lang, status):
+        if chunk:
+            parts.append(chunk)
+        yield chunk
+    text = ''.join(parts)
+    if text and not status.get('truncated') and not text.startswith(OFFLINE_PREFIX):
+        cache.set(key, text)
+
+
+def _generate_insight_stream_uncached(llm, prompt, lang='en', status=None):
     """Yield incremental text chunks from the best available streaming backend.
 
-    Order: Gemini streaming -> OpenAI streaming -> fallback single response.
+    Order: Gemini streaming -> Gemini single response -> OpenAI streaming ->
+    fallback single response. A backend that fails after it has already
+    produced text ends the stream rather than restarting on another backend,
+    which would repeat the beginning of the answer; status['truncated'] is
+    then set so the partial answer is not cached.
     """
-    # Prefer a client-backed (non-streaming) Gemini call when available so
-    # the chat UI receives a response even if streaming endpoints are not
-    # available for the key. This yields a single chunk with the full text.
-    try:
-        if os.environ.get('GEMINI_API_KEY'):
-            try:
-                txt = _generate_with_gemini(prompt)
+    status = {} if status is None else status
+    if os.environ.get('GEMINI_API_KEY'):
+        produced = False
+        try:
+            for chunk in _stream_gemini(prompt):
+                if chunk:
+                    produced = True
+                    yield chunk
+            if produced:
+                return
+        except Exception:
+            if produced:
+                status['truncated'] = True
+                return
+        try:
+            txt = _generate_with_gemini(prompt)
+            if txt:
                 yield txt
                 return
-            except Exception:
-                # Fall through to streaming attempts
-                pass
-    except Exception:
-        pass
+        except Exception:
+            pass
 
-    try:
-        if os.environ.get('OPENAI_API_KEY'):
+    if os.environ.get('OPENAI_API_KEY'):
+        produced = False
+        try:
             for chunk in _stream_openai(prompt):
-                yield chunk
-            return
-    except Exception:
-        pass
+                if chunk:
+                    produced = True
+                    yield chunk
+            if produced:
+                return
+        except Exception:
+            if produced:
+                status['truncated'] = True
+                return
 
-    yield generate_insight(llm, prompt)
+    yield _generate_insight_uncached(llm, prompt, lang)
+
+
+def _iter_sse_data(resp):
+    """Yield the payload of each `data:` line of a Server-Sent Events response.
+
+    Reads with chunk_size=None so lines are handed over as soon as the socket
+    delivers them instead of waiting for a fixed-size buffer to fill. SSE is
+    UTF-8 by definition; requests would otherwise guess ISO-8859-1 for text/*
+    and mangle Bengali output.
+    """
+    resp.encoding = 'utf-8'
+    for raw in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if not raw:
+            continue
+        line = raw.lstrip()
+        if line.startswith('data:'):
+            yield line[len('data:'):].strip()
 
 
 def _stream_openai(prompt, model_name=None):
@@ -312,118 +410,107 @@ def _stream_openai(prompt, model_name=None):
     if not key:
         raise RuntimeError('OPENAI_API_KEY not set')
     model_name = model_name or os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
-    url = 'https://api.openai.com/v1/chat/completions'
+    url = _openai_url()
     headers = {'Authorization': f'Bearer {key}', 'Content-Type': 'application/json'}
-    system = (
-        "You are a senior retail business analyst. Provide a brief summary, up to 3 recommendations, and one next step. "
-        "Keep the tone professional and helpful; prefer numbered recommendations when useful."
-    )
     payload = {
         'model': model_name,
         'messages': [
-            {'role': 'system', 'content': system},
+            {'role': 'system', 'content': SYSTEM_PROMPT},
             {'role': 'user', 'content': prompt}
         ],
         'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)),
         'stream': True
     }
-    resp = requests.post(url, headers=headers, data=json.dumps(payload), stream=True, timeout=60)
+    resp = get_session('openai').post(url, headers=headers, data=json.dumps(payload), stream=True, timeout=_timeout(60))
     resp.raise_for_status()
-    for raw in resp.iter_lines(decode_unicode=True):
-        if not raw:
-            continue
-        line = raw.lstrip()
-        if line.startswith('data:'):
-            data = line[len('data:'):].strip()
-            if data == '[DONE]':
-                break
-            try:
-                j = json.loads(data)
-                for ch in j.get('choices', []):
-                    delta = ch.get('delta', {})
-                    content = delta.get('content')
-                    if content:
-                        yield content
-            except Exception:
-                yield data
+    for data in _iter_sse_data(resp):
+        if data == '[DONE]':
+            break
+        try:
+            j = json.loads(data)
+            for ch in j.get('choices', []):
+                delta = ch.get('delta', {})
+                content = delta.get('content')
+                if content:
+                    yield content
+        except Exception:
+            yield data
+
+
+def _gemini_chunk_text(obj):
+    """Extract the text delta from one streamGenerateContent / generateContent object."""
+    if not isinstance(obj, dict):
+        return None
+    cands = obj.get('candidates') or []
+    if cands:
+        content = cands[0].get('content')
+        if isinstance(content, dict):
+            return ''.join(p.get('text', '') for p in content.get('parts', []) if isinstance(p, dict)) or None
+        return content or cands[0].get('output') or cands[0].get('text')
+    return obj.get('text') or obj.get('output') or obj.get('response')
 
 
 def _stream_gemini(prompt, model_name=None):
+    """Stream Gemini output chunk by chunk.
+
+    Uses google.genai's generate_content_stream when installed, otherwise the
+    REST `:streamGenerateContent?alt=sse` endpoint. `GEMINI_STREAM_URL` (or
+    `GEMINI_API_URL`) overrides the endpoint, e.g. to point at
+    mock_llm_server.py; a non-SSE JSON reply from an override is accepted and
+    yielded as a single chunk.
+    """
     key = os.environ.get('GEMINI_API_KEY')
     if not key:
         raise RuntimeError('GEMINI_API_KEY not set')
-    custom_url = os.environ.get('GEMINI_API_URL')
-    headers = {'Content-Type': 'application/json'}
-    use_bearer = key.startswith('ya29.') or key.lower().startswith('oauth') or os.environ.get('GEMINI_USE_BEARER', '').lower() == 'true'
-    if use_bearer:
-        headers['Authorization'] = f'Bearer {key}'
-    params = {}
-    if not use_bearer:
-        params['key'] = key
+    model_name = model_name or os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite').split(',')[0].strip()
+    composed_prompt = compose_completion_prompt(prompt)
+    custom_url = os.environ.get('GEMINI_STREAM_URL') or os.environ.get('GEMINI_API_URL')
 
-    body = {'prompt': prompt}
-    urls = []
-    if custom_url:
-        urls.append(custom_url)
-    # Use model name without extra 'models/' prefix; construct endpoints accordingly
-    model_name = model_name or os.environ.get('GEMINI_MODEL', 'gemini-2.0-flash')
-    urls.extend([
-        f'https://generativelanguage.googleapis.com/v1beta2/models/{model_name}:generate',
-        f'https://generativeai.googleapis.com/v1/models/{model_name}:generate'
-    ])
-
-    # Prefer google.genai client streaming when available (yield full text as single chunk)
-    try:
-        from google.genai import Client as GenAIClient  # type: ignore
+    if not custom_url:
         try:
-            model_name = model_name or os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite')
-            client = GenAIClient(api_key=key)
-            resp = client.models.generate_content(model=model_name, contents=prompt)
-            text = None
-            if hasattr(resp, 'text') and resp.text:
-                text = resp.text
-            else:
-                try:
-                    j = resp
-                    # attempt to extract text-like fields
-                    if isinstance(j, dict):
-                        text = j.get('text') or j.get('content')
-                except Exception:
-                    text = str(resp)
-            if text:
-                yield text
-                return
+            client = get_genai_client(key)
         except Exception:
-            pass
-    except Exception:
-        pass
+            client = None
+        if client is not None:
+            for chunk in client.models.generate_content_stream(model=model_name, contents=composed_prompt):
+                text = getattr(chunk, 'text', None)
+                if text:
+                    yield text
+            return
 
-    for url in urls:
-        try:
-            r = requests.post(url, headers=headers, params=params, json=body, stream=True, timeout=60)
-            r.raise_for_status()
-            for chunk in r.iter_lines(decode_unicode=True):
-                if not chunk:
-                    continue
-                try:
-                    j = json.loads(chunk)
-                    if isinstance(j, dict):
-                        txt = j.get('text') or j.get('output') or j.get('content')
-                        if not txt and 'candidates' in j and j['candidates']:
-                            cand = j['candidates'][0]
-                            txt = cand.get('content') or cand.get('output') or cand.get('text')
-                        if txt:
-                            yield txt
-                        else:
-                            yield chunk
-                    else:
-                        yield chunk
-                except Exception:
-                    yield chunk
+    headers = {'Content-Type': 'application/json', 'Accept': 'text/event-stream'}
+    use_bearer = key.startswith('ya29.') or key.lower().startswith('oauth') or os.environ.get('GEMINI_USE_BEARER', '').lower() == 'true'
+    params = {'alt': 'sse'}
+    if use_bearer:
+        headers['Authorization'] = f'Bearer {key}'
+    else:
+        params['key'] = key
+    url = custom_url or f'https://generativelanguage.googleapis.com/v1beta/models/{model_name}:streamGenerateContent'
+    body = {
+        'contents': [{'role': 'user', 'parts': [{'text': composed_prompt}]}],
+        'generationConfig': {
+            'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)),
+            'maxOutputTokens': int(os.environ.get('LLM_MAX_TOKENS', 512)),
+        },
+        # Legacy shape understood by simple custom endpoints
+        'prompt': composed_prompt,
+    }
+    r = get_session('gemini').post(url, headers=headers, params=params, json=body, stream=True, timeout=_timeout(60))
+    r.raise_for_status()
+    if 'text/event-stream' not in r.headers.get('Content-Type', ''):
+        text = _gemini_chunk_text(r.json())
+        if text:
+            yield text
+        return
+    for data in _iter_sse_data(r):
+        if data == '[DONE]':
             break
-        except Exception:
-            continue
-    return
+        try:
+            text = _gemini_chunk_text(json.loads(data))
+        except ValueError:
+            text = data
+        if text:
+            yield text
 
 
 def _polish_answer(text: str) -> str:
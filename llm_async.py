@@ -0,0 +1,318 @@
+# File: llm_async.py
+# asyncio variants of generate_insight / generate_insight_stream.
+#
+# The Flask views in app.py are synchronous, so every in-flight chat pins a
+# gunicorn sync worker for the whole generation. An async server (Quart,
+# an ASGI wrapper, a websocket bridge) can instead await these:
+#
+#     text = await async_generate_insight(None, prompt, lang='bn')
+#     async for chunk in async_generate_insight_stream(None, prompt):
+#         ...
+#
+# Upstream calls go through httpx.AsyncClient when httpx is installed, with
+# one concurrency semaphore per backend. Identical in-flight prompts are
+# coalesced (single-flight): N simultaneous identical requests make one
+# upstream call and all N receive the same answer/chunks. Without httpx the
+# blocking llm.py path runs in a worker thread so callers still never block
+# the event loop.
+
+import asyncio
+import json
+import os
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except Exception:
+    httpx = None
+    HTTPX_AVAILABLE = False
+
+import llm as _llm
+from llm_cache import CACHE_ENABLED, get_cache, replay_chunks
+from prompt_builder import SYSTEM_PROMPT, compose_completion_prompt
+
+
+MAX_CONCURRENCY = {
+    'gemini': int(os.environ.get('LLM_ASYNC_GEMINI_CONCURRENCY', 16)),
+    'openai': int(os.environ.get('LLM_ASYNC_OPENAI_CONCURRENCY', 16)),
+}
+ASYNC_TIMEOUT = float(os.environ.get('LLM_DEADLINE', 25))
+
+# Per-event-loop state: (loop, httpx client, semaphores)
+_state = {'loop': None, 'client': None, 'semaphores': {}}
+_flights = {}
+_stream_flights = {}
+
+
+def _loop_state():
+    loop = asyncio.get_running_loop()
+    if _state['loop'] is not loop:
+        _state['loop'] = loop
+        _state['client'] = None
+        _state['semaphores'] = {name: asyncio.Semaphore(n) for name, n in MAX_CONCURRENCY.items()}
+        _flights.clear()
+        _stream_flights.clear()
+    return _state
+
+
+def _client():
+    st = _loop_state()
+    if st['client'] is None:
+        limits = httpx.Limits(max_connections=sum(MAX_CONCURRENCY.values()), max_keepalive_connections=16)
+        st['client'] = httpx.AsyncClient(timeout=httpx.Timeout(ASYNC_TIMEOUT, connect=5.0), limits=limits)
+    return st['client']
+
+
+async def aclose():
+    """Close the shared AsyncClient (call on server shutdown)."""
+    client = _state.get('client')
+    _state['client'] = None
+    if client is not None:
+        await client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+def _gemini_request():
+    key = os.environ.get('GEMINI_API_KEY')
+    headers = {'Content-Type': 'application/json'}
+    params = {}
+    if key.startswith('ya29.') or key.lower().startswith('oauth') or os.environ.get('GEMINI_USE_BEARER', '').lower() == 'true':
+        headers['Authorization'] = f'Bearer {key}'
+    else:
+        params['key'] = key
+    model = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash-lite').split(',')[0].strip()
+    return headers, params, model
+
+
+def _gemini_body(prompt):
+    composed = compose_completion_prompt(prompt)
+    return {
+        'contents': [{'role': 'user', 'parts': [{'text': composed}]}],
+        'generationConfig': {
+            'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)),
+            'maxOutputTokens': int(os.environ.get('LLM_MAX_TOKENS', 512)),
+        },
+        'prompt': composed,
+    }
+
+
+def _openai_request(prompt, stream):
+    key = os.environ.get('OPENAI_API_KEY')
+    payload = {
+        'model': os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo'),
+        'messages': [
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user', 'content': prompt},
+        ],
+        'temperature': float(os.environ.get('LLM_TEMPERATURE', 0.25)),
+        'max_tokens': int(os.environ.get('LLM_MAX_TOKENS', 512)),
+    }
+    if stream:
+        payload['stream'] = True
+    headers = {'Authorization': f'Bearer {key}', 'Content-Type': 'application/json'}
+    return _llm._openai_url(), headers, payload
+
+
+async def _agenerate_gemini(prompt):
+    headers, params, model = _gemini_request()
+    url = os.environ.get('GEMINI_API_URL') or f'https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent'
+    async with _loop_state()['semaphores']['gemini']:
+        resp = await _client().post(url, headers=headers, params=params, json=_gemini_body(prompt))
+    resp.raise_for_status()
+    return _llm._polish_answer(_llm._pick_gemini_text(resp.json()))
+
+
+async def _agenerate_openai(prompt):
+    url, headers, payload = _openai_request(prompt, stream=False)
+    async with _loop_state()['semaphores']['openai']:
+        resp = await _client().post(url, headers=headers, json=payload)
+    resp.raise_for_status()
+    return _llm._polish_answer(resp.json()['choices'][0]['message']['content'])
+
+
+async def _aiter_sse(resp):
+    async for line in resp.aiter_lines():
+        line = line.strip()
+        if line.startswith('data:'):
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                return
+            yield data
+
+
+async def _astream_gemini(prompt):
+    headers, params, model = _gemini_request()
+    params['alt'] = 'sse'
+    url = (os.environ.get('GEMINI_STREAM_URL') or os.environ.get('GEMINI_API_URL')
+           or f'https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent')
+    async with _loop_state()['semaphores']['gemini']:
+        async with _client().stream('POST', url, headers=headers, params=params, json=_gemini_body(prompt)) as resp:
+            resp.raise_for_status()
+            if 'text/event-stream' not in resp.headers.get('content-type', ''):
+                text = _llm._gemini_chunk_text(json.loads(await resp.aread()))
+                if text:
+                    yield text
+                return
+            async for data in _aiter_sse(resp):
+                try:
+                    text = _llm._gemini_chunk_text(json.loads(data))
+                except ValueError:
+                    text = data
+                if text:
+                    yield text
+
+
+async def _astream_openai(prompt):
+    url, headers, payload = _openai_request(prompt, stream=True)
+    async with _loop_state()['semaphores']['openai']:
+        async with _client().stream('POST', url, headers=headers, json=payload) as resp:
+            resp.raise_for_status()
+            async for data in _aiter_sse(resp):
+                try:
+                    for ch in json.loads(data).get('choices', []):
+                        content = ch.get('delta', {}).get('content')
+                        if content:
+                            yield content
+                except ValueError:
+                    yield data
+
+
+async def _agenerate_uncached(llm, prompt, lang):
+    if HTTPX_AVAILABLE:
+        backends = []
+        if os.environ.get('GEMINI_API_KEY'):
+            backends.append(_agenerate_gemini)
+        if os.environ.get('OPENAI_API_KEY'):
+            backends.append(_agenerate_openai)
+        for backend in backends:
+            try:
+                text = await asyncio.wait_for(backend(prompt), ASYNC_TIMEOUT)
+                if text:
+                    return text
+            except Exception:
+                continue
+    # Router / local pipeline / offline fallback live in the sync path
+    return await asyncio.to_thread(_llm._generate_insight_uncached, llm, prompt, lang)
+
+
+async def _astream_uncached(llm, prompt, lang):
+    # A backend failing before any output falls through to the next one; after
+    # partial output the error propagates so the flight records it (subscribers
+    # keep what they got, and the truncated answer is not cached).
+    if HTTPX_AVAILABLE:
+        backends = []
+        if os.environ.get('GEMINI_API_KEY'):
+            backends.append(_astream_gemini)
+        if os.environ.get('OPENAI_API_KEY'):
+            backends.append(_astream_openai)
+        for backend in backends:
+            produced = False
+            try:
+                async for chunk in backend(prompt):
+                    if chunk:
+                        produced = True
+                        yield chunk
+            except Exception:
+                if produced:
+                    raise
+                continue
+            if produced:
+                return
+    yield await asyncio.to_thread(_llm._generate_insight_uncached, llm, prompt, lang)
+
+
+# ---------------------------------------------------------------------------
+# Single-flight coalescing
+# ---------------------------------------------------------------------------
+
+class _StreamFlight:
+    """Fan one upstream chunk stream out to every coalesced subscriber."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = asyncio.Condition()
+
+    async def pump(self, agen):
+        try:
+            async for chunk in agen:
+                async with self.cond:
+                    self.chunks.append(chunk)
+                    self.cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self.cond:
+                self.done = True
+                self.cond.notify_all()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            async with self.cond:
+                while i >= len(self.chunks) and not self.done:
+                    await self.cond.wait()
+                batch = self.chunks[i:]
+                finished = self.done
+            for chunk in batch:
+                yield chunk
+            i += len(batch)
+            if finished and i >= len(self.chunks):
+                if self.error is not None and not self.chunks:
+                    raise self.error
+                return
+
+
+async def async_generate_insight(llm, prompt, lang='en', question=None, context=None):
+    """Async counterpart of llm.generate_insight (same cache, coalesced upstream)."""
+    key = _llm._cache_key(prompt, lang, question, context)
+    cache = get_cache() if CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    _loop_state()
+    fut = _flights.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(_agenerate_uncached(llm, prompt, lang))
+        _flights[key] = fut
+        fut.add_done_callback(lambda _f, k=key: _flights.pop(k, None))
+    # shield: one caller cancelling must not cancel the shared upstream call
+    text = await asyncio.shield(fut)
+    if cache is not None and text and not text.startswith(_llm.OFFLINE_PREFIX):
+        cache.set(key, text)
+    return text
+
+
+async def async_generate_insight_stream(llm, prompt, lang='en', question=None, context=None):
+    """Async counterpart of llm.generate_insight_stream.
+
+    Concurrent identical prompts subscribe to one upstream stream; each
+    subscriber receives every chunk from the beginning.
+    """
+    key = _llm._cache_key(prompt, lang, question, context)
+    cache = get_cache() if CACHE_ENABLED else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            for chunk in replay_chunks(cached):
+                yield chunk
+            return
+    _loop_state()
+    flight = _stream_flights.get(key)
+    leader = flight is None
+    if leader:
+        flight = _StreamFlight()
+        _stream_flights[key] = flight
+        task = asyncio.ensure_future(flight.pump(_astream_uncached(llm, prompt, lang)))
+        task.add_done_callback(lambda _t, k=key: _stream_flights.pop(k, None))
+    async for chunk in flight.subscribe():
+        yield chunk
+    if leader and cache is not None and flight.error is None:
+        text = ''.join(c for c in flight.chunks if c)
+        if text and not text.startswith(_llm.OFFLINE_PREFIX):
+            cache.set(key, text)
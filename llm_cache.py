@@ -0,0 +1,185 @@
+# File: llm_cache.py
+# Response cache in front of generate_insight / generate_insight_stream.
+#
+# Many staff ask the same handful of questions ("why restock clothing?")
+# against the same dashboard state, so answers are cached by
+# (normalized question, language, model, hash of dashboard context).
+# Tier 1 is an in-process LRU with TTL; tier 2 is an optional SQLite file
+# shared by every gunicorn worker on the host (set LLM_CACHE_DB).
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+CACHE_TTL = float(os.environ.get('LLM_CACHE_TTL', 1800))
+CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 512))
+CACHE_DB = os.environ.get('LLM_CACHE_DB', '')
+CACHE_ENABLED = os.environ.get('LLM_CACHE', 'true').lower() not in ('0', 'false', 'no')
+
+# Punctuation (ASCII + Bengali danda) and filler that does not change meaning
+_PUNCT_RE = re.compile(r"[\s\.,!?;:'\"()\[\]{}।॥\-–—…]+")
+_FILLER = {'please', 'pls', 'kindly', 'can', 'you', 'could', 'tell', 'me', 'the', 'a', 'an'}
+
+
+def normalize_prompt(text):
+    """Canonical form of a question so trivially different phrasings share a key.
+
+    Unicode NFKC, case-folded, punctuation collapsed and a few English filler
+    words dropped ("Please, why restock clothing?" == "why restock clothing").
+    Bengali text keeps every word; only punctuation and spacing are folded.
+    """
+    if not text:
+        return ''
+    t = unicodedata.normalize('NFKC', str(text)).casefold()
+    words = [w for w in _PUNCT_RE.split(t) if w]
+    kept = [w for w in words if w not in _FILLER]
+    return ' '.join(kept or words)
+
+
+def context_hash(context):
+    if not context:
+        return ''
+    return hashlib.sha1(str(context).encode('utf-8')).hexdigest()
+
+
+def make_key(question, lang='en', model='', context=None):
+    raw = '\x1f'.join([normalize_prompt(question), lang or 'en', model or '', context_hash(context)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL in memory, optionally backed by a shared SQLite table."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, db_path=CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.db_path:
+            self._init_db()
+
+    # -- SQLite tier -------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        try:
+            d = os.path.dirname(self.db_path)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+            conn = self._connect()
+            conn.execute('CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response TEXT, expires REAL)')
+            conn.commit()
+            conn.close()
+        except Exception:
+            self.db_path = ''
+
+    def _db_get(self, key, now):
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT response, expires FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            conn.close()
+        except Exception:
+            return None
+        if row and row[1] > now:
+            return row
+        return None
+
+    def _db_set(self, key, value, expires):
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO llm_cache (key, response, expires) VALUES (?, ?, ?)', (key, value, expires))
+            conn.execute('DELETE FROM llm_cache WHERE expires < ?', (time.time(),))
+            conn.commit()
+            conn.close()
+        except Exception:
+            pass
+
+    # -- public API --------------------------------------------------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        if self.db_path:
+            row = self._db_get(key, now)
+            if row is not None:
+                with self._lock:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if not value:
+            return
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires)
+        if self.db_path:
+            self._db_set(key, value, expires)
+
+    def _store(self, key, value, expires):
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        if self.db_path:
+            try:
+                conn = self._connect()
+                conn.execute('DELETE FROM llm_cache')
+                conn.commit()
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+def replay_chunks(text, chunk_chars=48):
+    """Split a cached answer back into word-aligned chunks for the stream endpoint."""
+    if not text:
+        return
+    buf = ''
+    for word in re.split(r'(\s+)', text):
+        buf += word
+        if len(buf) >= chunk_chars:
+            yield buf
+            buf = ''
+    if buf:
+        yield buf
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,128 @@
+# File: llm_clients.py
+# Long-lived HTTP sessions and cached SDK clients for the LLM backends.
+#
+# Every call in llm.py used to go through module-level `requests.post` and
+# construct a fresh google.genai Client, paying a new TCP + TLS handshake per
+# chat message. This module keeps one pooled `requests.Session` per backend
+# (thread-safe to share across gunicorn threads for plain POSTs) and one
+# genai client per API key.
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib3.util.retry import Retry
+except Exception:  # very old urllib3
+    Retry = None
+
+
+# Tunables (environment overrides keep deployment config in one place)
+POOL_CONNECTIONS = int(os.environ.get('LLM_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.environ.get('LLM_POOL_MAXSIZE', 16))
+RETRY_TOTAL = int(os.environ.get('LLM_RETRY_TOTAL', 2))
+RETRY_BACKOFF = float(os.environ.get('LLM_RETRY_BACKOFF', 0.3))
+RETRY_BACKOFF_MAX = float(os.environ.get('LLM_RETRY_BACKOFF_MAX', 2))
+CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+
+_sessions = {}
+_genai_clients = {}
+_lock = threading.Lock()
+
+
+def _build_retry():
+    """Retry policy for transient upstream failures.
+
+    Only connection failures (the request never reached the server) and
+    status codes on idempotent methods are retried. LLM completions are
+    POSTs and every retry would be billed again, so 429/5xx answers are left
+    to the router (llm_router.py), whose breakers and hedging work within
+    the request deadline. Retry-After is not honoured here: an upstream
+    asking for a minute's wait must not hold a router thread that long.
+    """
+    if Retry is None:
+        return RETRY_TOTAL
+    kwargs = dict(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=0,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+        respect_retry_after_header=False,
+    )
+    try:
+        retry = Retry(allowed_methods=frozenset(['GET']), backoff_max=RETRY_BACKOFF_MAX, **kwargs)
+    except TypeError:
+        try:
+            retry = Retry(allowed_methods=frozenset(['GET']), **kwargs)
+        except TypeError:
+            # urllib3 < 1.26 uses `method_whitelist`
+            retry = Retry(method_whitelist=frozenset(['GET']), **kwargs)
+        retry.BACKOFF_MAX = RETRY_BACKOFF_MAX  # urllib3 < 2 reads the cap from the instance/class
+    return retry
+
+
+def _build_session():
+    s = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=_build_retry(),
+        pool_block=False,
+    )
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    s.headers.update({'Connection': 'keep-alive'})
+    return s
+
+
+def get_session(backend):
+    """Return the shared pooled session for `backend` ('openai', 'gemini', ...)."""
+    s = _sessions.get(backend)
+    if s is not None:
+        return s
+    with _lock:
+        s = _sessions.get(backend)
+        if s is None:
+            s = _build_session()
+            _sessions[backend] = s
+        return s
+
+
+def timeout(read_seconds):
+    """(connect, read) timeout tuple: fail fast on connect, allow long generations."""
+    return (CONNECT_TIMEOUT, read_seconds)
+
+
+def get_genai_client(api_key):
+    """Return a cached google.genai Client for `api_key`.
+
+    Raises ImportError when google.genai is not installed so callers can
+    fall through to the HTTP endpoints exactly as before.
+    """
+    client = _genai_clients.get(api_key)
+    if client is not None:
+        return client
+    from google.genai import Client as GenAIClient  # type: ignore
+    with _lock:
+        client = _genai_clients.get(api_key)
+        if client is None:
+            client = GenAIClient(api_key=api_key)
+            _genai_clients[api_key] = client
+        return client
+
+
+def reset_clients():
+    """Close and forget all pooled sessions and cached clients (tests, key rotation)."""
+    with _lock:
+        for s in _sessions.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _sessions.clear()
+        _genai_clients.clear()
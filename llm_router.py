@@ -0,0 +1,258 @@
+# File: llm_router.py
+# Latency-aware routing across LLM backends with circuit breakers.
+#
+# llm.py used to walk a fixed list (custom URL -> genai client -> 2 models x
+# 3 endpoint templates -> OpenAI) with 30s timeouts each, so one chat could
+# hang for minutes. The router instead:
+#   - tries the route that last succeeded first, then the others by
+#     observed error rate and latency;
+#   - skips routes whose circuit breaker is open;
+#   - enforces one overall deadline per request;
+#   - optionally hedges: if the first route has not answered after
+#     `hedge_after` seconds a second one is started and the first success wins;
+#   - caps the calls each route may have in flight, so threads left running
+#     by abandoned attempts cannot take over the shared pool.
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+REQUEST_DEADLINE = float(os.environ.get('LLM_DEADLINE', 25))
+ATTEMPT_TIMEOUT = float(os.environ.get('LLM_ATTEMPT_TIMEOUT', 15))
+HEDGE_AFTER = float(os.environ.get('LLM_HEDGE_AFTER', 0)) or None
+BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', 3))
+BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', 30))
+ROUTE_MAX_INFLIGHT = int(os.environ.get('LLM_ROUTE_MAX_INFLIGHT', 2))
+EWMA_ALPHA = 0.3
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; half-open after `cooldown`."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        """Free the half-open slot of a trial call whose outcome will not be recorded."""
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = None  # EWMA seconds of successful calls
+        self.breaker = CircuitBreaker()
+        # Held from submit until fn returns, including after the router gave up on it
+        self.slots = threading.BoundedSemaphore(max(1, ROUTE_MAX_INFLIGHT))
+
+    @property
+    def error_rate(self):
+        return (self.errors / self.calls) if self.calls else 0.0
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'error_rate': round(self.error_rate, 3),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'breaker': self.breaker.state,
+        }
+
+
+class Router:
+    def __init__(self, max_workers=8):
+        self._stats = {}
+        self._last_good = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-route')
+
+    def _route(self, name):
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = RouteStats()
+        return st
+
+    def _order(self, group, attempts):
+        """Last-good route first, then by error rate, latency and declared order."""
+        last = self._last_good.get(group)
+
+        def key(item):
+            idx, (name, _fn) = item
+            st = self._route(name)
+            lat = st.latency if st.latency is not None else ATTEMPT_TIMEOUT
+            return (0 if name == last else 1, round(st.error_rate, 1), lat, idx)
+
+        with self._lock:
+            ordered = [a for _, a in sorted(enumerate(attempts), key=key)]
+            return [a for a in ordered if self._route(a[0]).breaker.state != 'open']
+
+    def _record(self, group, name, ok, elapsed):
+        with self._lock:
+            st = self._route(name)
+            st.calls += 1
+            if ok:
+                st.latency = elapsed if st.latency is None else (EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * st.latency)
+                st.breaker.record_success()
+                self._last_good[group] = name
+            else:
+                st.errors += 1
+                st.breaker.record_failure()
+
+    def _call(self, group, name, fn, timeout_s, abandoned, slots):
+        t0 = time.monotonic()
+        try:
+            out = fn(timeout_s)
+            if not out:
+                raise RuntimeError(f'{name} returned no text')
+        except Exception:
+            if not abandoned.is_set():
+                self._record(group, name, False, time.monotonic() - t0)
+            raise
+        finally:
+            slots.release()
+        # A route that answers after we gave up on it must not become "last good"
+        if not abandoned.is_set():
+            self._record(group, name, True, time.monotonic() - t0)
+        return out
+
+    def _abandon(self, group, name, started, abandoned):
+        abandoned.set()
+        self._record(group, name, False, time.monotonic() - started)
+
+    def _release(self, name, abandoned):
+        # Losing hedge: neither success nor failure, but a half-open trial slot must be freed
+        abandoned.set()
+        with self._lock:
+            self._route(name).breaker.release_trial()
+
+    def run(self, group, attempts, deadline=None, hedge_after=HEDGE_AFTER):
+        """Return the first successful result of `attempts` within `deadline` seconds.
+
+        `attempts` is a list of (route_name, fn) where fn(timeout_seconds)
+        returns text or raises. Routes that overrun are abandoned (their
+        threads finish in the background) and counted as failures.
+        """
+        deadline_at = time.monotonic() + (deadline or REQUEST_DEADLINE)
+        queue = self._order(group, attempts)
+        pending = {}
+        last_err = None
+
+        def launch():
+            # Breaker admission happens at launch so an unused half-open slot is not consumed.
+            # A route whose in-flight cap is reached (e.g. by abandoned calls still
+            # hanging) is skipped rather than queued behind them.
+            while queue:
+                name, fn = queue.pop(0)
+                with self._lock:
+                    st = self._route(name)
+                    if not st.slots.acquire(blocking=False):
+                        continue
+                    if not st.breaker.allow():
+                        st.slots.release()
+                        continue
+                timeout_s = max(0.1, min(ATTEMPT_TIMEOUT, deadline_at - time.monotonic()))
+                abandoned = threading.Event()
+                fut = self._pool.submit(self._call, group, name, fn, timeout_s, abandoned, st.slots)
+                pending[fut] = (name, time.monotonic(), abandoned)
+                return True
+            return False
+
+        if not launch():
+            raise RuntimeError(f'All {group} routes are unavailable (circuit open or too many calls in flight)')
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = hedge_after is not None and queue and len(pending) < 2
+            wait_for = min(remaining, hedge_after) if can_hedge else min(remaining, ATTEMPT_TIMEOUT)
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                now = time.monotonic()
+                if can_hedge:
+                    launch()
+                    continue
+                # Sequential mode: give up on routes that exceeded their own timeout
+                for f, (name, started, abandoned) in list(pending.items()):
+                    if now - started >= ATTEMPT_TIMEOUT:
+                        del pending[f]
+                        self._abandon(group, name, started, abandoned)
+                        last_err = DeadlineExceeded(f'{name} timed out')
+                if not pending and queue:
+                    launch()
+                continue
+            for f in done:
+                pending.pop(f)
+                try:
+                    result = f.result()
+                except Exception as e:
+                    last_err = e
+                    continue
+                for name, started, abandoned in pending.values():
+                    self._release(name, abandoned)
+                return result
+            if not pending and queue:
+                launch()
+        for name, started, abandoned in pending.values():
+            self._abandon(group, name, started, abandoned)
+        if last_err is None or time.monotonic() >= deadline_at:
+            raise DeadlineExceeded(f'{group} request exceeded {deadline or REQUEST_DEADLINE:.1f}s deadline: {last_err}')
+        raise RuntimeError(f'{group} request failed on all routes: {last_err}')
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'last_good': dict(self._last_good),
+                'routes': {name: st.snapshot() for name, st in self._stats.items()},
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router()
+    return _router
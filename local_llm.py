@@ -0,0 +1,159 @@
+# File: local_llm.py
+# Background-loaded, micro-batched local transformers pipeline.
+#
+# app.get_llm() used to call load_llm() synchronously on the first chat and
+# retry it on every request after a failure, re-initialising transformers
+# under load. LocalInferenceService instead:
+#   - loads the pipeline once on a background thread, the first time the
+#     router falls back to it (optionally with dynamic int8 quantization on
+#     CPU), so gunicorn workers that never need it never load transformers;
+#   - remembers a failed load and does not retry before LOCAL_LLM_RETRY_AFTER;
+#   - groups concurrent prompts into micro-batches: requests arriving within
+#     LOCAL_LLM_BATCH_WAIT_MS of each other share one pipeline call.
+#
+# The service is callable with the same signature generate_insight uses for
+# a pipeline (`llm(prompt, max_new_tokens=200)`), so it drops in unchanged.
+# It is off unless LOCAL_LLM=true: each worker process would hold its own copy
+# of the model.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+ENABLED = os.environ.get('LOCAL_LLM', 'false').lower() in ('1', 'true', 'yes')
+QUANTIZE = os.environ.get('LOCAL_LLM_QUANTIZE', '').lower() in ('1', 'true', 'int8')
+MAX_BATCH = int(os.environ.get('LOCAL_LLM_MAX_BATCH', 8))
+BATCH_WAIT_MS = float(os.environ.get('LOCAL_LLM_BATCH_WAIT_MS', 15))
+RETRY_AFTER = float(os.environ.get('LOCAL_LLM_RETRY_AFTER', 600))
+REQUEST_TIMEOUT = float(os.environ.get('LOCAL_LLM_TIMEOUT', 60))
+
+
+class LocalInferenceService:
+    def __init__(self, loader=None, quantize=QUANTIZE, max_batch=MAX_BATCH, batch_wait_ms=BATCH_WAIT_MS,
+                 enabled=ENABLED):
+        if loader is None:
+            from llm import load_llm
+
+            def loader():
+                return load_llm(quantize=quantize, raise_errors=True)
+        self._loader = loader
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.state = 'idle'      # idle -> loading -> ready | failed
+        self.error = None
+        self.failed_at = None
+        self._pipe = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    # -- loading -----------------------------------------------------
+    def start(self):
+        """Begin loading in the background (idempotent; honours the failure back-off)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state in ('loading', 'ready'):
+                return
+            if self.state == 'failed' and time.monotonic() - self.failed_at < RETRY_AFTER:
+                return
+            self.state = 'loading'
+            self._ready.clear()
+        threading.Thread(target=self._load, name='local-llm-loader', daemon=True).start()
+
+    def _load(self):
+        try:
+            pipe = self._loader()
+            if pipe is None:
+                raise RuntimeError('local pipeline unavailable')
+        except Exception as e:
+            with self._lock:
+                self.state = 'failed'
+                self.error = str(e)
+                self.failed_at = time.monotonic()
+            self._ready.set()
+            return
+        with self._lock:
+            self._pipe = pipe
+            self.state = 'ready'
+            self.error = None
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._batch_loop, name='local-llm-batcher', daemon=True)
+                self._worker.start()
+        self._ready.set()
+
+    def available(self):
+        """True once the pipeline is loaded; never blocks. Kicks a retry after back-off."""
+        if self.state == 'ready':
+            return True
+        if self.state in ('idle', 'failed'):
+            self.start()
+        return False
+
+    def wait_ready(self, timeout=None):
+        self._ready.wait(timeout)
+        return self.state == 'ready'
+
+    def status(self):
+        return {'enabled': self.enabled, 'state': self.state, 'error': self.error, 'quantized': QUANTIZE,
+                'max_batch': self.max_batch, 'queued': self._queue.qsize()}
+
+    # -- inference ---------------------------------------------------
+    def __call__(self, prompt, max_new_tokens=200, **kwargs):
+        state = self.state
+        if state != 'ready':
+            # First fallback to the local route: start loading, answer from the next one
+            self.start()
+            raise RuntimeError(f'local LLM not ready ({state})')
+        fut = Future()
+        self._queue.put((prompt, max_new_tokens, fut))
+        return fut.result(timeout=REQUEST_TIMEOUT)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            batch = self._collect()
+            # One generate call per batch; the longest requested length wins
+            prompts = [p for p, _, _ in batch]
+            max_new = max(n for _, n, _ in batch)
+            try:
+                outs = self._pipe(prompts, max_new_tokens=max_new, batch_size=len(prompts),
+                                  pad_token_id=self._pipe.tokenizer.pad_token_id)
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, _, fut), out in zip(batch, outs):
+                # A list input yields one list of candidates per prompt
+                fut.set_result(out if isinstance(out, list) else [out])
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = LocalInferenceService()
+    return _service
@@ -0,0 +1,63 @@
+# File: measure_ttfb.py
+# Time-to-first-byte check for the chat stream.
+#
+#   python measure_ttfb.py                 # llm.generate_insight_stream against mock_llm_server
+#   python measure_ttfb.py --url http://127.0.0.1:5000/api/chat/stream
+#
+# The first form needs nothing but the repo: it starts the mock Gemini
+# server on a free port and points llm.py at it.
+
+import argparse
+import os
+import time
+
+
+def measure_generator(gen):
+    t0 = time.perf_counter()
+    ttfb = None
+    chunks = 0
+    for chunk in gen:
+        if not chunk:
+            continue
+        if ttfb is None:
+            ttfb = time.perf_counter() - t0
+        chunks += 1
+    return ttfb, time.perf_counter() - t0, chunks
+
+
+def measure_local(delay):
+    from mock_llm_server import env_for, start_in_thread
+    server, base = start_in_thread(token_rate=1.0 / delay)
+    os.environ.update(env_for(base))
+    os.environ['LLM_CACHE'] = 'false'
+    os.environ.pop('OPENAI_API_KEY', None)
+    import llm
+    try:
+        for name, gen in (
+            ('streaming (_stream_gemini)', lambda: llm._stream_gemini('Why restock clothing?')),
+            ('single response (_generate_with_gemini)', lambda: iter([llm._generate_with_gemini('Why restock clothing?')])),
+        ):
+            ttfb, total, chunks = measure_generator(gen())
+            print(f'{name:42s} ttfb={ttfb * 1000:8.1f} ms  total={total * 1000:8.1f} ms  chunks={chunks}')
+    finally:
+        server.shutdown()
+
+
+def measure_url(url, prompt):
+    import requests
+    with requests.post(url, json={'prompt': prompt}, params={'include_context': 'false'}, stream=True, timeout=120) as r:
+        r.raise_for_status()
+        ttfb, total, chunks = measure_generator(r.iter_content(chunk_size=None))
+    print(f'{url} ttfb={ttfb * 1000:.1f} ms  total={total * 1000:.1f} ms  chunks={chunks}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Measure chat stream time-to-first-byte')
+    ap.add_argument('--url', help='measure a running /api/chat/stream instead of the local mock')
+    ap.add_argument('--prompt', default='Why restock clothing?')
+    ap.add_argument('--delay', type=float, default=0.05, help='mock server delay per streamed word')
+    args = ap.parse_args()
+    if args.url:
+        measure_url(args.url, args.prompt)
+    else:
+        measure_local(args.delay)
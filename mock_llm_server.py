@@ -0,0 +1,176 @@
+# File: mock_llm_server.py
+# Local stand-in for the Gemini and OpenAI APIs so chat can be tested and
+# load-tested offline.
+#
+# Run standalone:
+#     python mock_llm_server.py --port 8765 --latency 0.3 --token-rate 40 --fail-rate 0.05
+# then point llm.py at it:
+#     GEMINI_API_KEY=test GEMINI_API_URL=http://127.0.0.1:8765/v1beta/models/mock:generateContent
+#     GEMINI_STREAM_URL=http://127.0.0.1:8765/v1beta/models/mock:streamGenerateContent
+#     OPENAI_API_KEY=test OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+#
+# Shapes served:
+#   POST .../chat/completions                  OpenAI; `"stream": true` -> SSE deltas + [DONE]
+#   POST ...:streamGenerateContent or ?alt=sse Gemini SSE, one candidate per token
+#   POST anything else                         Gemini generateContent JSON
+#
+# Knobs: --latency seconds before the first token, --token-rate tokens/sec
+# afterwards, --fail-rate probability of answering --fail-status instead.
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+DEFAULT_ANSWER = (
+    "Summary: clothing demand is rising ahead of Eid.\n"
+    "1. Restock the top three SKUs this week.\n"
+    "2. Hold prices; sentiment is strong.\n"
+    "3. Bundle accessories with best sellers.\n"
+    "Next step: place the reorder today."
+)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Overridden per server instance in make_server()
+    answer = DEFAULT_ANSWER
+    latency = 0.0
+    token_rate = 20.0
+    fail_rate = 0.0
+    fail_status = 503
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            return json.loads(raw or b'{}')
+        except ValueError:
+            return {}
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, obj):
+        data = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False)
+        self.wfile.write(('data: ' + data + '\n\n').encode('utf-8'))
+        self.wfile.flush()
+
+    @staticmethod
+    def _gemini_obj(text):
+        return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]}
+
+    @staticmethod
+    def _openai_obj(text, stream):
+        if stream:
+            return {'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': text}}]}
+        return {'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}]}
+
+    def _tokens(self):
+        words = self.answer.split(' ')
+        return [w + (' ' if i < len(words) - 1 else '') for i, w in enumerate(words)]
+
+    def _token_gap(self):
+        return 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        body = self._read_json()
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._send_json({'error': {'code': self.fail_status, 'message': 'injected failure'}}, self.fail_status)
+            return
+        time.sleep(self.latency)
+
+        if parsed.path.endswith('/chat/completions'):
+            stream = bool(body.get('stream'))
+            make = lambda t: self._openai_obj(t, stream)
+        else:
+            stream = parsed.path.endswith(':streamGenerateContent') or query.get('alt') == ['sse']
+            make = self._gemini_obj
+
+        tokens = self._tokens()
+        if not stream:
+            time.sleep(self._token_gap() * len(tokens))
+            self._send_json(make(self.answer))
+            return
+        self._start_sse()
+        for i, tok in enumerate(tokens):
+            if i:
+                time.sleep(self._token_gap())
+            self._send_event(make(tok))
+        if parsed.path.endswith('/chat/completions'):
+            self._send_event('[DONE]')
+
+
+def make_server(host='127.0.0.1', port=0, answer=DEFAULT_ANSWER, latency=0.0, token_rate=20.0,
+                fail_rate=0.0, fail_status=503):
+    """Create (but do not start) a mock server; port 0 picks a free port."""
+    handler = type('ConfiguredMockLLMHandler', (MockLLMHandler,), {
+        'answer': answer, 'latency': latency, 'token_rate': token_rate,
+        'fail_rate': fail_rate, 'fail_status': fail_status,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a mock server on a background thread and return (server, base_url)."""
+    server = make_server(**kwargs)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
+
+
+def env_for(base_url):
+    """Environment overrides that route llm.py's Gemini and OpenAI calls to `base_url`."""
+    return {
+        'GEMINI_API_KEY': 'mock',
+        'GEMINI_API_URL': base_url + '/v1beta/models/mock:generateContent',
+        'GEMINI_STREAM_URL': base_url + '/v1beta/models/mock:streamGenerateContent',
+        'OPENAI_API_KEY': 'mock',
+        'OPENAI_BASE_URL': base_url + '/v1',
+    }
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Local mock LLM server (Gemini + OpenAI shapes)')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--latency', type=float, default=0.0, help='seconds before the first token')
+    ap.add_argument('--token-rate', type=float, default=20.0, help='tokens per second after the first')
+    ap.add_argument('--fail-rate', type=float, default=0.0, help='probability of an injected error')
+    ap.add_argument('--fail-status', type=int, default=503)
+    args = ap.parse_args()
+    srv = make_server(args.host, args.port, latency=args.latency, token_rate=args.token_rate,
+                      fail_rate=args.fail_rate, fail_status=args.fail_status)
+    print(f'Mock LLM server on http://{args.host}:{args.port}')
+    for k, v in env_for(f'http://{args.host}:{args.port}').items():
+        print(f'  {k}={v}')
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,122 @@
+# File: mock_trends_server.py
+# Local stand-in for Google Trends so trend ingestion can be tested offline.
+#
+# Run standalone:
+#     python mock_trends_server.py --port 8766 --fail-rate 0.1
+# then point the ingester at it:
+#     TRENDS_SOURCE=http://127.0.0.1:8766
+#
+# Serves GET /trends?product=&start=YYYY-MM-DD&end=YYYY-MM-DD&geo= as
+# [{"date": "YYYY-MM-DD", "interest": 0..100}, ...]: weekly points (Sundays,
+# like Google's long-range data) from a deterministic seasonal curve per
+# product, so repeated fetches of overlapping ranges agree. GET /stats
+# returns the number of requests served and the date ranges asked for,
+# which lets tests check that a second run only fetched new ranges.
+#
+# Knobs: --latency seconds per request, --fail-rate probability of answering
+# --fail-status (429 by default, Google's rate-limit answer).
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def interest(product, day):
+    """Deterministic 0..100 interest for `product` on `day`."""
+    seed = zlib.crc32(product.encode('utf-8'))
+    phase = (seed % 365) / 365.0
+    season = math.sin(2 * math.pi * (day.timetuple().tm_yday / 365.0 + phase))
+    noise = ((zlib.crc32(f'{product}{day.isoformat()}'.encode('utf-8')) % 21) - 10) / 2.0
+    return int(max(0, min(100, 55 + 30 * season + noise)))
+
+
+class MockTrendsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Overridden per server instance in make_server()
+    latency = 0.0
+    fail_rate = 0.0
+    fail_status = 429
+    stats = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/stats':
+            with self.stats['lock']:
+                return self._send_json({'requests': self.stats['requests'], 'ranges': self.stats['ranges']})
+        if parsed.path != '/trends':
+            return self._send_json({'error': 'not found'}, 404)
+        q = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        try:
+            product = q['product']
+            start, end = date.fromisoformat(q['start']), date.fromisoformat(q['end'])
+        except (KeyError, ValueError):
+            return self._send_json({'error': 'product, start and end are required'}, 400)
+        if self.latency:
+            time.sleep(self.latency)
+        with self.stats['lock']:
+            self.stats['requests'] += 1
+            self.stats['ranges'].append([product, start.isoformat(), end.isoformat()])
+        if self.fail_rate and random.random() < self.fail_rate:
+            return self._send_json({'error': 'injected failure'}, self.fail_status)
+        day = start + timedelta(days=(6 - start.weekday()) % 7)  # first Sunday on/after start
+        rows = []
+        while day <= end:
+            rows.append({'date': day.isoformat(), 'interest': interest(product, day)})
+            day += timedelta(days=7)
+        self._send_json(rows)
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, fail_status=429):
+    """Create (but do not start) a mock server; port 0 picks a free port."""
+    handler = type('ConfiguredMockTrendsHandler', (MockTrendsHandler,), {
+        'latency': latency, 'fail_rate': fail_rate, 'fail_status': fail_status,
+        'stats': {'requests': 0, 'ranges': [], 'lock': threading.Lock()},
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a mock server on a background thread and return (server, base_url)."""
+    server = make_server(**kwargs)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Local mock Google Trends server')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8766)
+    ap.add_argument('--latency', type=float, default=0.0, help='seconds per request')
+    ap.add_argument('--fail-rate', type=float, default=0.0, help='probability of an injected error')
+    ap.add_argument('--fail-status', type=int, default=429)
+    args = ap.parse_args()
+    srv = make_server(args.host, args.port, latency=args.latency, fail_rate=args.fail_rate,
+                      fail_status=args.fail_status)
+    print(f'Mock Trends server on http://{args.host}:{args.port}')
+    print(f'  TRENDS_SOURCE=http://{args.host}:{args.port}')
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,214 @@
+# File: olap.py
+# Ad hoc group-by queries over the transactions table, executed in SQLite.
+#
+# A query names dimensions, measures and filters; compile_query() turns it
+# into one parameterized SELECT ... GROUP BY (identifiers only ever come
+# from the whitelists below, values are always bound parameters), so the
+# aggregation happens inside SQLite and no raw rows are loaded into pandas.
+# Results are cached by (normalized query, transactions data version).
+#
+#     run_query({'group': ['category', 'month'], 'measures': ['revenue', 'units'],
+#                'filters': {'product': ['clothing']}, 'start': '2024-01-01',
+#                'sort': '-revenue', 'limit': 100})
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import data_version
+from database import DB_PATH
+
+
+# name -> (SQL expression, required column)
+DIMENSIONS = {
+    'category': ('category', 'category'),
+    'product': ('product', 'product'),
+    'product_name': ('product_name', 'product_name'),
+    'user_id': ('user_id', 'user_id'),
+    'day': ("date(date)", 'date'),
+    'week': ("strftime('%Y-W%W', date)", 'date'),
+    'month': ("strftime('%Y-%m', date)", 'date'),
+    'weekday': ("CAST(strftime('%w', date) AS INTEGER)", 'date'),  # 0 = Sunday
+}
+MEASURES = {
+    'units': ('SUM(quantity)', 'quantity'),
+    'revenue': ('SUM(quantity * price)', 'price'),
+    'orders': ('COUNT(DISTINCT transaction_id)', 'transaction_id'),
+    'lines': ('COUNT(*)', None),
+    'avg_price': ('AVG(price)', 'price'),
+    'avg_quantity': ('AVG(quantity)', 'quantity'),
+    'distinct_users': ('COUNT(DISTINCT user_id)', 'user_id'),
+}
+# Older databases (data_ingestion mock data) have no category column (the
+# product column holds the category there) and no transaction_id.
+FALLBACK_COLUMNS = {'category': 'product'}
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+CACHE_SIZE = 256
+
+
+class QueryError(ValueError):
+    """Raised for an invalid query (unknown dimension/measure, bad filter ...)."""
+
+
+def _as_list(value, name):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(',') if v.strip()]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    raise QueryError(f'{name} must be a string or a list')
+
+
+def _date(value, name):
+    """Canonical 'YYYY-MM-DD' for an optional date (or datetime) string."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if not isinstance(value, str):
+        raise QueryError(f'{name} must be a date string (YYYY-MM-DD)')
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).strftime('%Y-%m-%d')
+    except ValueError:
+        raise QueryError(f"Invalid {name} date '{value}' (use YYYY-MM-DD)")
+
+
+def normalize_query(q):
+    """Validate and canonicalize a query dict (also the cache key)."""
+    group = _as_list(q.get('group'), 'group')
+    measures = _as_list(q.get('measures'), 'measures') or ['units', 'revenue']
+    for g in group:
+        if not isinstance(g, str) or g not in DIMENSIONS:
+            raise QueryError(f"Unknown dimension '{g}'. Use: {', '.join(DIMENSIONS)}")
+    for m in measures:
+        if not isinstance(m, str) or m not in MEASURES:
+            raise QueryError(f"Unknown measure '{m}'. Use: {', '.join(MEASURES)}")
+    raw_filters = q.get('filters') or {}
+    if not isinstance(raw_filters, dict):
+        raise QueryError('filters must be an object of dimension -> values')
+    filters = {}
+    for dim, values in raw_filters.items():
+        if dim not in DIMENSIONS:
+            raise QueryError(f"Cannot filter on '{dim}'")
+        values = _as_list(values, f'filters.{dim}')
+        if values:
+            filters[dim] = tuple(sorted(str(v) for v in values))
+    sort = q.get('sort') or (f'-{measures[0]}' if measures else None)
+    if sort is not None and not isinstance(sort, str):
+        raise QueryError('sort must be a string')
+    if sort and sort.lstrip('-') not in measures and sort.lstrip('-') not in group:
+        raise QueryError('sort must be one of the selected dimensions or measures (prefix - for descending)')
+    try:
+        limit = int(q.get('limit') or DEFAULT_LIMIT)
+    except (TypeError, ValueError):
+        raise QueryError('limit must be an integer')
+    start, end = _date(q.get('start'), 'start'), _date(q.get('end'), 'end')
+    if start and end and start > end:
+        raise QueryError('start must not be after end')
+    return {
+        'group': tuple(group),
+        'measures': tuple(dict.fromkeys(measures)),
+        'filters': tuple(sorted(filters.items())),
+        'start': start,
+        'end': end,
+        'sort': sort,
+        'limit': min(max(limit, 1), MAX_LIMIT),
+    }
+
+
+def _resolve(expr, column, columns):
+    """Rewrite an expression for the columns this database actually has."""
+    if column is None or column in columns:
+        return expr
+    if column == 'transaction_id':
+        return 'COUNT(*)'  # one row per order line
+    fallback = FALLBACK_COLUMNS.get(column)
+    if fallback in columns:
+        return expr.replace(column, fallback)
+    raise QueryError(f"Column '{column}' is not available in this database")
+
+
+def compile_query(nq, columns):
+    """Normalized query -> (sql, params). `columns` are the transactions columns."""
+    select, group_exprs, where, params = [], [], [], []
+    for g in nq['group']:
+        expr = _resolve(*DIMENSIONS[g], columns)
+        select.append(f'{expr} AS {g}')
+        group_exprs.append(expr)
+    for m in nq['measures']:
+        select.append(f'{_resolve(*MEASURES[m], columns)} AS {m}')
+    for dim, values in nq['filters']:
+        expr = _resolve(*DIMENSIONS[dim], columns)
+        where.append(f"CAST({expr} AS TEXT) IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    if nq['start']:
+        where.append('date(date) >= date(?)')
+        params.append(nq['start'])
+    if nq['end']:
+        where.append('date(date) <= date(?)')
+        params.append(nq['end'])
+    sql = f"SELECT {', '.join(select)} FROM transactions"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    if group_exprs:
+        sql += ' GROUP BY ' + ', '.join(group_exprs)
+    if nq['sort']:
+        sql += f" ORDER BY {nq['sort'].lstrip('-')} {'DESC' if nq['sort'].startswith('-') else 'ASC'}"
+    sql += ' LIMIT ?'
+    params.append(nq['limit'])
+    return sql, params
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _data_stamp(db_path):
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    return data_version.version_key(('transactions',), db_path)
+
+
+def run_query(q, db_path=None):
+    """Run a query dict -> {'columns', 'rows', 'row_count', 'cached'}. Raises QueryError."""
+    db_path = db_path or DB_PATH
+    nq = normalize_query(q)
+    key = (repr(sorted(nq.items())), db_path, _data_stamp(db_path))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return dict(_cache[key], cached=True)
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        columns = {r[1] for r in conn.execute('PRAGMA table_info(transactions)')}
+        if not columns:
+            raise QueryError('No transaction data available')
+        sql, params = compile_query(nq, columns)
+        cur = conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        rows = [list(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+    result = {'columns': names, 'rows': rows, 'row_count': len(rows)}
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result, cached=False)
+
+
+def query_from_args(args):
+    """Build a query dict from request args: group=, measures=, start=, end=, sort=, limit=,
+    and any dimension name as a comma-separated filter (product=clothing,electronics)."""
+    q = {k: args.get(k) for k in ('group', 'measures', 'start', 'end', 'sort', 'limit')}
+    q['filters'] = {dim: args.get(dim) for dim in DIMENSIONS if args.get(dim)}
+    return q
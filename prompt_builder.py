@@ -0,0 +1,121 @@
+# File: prompt_builder.py
+# Token-budgeted prompt assembly for the chat endpoints.
+#
+# api_chat / api_chat_stream used to append the whole dashboard context and a
+# long instruction block to every prompt with no size control, and llm.py
+# carried three slightly different system prompts. This module owns:
+#   - one system prompt shared by every backend;
+#   - precompiled per-language chat templates;
+#   - a fast local token estimator (no tokenizer download);
+#   - priority-ordered context sections trimmed to fit CHAT_TOKEN_BUDGET.
+
+import os
+import re
+from string import Template
+
+
+CHAT_TOKEN_BUDGET = int(os.environ.get('CHAT_TOKEN_BUDGET', 600))
+
+SYSTEM_PROMPT = (
+    "You are a senior retail business analyst advising a product manager. "
+    "Start with a one-line summary, give up to 3 concise numbered recommendations, "
+    "and finish with one clear next step. Reference dashboard values when relevant. Be concise."
+)
+
+# Lower number = more important; dropped/trimmed last
+SECTION_PRIORITY = {
+    'forecast': 0,
+    'price': 1,
+    'sentiment': 2,
+    'recommendations': 3,
+    'graph': 4,
+}
+
+_TEMPLATES = {
+    'en': Template("$question\n\nDashboard context:\n$context\n\n"
+                   "Answer as a business advisor with clear suggestions and next steps."),
+    'bn': Template("$question\n\nড্যাশবোর্ড প্রসঙ্গ:\n$context\n\n"
+                   "ব্যবসা পরামর্শদাতা হিসেবে ড্যাশবোর্ডের মান উল্লেখ করে স্পষ্ট পরামর্শ ও পরবর্তী পদক্ষেপ দিন। বাংলায় উত্তর দিন।"),
+}
+_TEMPLATE_OVERHEAD = {}
+
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+
+
+def estimate_tokens(text):
+    """Cheap BPE-ish estimate: ~4 chars per English token, ~2 per Bengali/other char.
+
+    Deliberately rough (no tokenizer download, one regex pass); it only has
+    to rank and cap prompt sizes, not bill them.
+    """
+    if not text:
+        return 0
+    non_ascii = len(_NON_ASCII_RE.findall(text))
+    ascii_chars = len(text) - non_ascii
+    return (ascii_chars + 3) // 4 + (non_ascii + 1) // 2
+
+
+def _template_overhead(lang):
+    if lang not in _TEMPLATE_OVERHEAD:
+        _TEMPLATE_OVERHEAD[lang] = estimate_tokens(_TEMPLATES[lang].substitute(question='', context=''))
+    return _TEMPLATE_OVERHEAD[lang]
+
+
+def _compact(name, text, max_tokens):
+    """Shrink one section to at most `max_tokens` (summarize lists, then cut)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Lists such as "Related to: [a, b, c, ...]" keep their first few items
+    m = re.match(r'^(.*:\s*)\[?(.*?)\]?$', text)
+    if m and ',' in m.group(2):
+        head, items = m.group(1), [i.strip() for i in m.group(2).split(',') if i.strip()]
+        kept = []
+        for item in items:
+            candidate = head + ', '.join(kept + [item]) + f' (+{len(items) - len(kept) - 1} more)'
+            if estimate_tokens(candidate) > max_tokens:
+                break
+            kept.append(item)
+        if kept:
+            return head + ', '.join(kept) + (f' (+{len(items) - len(kept)} more)' if len(kept) < len(items) else '')
+    return text[:max(0, max_tokens * 4 - 1)] + '…'
+
+
+def fit_sections(sections, budget):
+    """Keep context sections in priority order until `budget` tokens are used.
+
+    `sections` is a list of (name, text). Unavailable sections are dropped,
+    the last section that does not fit is compacted, lower ones are omitted.
+    Returned in their original order.
+    """
+    usable = [(i, n, t) for i, (n, t) in enumerate(sections) if t and not t.rstrip().endswith('unavailable')]
+    usable.sort(key=lambda x: (SECTION_PRIORITY.get(x[1], 9), x[0]))
+    kept, used = [], 0
+    for i, name, text in usable:
+        cost = estimate_tokens(text) + 1
+        if used + cost <= budget:
+            kept.append((i, text))
+            used += cost
+            continue
+        room = budget - used - 1
+        if room >= 8:
+            kept.append((i, _compact(name, text, room)))
+        break
+    return [t for _, t in sorted(kept)]
+
+
+def build_chat_prompt(question, sections=None, lang='en', budget=None):
+    """Compose the user prompt for a chat request within the token budget."""
+    lang = lang if lang in _TEMPLATES else 'en'
+    budget = CHAT_TOKEN_BUDGET if budget is None else budget
+    if not sections:
+        return question
+    room = budget - _template_overhead(lang) - estimate_tokens(question)
+    context = '\n'.join(fit_sections(sections, room)) if room > 0 else ''
+    if not context:
+        return question
+    return _TEMPLATES[lang].substitute(question=question, context=context)
+
+
+def compose_completion_prompt(prompt):
+    """Single-string form for completion-style endpoints (Gemini text, local pipeline)."""
+    return SYSTEM_PROMPT + "\n\nUser: " + prompt + "\n\nAssistant:"
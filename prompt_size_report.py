@@ -0,0 +1,61 @@
+# File: prompt_size_report.py
+# Before/after input-token report for the chat prompt builder.
+#
+#   python prompt_size_report.py                 # sample dashboard context
+#   python prompt_size_report.py --live clothing # real context from the DB
+#
+# "before" reproduces the pre-budget composition (system prompt + full
+# context + long instruction block); "after" is prompt_builder's output.
+
+import argparse
+
+from prompt_builder import CHAT_TOKEN_BUDGET, SYSTEM_PROMPT, build_chat_prompt, estimate_tokens
+
+
+LEGACY_SYSTEM = (
+    "You are a senior retail business analyst advising a product manager. "
+    "Be professional, helpful and clear. Start with a one-line summary, then provide up to 3 concise recommendations, "
+    "and finish with 1 suggested next action the user can take. Reference any dashboard context if provided. "
+    "Keep language plain, use numbered or bullet lists where helpful, and be concise (two to five paragraphs)."
+)
+LEGACY_SUFFIX = {
+    'en': "\n\nPlease answer as a business advisor, referencing the dashboard values when relevant, and provide clear suggestions and next steps.",
+    'bn': "\n\nঅনুগ্রহ করে একজন ব্যবসা পরামর্শদাতা হিসেবে উত্তর দিন, প্রাসঙ্গিক হলে ড্যাশবোর্ডের মান উল্লেখ করুন এবং স্পষ্ট পরামর্শ ও পরবর্তী পদক্ষেপ প্রদান করুন। বাংলায় উত্তর দিন।",
+}
+LEGACY_HEADER = {'en': "\n\nDashboard context:\n", 'bn': "\n\nড্যাশবোর্ড প্রসঙ্গ:\n"}
+
+SAMPLE_SECTIONS = [
+    ('forecast', 'Forecast (next period) yhat=42.17'),
+    ('price', 'Price: current=812.40, optimized=829.64'),
+    ('recommendations', 'Top recommendations: clothing, mobile, cosmetics, food, toys'),
+    ('sentiment', 'Social sentiment (avg): 0.74'),
+    ('graph', 'Graph: Related to: [' + ', '.join(f"'user_{i}'" for i in range(1, 10)) + ']'),
+]
+QUESTIONS = {'en': 'Why should I restock clothing this week?', 'bn': 'এই সপ্তাহে পোশাক কেন রিস্টক করব?'}
+
+
+def legacy_prompt(question, sections, lang):
+    ctx = '\n'.join(t for _, t in sections)
+    return LEGACY_SYSTEM + '\n\n' + question + LEGACY_HEADER[lang] + ctx + LEGACY_SUFFIX[lang]
+
+
+def main(sections, budgets):
+    print(f"{'lang':4} {'budget':>6} {'before':>7} {'after':>6} {'saved':>6}")
+    for lang, q in QUESTIONS.items():
+        before = estimate_tokens(legacy_prompt(q, sections, lang))
+        for budget in budgets:
+            after = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(build_chat_prompt(q, sections, lang, budget))
+            print(f'{lang:4} {budget:>6} {before:>7} {after:>6} {100 * (before - after) / before:>5.0f}%')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Chat prompt size before/after report')
+    ap.add_argument('--live', metavar='PRODUCT', help='use gather_dashboard_sections(PRODUCT) instead of the sample')
+    ap.add_argument('--budgets', default=f'{CHAT_TOKEN_BUDGET},120,80')
+    args = ap.parse_args()
+    if args.live:
+        from app import gather_dashboard_sections
+        sections = gather_dashboard_sections(args.live)
+    else:
+        sections = SAMPLE_SECTIONS
+    main(sections, [int(b) for b in args.budgets.split(',')])
@@ -6,6 +6,8 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from database import init_db
+import data_version
+import sentiment_ingest
 
 # Initialize database
 init_db()
@@ -83,14 +85,24 @@ for product in products_data.keys():
 
 conn = sqlite3.connect('ecommerce.db')
 df.to_sql('transactions', conn, if_exists='replace', index=False)
+data_version.bump('transactions', conn)
 conn.close()
 
+# Approximate-analytics sketches (?approx=1) for the new transactions
+from sketches import rebuild as rebuild_sketches
+rebuild_sketches(df, 'ecommerce.db')
+
+# Product catalog (/api/products, search index) from the new transactions
+from catalog import sync_from_transactions
+sync_from_transactions('ecommerce.db', replace=True)
+
 print(f"\n✅ Loaded transactions into database")
 
 # === Social Sentiment ===
 print("\n🔄 Generating social sentiment data...")
 
 conn = sqlite3.connect('ecommerce.db')
+sentiment_ingest.ensure_tables(conn)
 dates = pd.date_range(start='2025-01-01', end='2026-01-15', freq='W')
 
 # Predefined sentiment scores for each product (0-1 scale, with slight variations)
@@ -122,8 +134,10 @@ for product in products_data.keys():
         'product': product,
         'sentiment': sentiments
     })
-    sentiment_df.to_sql('social_sentiment', conn, if_exists='append', index=False)
+    sentiment_ingest.upsert_weekly(conn, sentiment_df.assign(date=sentiment_df['date'].dt.strftime('%Y-%m-%d'))
+                                   .itertuples(index=False, name=None))
 
+data_version.bump('social_sentiment', conn)
 conn.close()
 
 print(f"✅ Generated social sentiment data for {len(products_data)} products")
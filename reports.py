@@ -0,0 +1,399 @@
+# File: reports.py
+# Month-end product reports: one PDF per product_name, built in parallel.
+#
+# The parent process slices the shared analytics frame once into small
+# per-SKU payloads (dense daily units/revenue for the last HISTORY_DAYS,
+# transaction prices, lifetime totals). A process pool then, per SKU:
+#   - computes KPIs, a linear-trend demand forecast for HORIZON_DAYS with a
+#     95% band, and pricing stats with a log-log price elasticity;
+#   - renders the demand and price charts with matplotlib, unless they are
+#     already in the chart cache (CHART_DIR/<data version>/...). Charts are
+#     rendered once per data version and shared by every later batch; older
+#     versions are removed when a batch starts;
+#   - assembles the PDF with reportlab.
+# generate_reports() returns per-report timings and throughput in reports
+# per minute. export_jobs.py exposes a batch as the 'product_reports' job
+# (a zip). From the shell:
+#
+#   python reports.py                       # every product, all cores
+#   python reports.py --products "iPhone 13,Ladies Saree" --workers 2
+#
+# reportlab and matplotlib are optional imports: without reportlab no PDF
+# can be built (generate_reports raises), and without matplotlib the
+# reports are produced without charts.
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    PDF_AVAILABLE = True
+except Exception:
+    PDF_AVAILABLE = False
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    CHARTS_AVAILABLE = True
+except Exception:
+    plt = None
+    CHARTS_AVAILABLE = False
+
+
+REPORT_DIR = os.environ.get('REPORT_DIR', os.path.join('exports', 'reports'))
+CHART_DIR = os.environ.get('REPORT_CHART_DIR', os.path.join('exports', 'charts'))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 0)) or os.cpu_count() or 2
+HISTORY_DAYS = 180
+HORIZON_DAYS = 30
+CURRENCY = 'BDT'
+
+
+def slugify(name):
+    """File-safe name; the hash suffix keeps e.g. 'T-Shirt' and 'T Shirt' (or non-Latin names) apart."""
+    base = re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_').lower() or 'product'
+    return f"{base}_{hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:8]}"
+
+
+def version_tag(version):
+    """Short directory-safe tag for a data version key."""
+    return hashlib.sha1(repr(version).encode('utf-8')).hexdigest()[:12]
+
+
+# ---------------------------------------------------------------------------
+# Payloads (parent process)
+# ---------------------------------------------------------------------------
+
+def build_payloads(df, products=None, tag=''):
+    """Per-SKU inputs for the workers from a Prepared-style frame (date, quantity, price, total_amount)."""
+    sku = 'product_name' if 'product_name' in df.columns else 'product'
+    if df.empty:
+        return []
+    # The window ends at the last sale in the whole table, not of the selected SKUs,
+    # so every batch at one data version draws the same charts (they are cached per version)
+    end = df['date'].max().normalize()
+    if products:
+        df = df[df[sku].isin(products)]
+        if df.empty:
+            return []
+    days = pd.date_range(end - pd.Timedelta(days=HISTORY_DAYS - 1), end, freq='D')
+    recent = df[df['date'] >= days[0]]
+    daily = recent.groupby([recent[sku], recent['date'].dt.normalize()]).agg(
+        units=('quantity', 'sum'), revenue=('total_amount', 'sum'))
+    orders = ('transaction_id', 'nunique') if 'transaction_id' in df.columns else ('quantity', 'size')
+    totals = df.groupby(sku).agg(units=('quantity', 'sum'), revenue=('total_amount', 'sum'), orders=orders,
+                                 first=('date', 'min'), last=('date', 'max'))
+    category = df.groupby(sku)['category' if 'category' in df.columns else 'product'].first()
+    discount = df.groupby(sku)['discount_applied'].mean() if 'discount_applied' in df.columns else None
+
+    payloads = []
+    for name, rows in df.groupby(sku)[['price', 'quantity']]:
+        try:
+            d = daily.loc[name].reindex(days, fill_value=0)
+        except KeyError:
+            d = pd.DataFrame({'units': 0, 'revenue': 0.0}, index=days)
+        t = totals.loc[name]
+        payloads.append({
+            'name': str(name),
+            'category': str(category.get(name, '')),
+            'tag': tag,
+            'days': days.strftime('%Y-%m-%d').tolist(),
+            'units': d['units'].to_numpy(dtype=np.float64),
+            'revenue': d['revenue'].to_numpy(dtype=np.float64),
+            'prices': rows['price'].to_numpy(dtype=np.float64),
+            'quantities': rows['quantity'].to_numpy(dtype=np.float64),
+            'totals': {'units': float(t['units']), 'revenue': float(t['revenue']), 'orders': int(t['orders']),
+                       'first': t['first'].strftime('%Y-%m-%d'), 'last': t['last'].strftime('%Y-%m-%d')},
+            'discount_share': float(discount.get(name, 0)) if discount is not None else None,
+        })
+    return payloads
+
+
+# ---------------------------------------------------------------------------
+# Per-SKU work (worker processes)
+# ---------------------------------------------------------------------------
+
+def linear_forecast(units, horizon=HORIZON_DAYS):
+    """Least-squares trend on daily units -> (yhat, lower, upper) for the next `horizon` days."""
+    n = len(units)
+    if n >= 2:
+        slope, intercept = np.polyfit(np.arange(n), units, 1)
+    else:
+        slope, intercept = 0.0, float(units.mean()) if n else 0.0
+    resid = units - (intercept + slope * np.arange(n))
+    sd = float(resid.std(ddof=1)) if n > 2 else 0.0
+    yhat = np.clip(intercept + slope * np.arange(n, n + horizon), 0, None)
+    return yhat, np.clip(yhat - 1.96 * sd, 0, None), yhat + 1.96 * sd
+
+
+def price_elasticity(prices, quantities):
+    """Slope of log(quantity) on log(price), or None without enough price variation."""
+    ok = (prices > 0) & (quantities > 0)
+    if ok.sum() < 10:
+        return None
+    lp, lq = np.log(prices[ok]), np.log(quantities[ok])
+    if lp.std() < 1e-3:
+        return None
+    return float(np.polyfit(lp, lq, 1)[0])
+
+
+def summarize(p):
+    units, revenue, prices = p['units'], p['revenue'], p['prices']
+    last30, prev30 = units[-30:].sum(), units[-60:-30].sum()
+    yhat, lower, upper = linear_forecast(units)
+    elasticity = price_elasticity(prices, p['quantities'])
+    if elasticity is None:
+        advice = 'Not enough price variation to estimate elasticity.'
+    elif elasticity < -1:
+        advice = 'Demand is price-elastic: discounts should raise revenue.'
+    else:
+        advice = 'Demand is price-inelastic: there is room for a small price increase.'
+    return {
+        'kpis': {
+            'units_total': p['totals']['units'],
+            'revenue_total': p['totals']['revenue'],
+            'orders_total': p['totals']['orders'],
+            'units_last_30d': float(last30),
+            'revenue_last_30d': float(revenue[-30:].sum()),
+            'growth_30d_pct': round(float((last30 - prev30) / prev30 * 100), 2) if prev30 > 0 else None,
+            'first_sale': p['totals']['first'],
+            'last_sale': p['totals']['last'],
+        },
+        'forecast': {
+            'units_next_30d': float(yhat.sum()),
+            'daily_mean': float(yhat.mean()) if len(yhat) else 0.0,
+            'weekly': [(float(yhat[i:i + 7].sum()), float(lower[i:i + 7].sum()), float(upper[i:i + 7].sum()))
+                       for i in range(0, len(yhat), 7)],
+            'yhat': yhat, 'lower': lower, 'upper': upper,
+        },
+        'pricing': {
+            'avg': float(prices.mean()) if len(prices) else None,
+            'min': float(prices.min()) if len(prices) else None,
+            'max': float(prices.max()) if len(prices) else None,
+            'elasticity': elasticity,
+            'discount_share': p['discount_share'],
+            'advice': advice,
+        },
+    }
+
+
+def _save_figure(fig, path):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    fig.savefig(tmp, format='png', dpi=110, bbox_inches='tight')
+    plt.close(fig)
+    os.replace(tmp, path)  # atomic, so concurrent workers never read half a PNG
+
+
+def render_charts(p, summary, chart_dir=CHART_DIR):
+    """{kind: png path} for the SKU's charts, rendering only what is not cached -> (paths, rendered, cached)."""
+    if not CHARTS_AVAILABLE:
+        return {}, 0, 0
+    folder = os.path.join(chart_dir, p['tag'])
+    os.makedirs(folder, exist_ok=True)
+    slug = slugify(p['name'])
+    paths = {'demand': os.path.join(folder, f'{slug}_demand.png'),
+             'price': os.path.join(folder, f'{slug}_price.png')}
+    rendered = cached = 0
+
+    if os.path.exists(paths['demand']):
+        cached += 1
+    else:
+        days = pd.to_datetime(p['days'])
+        future = pd.date_range(days[-1] + pd.Timedelta(days=1), periods=len(summary['forecast']['yhat']), freq='D')
+        fig, ax = plt.subplots(figsize=(7.5, 2.8))
+        ax.plot(days, p['units'], color='#667eea', linewidth=1, label='Units sold')
+        ax.plot(future, summary['forecast']['yhat'], color='#e17055', linewidth=1.5, label='Forecast')
+        ax.fill_between(future, summary['forecast']['lower'], summary['forecast']['upper'], color='#e17055', alpha=0.2)
+        ax.set_title('Daily demand and 30-day forecast', fontsize=10)
+        ax.legend(fontsize=8, loc='upper left')
+        ax.grid(alpha=0.3)
+        fig.autofmt_xdate()
+        _save_figure(fig, paths['demand'])
+        rendered += 1
+
+    if os.path.exists(paths['price']):
+        cached += 1
+    else:
+        fig, ax = plt.subplots(figsize=(7.5, 2.4))
+        if len(p['prices']):
+            ax.hist(p['prices'], bins=30, color='#00b894', alpha=0.8)
+        ax.set_title(f'Price distribution ({CURRENCY})', fontsize=10)
+        ax.grid(alpha=0.3)
+        _save_figure(fig, paths['price'])
+        rendered += 1
+    return paths, rendered, cached
+
+
+def _fmt(value, digits=0):
+    if value is None:
+        return '-'
+    return f'{value:,.{digits}f}'
+
+
+def _table(rows, widths=None):
+    t = Table(rows, colWidths=widths)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#b2bec3')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f6fa')]),
+    ]))
+    return t
+
+
+def build_pdf(p, summary, charts, path):
+    styles = getSampleStyleSheet()
+    k, f, pr = summary['kpis'], summary['forecast'], summary['pricing']
+    story = [
+        Paragraph(escape(p['name']), styles['Title']),
+        Paragraph(f"Category: {escape(p['category'])} &nbsp;|&nbsp; Sales {k['first_sale']} to {k['last_sale']}", styles['Normal']),
+        Spacer(1, 0.4 * cm),
+        Paragraph('Key figures', styles['Heading2']),
+        _table([
+            ['Metric', 'Value'],
+            ['Units sold (all time)', _fmt(k['units_total'])],
+            [f'Revenue (all time, {CURRENCY})', _fmt(k['revenue_total'])],
+            ['Orders (all time)', _fmt(k['orders_total'])],
+            ['Units, last 30 days', _fmt(k['units_last_30d'])],
+            [f'Revenue, last 30 days ({CURRENCY})', _fmt(k['revenue_last_30d'])],
+            ['Growth vs previous 30 days', '-' if k['growth_30d_pct'] is None else f"{k['growth_30d_pct']:+.1f}%"],
+        ], widths=[8 * cm, 6 * cm]),
+        Paragraph('Demand forecast', styles['Heading2']),
+        Paragraph(f"Expected units over the next {HORIZON_DAYS} days: <b>{_fmt(f['units_next_30d'])}</b> "
+                  f"({_fmt(f['daily_mean'], 1)} per day).", styles['Normal']),
+        Spacer(1, 0.2 * cm),
+        _table([['Week', 'Units', 'Low (95%)', 'High (95%)']] +
+               [[f'Week {i}', _fmt(y), _fmt(lo), _fmt(hi)] for i, (y, lo, hi) in
+                enumerate(f['weekly'], start=1)], widths=[3.5 * cm] * 4),
+    ]
+    if 'demand' in charts:
+        story += [Spacer(1, 0.3 * cm), Image(charts['demand'], width=17 * cm, height=6.3 * cm)]
+    story += [
+        Paragraph('Pricing', styles['Heading2']),
+        _table([
+            ['Average', 'Min', 'Max', 'Elasticity', 'Discounted'],
+            [_fmt(pr['avg'], 2), _fmt(pr['min'], 2), _fmt(pr['max'], 2),
+             '-' if pr['elasticity'] is None else f"{pr['elasticity']:.2f}",
+             '-' if pr['discount_share'] is None else f"{pr['discount_share'] * 100:.0f}%"],
+        ]),
+        Spacer(1, 0.2 * cm),
+        Paragraph(pr['advice'], styles['Normal']),
+    ]
+    if 'price' in charts:
+        story += [Spacer(1, 0.3 * cm), Image(charts['price'], width=17 * cm, height=5.4 * cm)]
+    SimpleDocTemplate(path, pagesize=A4, title=f"{p['name']} report",
+                      leftMargin=2 * cm, rightMargin=2 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm).build(story)
+
+
+def _report_task(p, output_dir, chart_dir):
+    """Worker entry point: one SKU -> dict(name, path, seconds, charts_rendered, charts_cached | error)."""
+    t0 = time.perf_counter()
+    try:
+        summary = summarize(p)
+        charts, rendered, cached = render_charts(p, summary, chart_dir)
+        path = os.path.join(output_dir, f"{slugify(p['name'])}.pdf")
+        build_pdf(p, summary, charts, path)
+        return {'name': p['name'], 'path': path, 'seconds': round(time.perf_counter() - t0, 3),
+                'charts_rendered': rendered, 'charts_cached': cached}
+    except Exception as e:
+        return {'name': p['name'], 'error': str(e), 'seconds': round(time.perf_counter() - t0, 3)}
+
+
+# ---------------------------------------------------------------------------
+# Batch
+# ---------------------------------------------------------------------------
+
+def prune_charts(tag, chart_dir=CHART_DIR):
+    """Remove cached charts of other data versions."""
+    try:
+        names = os.listdir(chart_dir)
+    except OSError:
+        return
+    for name in names:
+        if name != tag:
+            shutil.rmtree(os.path.join(chart_dir, name), ignore_errors=True)
+
+
+def generate_reports(products=None, workers=None, output_dir=REPORT_DIR, chart_dir=CHART_DIR, prepared=None):
+    """
+    Build one PDF per product_name (or only `products`) in parallel.
+
+    Returns:
+        dict: reports, failed, seconds, reports_per_minute, charts_rendered,
+              charts_cached, workers, files
+    """
+    if not PDF_AVAILABLE:
+        raise RuntimeError('PDF reports need reportlab (pip install reportlab)')
+    import analytics
+    import data_version
+
+    t0 = time.perf_counter()
+    prepared = prepared or analytics.get_prepared()
+    tag = version_tag(data_version.version_key(('transactions',)))
+    prune_charts(tag, chart_dir)
+    payloads = build_payloads(prepared.df, products, tag)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or REPORT_WORKERS, len(payloads) or 1))
+
+    results = []
+    if workers == 1:
+        results = [_report_task(p, output_dir, chart_dir) for p in payloads]
+    else:
+        # spawn: the pool is often started from a Flask/export worker thread, where fork is unsafe
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [pool.submit(_report_task, p, output_dir, chart_dir) for p in payloads]
+            results = [f.result() for f in as_completed(futures)]
+
+    seconds = time.perf_counter() - t0
+    done = [r for r in results if 'error' not in r]
+    return {
+        'reports': len(done),
+        'failed': [{'name': r['name'], 'error': r['error']} for r in results if 'error' in r],
+        'seconds': round(seconds, 2),
+        'reports_per_minute': round(len(done) / seconds * 60, 1) if seconds > 0 else None,
+        'charts_rendered': sum(r['charts_rendered'] for r in done),
+        'charts_cached': sum(r['charts_cached'] for r in done),
+        'workers': workers,
+        'files': sorted(r['path'] for r in done),
+    }
+
+
+def table_pdf(title, subtitle, frame, path):
+    """Single-table PDF (used by export_utils.generate_forecast_pdf)."""
+    styles = getSampleStyleSheet()
+    rows = [list(map(str, frame.columns))] + [
+        [v.strftime('%Y-%m-%d') if isinstance(v, pd.Timestamp) else (_fmt(v, 2) if isinstance(v, float) else str(v))
+         for v in row] for row in frame.itertuples(index=False, name=None)]
+    SimpleDocTemplate(path, pagesize=A4, title=title).build([
+        Paragraph(escape(title), styles['Title']), Paragraph(escape(subtitle), styles['Normal']), Spacer(1, 0.4 * cm), _table(rows)])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    ap = argparse.ArgumentParser(description='Build one PDF report per product in parallel')
+    ap.add_argument('--products', default='', help='comma-separated product names (default: all)')
+    ap.add_argument('--workers', type=int, default=0, help='process pool size (default: REPORT_WORKERS / cores)')
+    ap.add_argument('--out', default=REPORT_DIR)
+    args = ap.parse_args()
+    products = [p.strip() for p in args.products.split(',') if p.strip()] or None
+    result = generate_reports(products, args.workers or None, args.out)
+    print(json.dumps({k: v for k, v in result.items() if k != 'files'}, indent=2))
+    print(f"{result['reports']} reports in {result['seconds']} s = {result['reports_per_minute']} reports/min "
+          f"({result['workers']} workers; charts {result['charts_rendered']} rendered, {result['charts_cached']} cached)")
@@ -0,0 +1,232 @@
+# File: responses.py
+# Response layer for the Flask app: fast JSON encoding and compression.
+#
+# init_app(flask_app) installs:
+#   - a JSON provider used by every jsonify() call. It encodes with orjson
+#     when installed (native numpy/datetime, NaN -> null) and understands
+#     pandas objects: a DataFrame is written as records by pandas' own C
+#     encoder and embedded without a Python-object round trip.
+#   - an after_request hook that compresses JSON/text bodies above
+#     COMPRESS_MIN_BYTES with brotli (if installed) or gzip, whichever the
+#     client accepts. Streamed responses (chat SSE) and files are left alone.
+#
+# Without orjson the stock json module is used with the same pandas/numpy
+# handling. Dates are ISO 8601 either way (Flask's default was HTTP-date).
+
+import datetime
+import gzip
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except Exception:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except Exception:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except Exception:
+    pa = None
+    ARROW_AVAILABLE = False
+
+from flask.json.provider import DefaultJSONProvider
+
+
+COMPRESS_ENABLED = os.environ.get('RESPONSE_COMPRESSION', 'true').lower() in ('1', 'true', 'yes')
+COMPRESS_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', 5))
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/x-ndjson',
+                      'application/x-msgpack', 'application/vnd.apache.arrow')
+
+# ?format= values for series endpoints (see formatted_response)
+FORMATS = ('records', 'columns', 'msgpack', 'arrow')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if ORJSON_AVAILABLE else 0
+_HAS_FRAGMENT = ORJSON_AVAILABLE and hasattr(orjson, 'Fragment')
+
+
+def frame_to_json(df):
+    """DataFrame -> JSON array of records (ISO dates, NaN -> null) via pandas' C encoder."""
+    return df.to_json(orient='records', date_format='iso', force_ascii=False)
+
+
+def _default(obj):
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.DataFrame):
+        if _HAS_FRAGMENT:
+            return orjson.Fragment(frame_to_json(obj))
+        return json.loads(frame_to_json(obj))
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps_bytes(obj):
+    """Serialize `obj` to UTF-8 JSON bytes with the fastest available encoder."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps_bytes()."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if ORJSON_AVAILABLE:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+class FormatError(ValueError):
+    """Unknown or unavailable ?format= value."""
+
+
+def frame_columns(df):
+    """DataFrame -> {column: list} with ISO date strings (column-oriented JSON/msgpack)."""
+    out = {}
+    for name, col in df.items():
+        if pd.api.types.is_datetime64_any_dtype(col):
+            values = np.datetime_as_string(col.to_numpy(dtype='datetime64[s]'), unit='s')
+            out[str(name)] = [None if v == 'NaT' else v for v in values.tolist()]
+        elif pd.api.types.is_float_dtype(col):
+            out[str(name)] = col.astype(object).where(col.notna(), None).tolist()
+        else:
+            out[str(name)] = col.tolist()
+    return out
+
+
+def _columnize(obj):
+    if isinstance(obj, pd.DataFrame):
+        return frame_columns(obj)
+    if isinstance(obj, dict):
+        return {k: _columnize(v) for k, v in obj.items()}
+    return obj
+
+
+def _arrow_ipc(obj):
+    """Arrow IPC stream of the (single) DataFrame in `obj`; other keys go to schema metadata."""
+    if isinstance(obj, pd.DataFrame):
+        df, meta = obj, {}
+    else:
+        frames = [k for k, v in obj.items() if isinstance(v, pd.DataFrame)]
+        if len(frames) != 1:
+            raise FormatError('arrow format needs exactly one table in the response')
+        df = obj[frames[0]]
+        meta = {k: v for k, v in obj.items() if k != frames[0]}
+        meta['table'] = frames[0]
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if meta:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'meta': dumps_bytes(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def check_format(fmt):
+    """Validate a ?format= value (raises FormatError); returns the normalized name."""
+    fmt = (fmt or 'records').lower()
+    if fmt == 'json':
+        fmt = 'records'
+    if fmt not in FORMATS:
+        raise FormatError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt == 'arrow' and not ARROW_AVAILABLE:
+        raise FormatError('arrow format needs pyarrow installed')
+    if fmt == 'msgpack' and not MSGPACK_AVAILABLE:
+        raise FormatError('msgpack format needs msgpack installed')
+    return fmt
+
+
+def formatted_response(obj, fmt='records'):
+    """Response for `obj` (a DataFrame, or a dict containing DataFrames) in `fmt`.
+
+    records  JSON, each DataFrame as an array of row objects (the default)
+    columns  JSON, each DataFrame as {column: [values...]} (parallel arrays)
+    msgpack  MessagePack of the `columns` structure
+    arrow    Arrow IPC stream of the DataFrame; other keys in schema metadata 'meta'
+    """
+    from flask import current_app, jsonify
+    fmt = check_format(fmt)
+    if fmt == 'records':
+        return jsonify(obj)
+    if fmt == 'columns':
+        return jsonify(_columnize(obj))
+    if fmt == 'msgpack':
+        body = msgpack.packb(_columnize(obj), use_bin_type=True, default=_default)
+        return current_app.response_class(body, mimetype=MSGPACK_MIMETYPE)
+    return current_app.response_class(_arrow_ipc(obj), mimetype=ARROW_MIMETYPE)
+
+
+def compress_body(data, accept_encodings):
+    """Pick br/gzip for `data` given request.accept_encodings -> (encoding, bytes) or (None, data)."""
+    if BROTLI_AVAILABLE and accept_encodings['br']:
+        return 'br', brotli.compress(data, quality=BROTLI_QUALITY)
+    if accept_encodings['gzip']:
+        return 'gzip', gzip.compress(data, compresslevel=GZIP_LEVEL)
+    return None, data
+
+
+def init_app(app):
+    """Install the JSON provider and the compression hook on a Flask app."""
+    from flask import request
+
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(resp):
+        if not COMPRESS_ENABLED or resp.direct_passthrough or resp.is_streamed:
+            return resp
+        if not 200 <= resp.status_code < 300 or 'Content-Encoding' in resp.headers:
+            return resp
+        if not (resp.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+            return resp
+        data = resp.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return resp
+        encoding, body = compress_body(data, request.accept_encodings)
+        if encoding is None or len(body) >= len(data):
+            return resp
+        resp.set_data(body)
+        resp.headers['Content-Encoding'] = encoding
+        resp.vary.add('Accept-Encoding')
+        return resp
+
+    return app
@@ -0,0 +1,409 @@
+# File: sentiment_ingest.py
+# Batched, cached sentiment scoring for social comments, with weekly upserts.
+#
+# Input is a stream of real comments, CSV or NDJSON (one JSON object per
+# line), with a date, a product and the comment text (see COLUMN_ALIASES for
+# accepted column names; an optional id column identifies a comment). Dates
+# may be ISO dates/timestamps or epoch seconds (milliseconds when 13+ digits).
+# Rows without a usable date, product or text are skipped and counted in the
+# 'skipped' stat. From the shell:
+#
+#   python sentiment_ingest.py comments.ndjson
+#   python sentiment_ingest.py export.csv --workers 4
+#   cat comments.ndjson | python sentiment_ingest.py - --format ndjson
+#
+# The stream is read in blocks of SENTIMENT_BATCH * workers rows, so memory
+# stays flat however large the file is. Per block:
+#   - comments already stored (same id, or same date/product/text when there
+#     is no id) are skipped, so re-ingesting a file scores nothing;
+#   - texts are de-duplicated and looked up in an in-memory LRU of VADER
+#     scores (SENTIMENT_CACHE_SIZE texts), so repeated texts such as "Good
+#     product" are scored once per process;
+#   - the remaining texts are scored in batches of SENTIMENT_BATCH across a
+#     process pool (SENTIMENT_WORKERS), or inline when there are only a few.
+# Scored comments land in social_comments. Every (week, product) they touch
+# is then re-aggregated from social_comments and upserted into
+# social_sentiment. Weeks end on Sunday, like the generated data. A unique
+# index on social_sentiment (date, product) replaces the old append-only
+# writes; old duplicates are collapsed once when the index is created. The
+# 'social_sentiment' data version is bumped only when a weekly value changed.
+#
+# nltk is imported and the VADER lexicon loaded (downloaded if missing) the
+# first time a text is scored, once per process, never at import time.
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import data_version
+from database import DB_PATH
+
+
+SENTIMENT_WORKERS = int(os.environ.get('SENTIMENT_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+SENTIMENT_BATCH = int(os.environ.get('SENTIMENT_BATCH', 2000))
+SENTIMENT_CACHE_SIZE = int(os.environ.get('SENTIMENT_CACHE_SIZE', 100000))
+
+# field -> accepted column names, first match wins
+COLUMN_ALIASES = {
+    'id': ('id', 'comment_id', 'post_id'),
+    'date': ('date', 'created_at', 'timestamp', 'time'),
+    'product': ('product', 'category', 'product_name'),
+    'text': ('text', 'comment', 'body', 'message', 'content'),
+}
+FORMATS = ('csv', 'ndjson')
+
+
+class SentimentInputError(ValueError):
+    """Unreadable comment stream (unknown format or missing columns)."""
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_analyzer():
+    """VADER analyzer for this process; loads (and if needed downloads) the lexicon on first use."""
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None:
+            import nltk
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            try:
+                _analyzer = SentimentIntensityAnalyzer()
+            except LookupError:
+                nltk.download('vader_lexicon', quiet=True)
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def score_batch(texts):
+    """VADER compound scores for a list of texts (runs in pool workers)."""
+    polarity = get_analyzer().polarity_scores
+    return [polarity(t)['compound'] for t in texts]
+
+
+def _warm_worker():
+    get_analyzer()
+
+
+class SentimentScorer:
+    """
+    Scores texts with an LRU memo in front of VADER.
+
+    Misses beyond one batch go to a process pool, created on first need and
+    kept until close(); use it as a context manager.
+    """
+
+    def __init__(self, workers=SENTIMENT_WORKERS, batch_size=SENTIMENT_BATCH, cache_size=SENTIMENT_CACHE_SIZE):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pool = None
+        self.hits = 0
+        self.scored = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: ingestion can run from a Flask worker thread, where fork is unsafe
+            ctx = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_warm_worker)
+        return self._pool
+
+    def score(self, texts):
+        """Compound score for each text, in order."""
+        scores = {}
+        misses = []
+        for t in dict.fromkeys(texts):
+            s = self._cache.get(t)
+            if s is None:
+                misses.append(t)
+            else:
+                self._cache.move_to_end(t)
+                scores[t] = s
+        self.hits += len(texts) - len(misses)
+        if misses:
+            batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+            if len(batches) > 1 and self.workers > 1:
+                results = self._get_pool().map(score_batch, batches)
+            else:
+                results = map(score_batch, batches)
+            for batch, batch_scores in zip(batches, results):
+                scores.update(zip(batch, batch_scores))
+            self.scored += len(misses)
+            for t in misses:
+                self._cache[t] = scores[t]
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [scores[t] for t in texts]
+
+
+# ---------------------------------------------------------------------------
+# Input
+# ---------------------------------------------------------------------------
+
+def _resolve_columns(fields):
+    lower = {f.strip().lower(): f for f in fields if f}
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        columns[key] = next((lower[a] for a in aliases if a in lower), None)
+    missing = [k for k in ('date', 'product', 'text') if columns[k] is None]
+    if missing:
+        raise SentimentInputError(f"missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _day(value):
+    """YYYY-MM-DD from an ISO date/timestamp or epoch seconds/milliseconds, None if unparseable."""
+    if isinstance(value, str) and len(value.strip().split('.')[0]) >= 9 and \
+            value.strip().replace('.', '', 1).isdigit():
+        value = float(value)  # CSV epochs arrive as text; 8 digits would be YYYYMMDD
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value >= 1e12:
+            value /= 1000.0
+        try:
+            return datetime.fromtimestamp(value, timezone.utc).date().isoformat()
+        except (OverflowError, OSError, ValueError):
+            return None
+    value = str(value or '').strip()[:10]
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        return None
+
+
+def read_comments(source, fmt=None, counts=None):
+    """
+    Yield comments as dicts (id, date, product, text) from a path, '-' (stdin) or an open text file.
+
+    Rows without a parseable date, a product or text are skipped and counted
+    in counts['skipped'] when a `counts` dict is given.
+    """
+    counts = {} if counts is None else counts
+    counts.setdefault('skipped', 0)
+    if isinstance(source, str):
+        fmt = fmt or ('ndjson' if source.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if source == '-':
+            yield from read_comments(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'), fmt, counts)
+            return
+        with open(source, encoding='utf-8-sig', newline='') as f:
+            yield from read_comments(f, fmt, counts)
+        return
+    fmt = fmt or 'csv'
+    if fmt not in FORMATS:
+        raise SentimentInputError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        rows = reader
+        columns = _resolve_columns(reader.fieldnames or [])
+    else:
+        rows = (json.loads(line) for line in source if line.strip())
+        columns = None
+    seen_keys = {}
+    for row in rows:
+        cols = columns
+        if cols is None:
+            # NDJSON objects may vary; objects lacking a required field are skipped
+            keys = tuple(row) if isinstance(row, dict) else ()
+            if keys not in seen_keys:
+                try:
+                    seen_keys[keys] = _resolve_columns(keys)
+                except SentimentInputError:
+                    seen_keys[keys] = None
+            cols = seen_keys[keys]
+            if cols is None:
+                counts['skipped'] += 1
+                continue
+        day = _day(row.get(cols['date']))
+        product = str(row.get(cols['product']) or '').strip()
+        text = str(row.get(cols['text']) or '').strip()
+        if not (day and product and text):
+            counts['skipped'] += 1
+            continue
+        cid = row.get(cols['id']) if cols['id'] else None
+        yield {'id': str(cid) if cid not in (None, '') else None, 'date': day, 'product': product, 'text': text}
+
+
+def comment_id(comment):
+    """Stable id: the source id if given, else a hash of date, product and text."""
+    if comment.get('id'):
+        return comment['id']
+    raw = '\x1f'.join((comment['date'], comment['product'], ' '.join(comment['text'].split())))
+    return 'h:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def week_end(day):
+    """Sunday closing the week that contains `day` (YYYY-MM-DD), matching pandas' freq='W'."""
+    d = date.fromisoformat(day)
+    return (d + timedelta(days=6 - d.weekday())).isoformat()
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def ensure_tables(conn):
+    """Create social_comments and the social_sentiment (date, product) unique index (de-duplicating first)."""
+    conn.execute('CREATE TABLE IF NOT EXISTS social_sentiment (date TEXT, product TEXT, sentiment REAL)')
+    conn.execute('''CREATE TABLE IF NOT EXISTS social_comments (
+        comment_id TEXT PRIMARY KEY,
+        date TEXT,
+        week TEXT,
+        product TEXT,
+        sentiment REAL)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_social_comments_week ON social_comments (product, week)')
+    has_index = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_social_date_product'"
+                             ).fetchone()
+    if not has_index:
+        # Rows appended by older versions: normalize timestamps to days, keep the latest duplicate
+        conn.execute('UPDATE social_sentiment SET date = substr(date, 1, 10) WHERE length(date) > 10')
+        conn.execute('''DELETE FROM social_sentiment WHERE rowid NOT IN
+            (SELECT MAX(rowid) FROM social_sentiment GROUP BY date, product)''')
+        conn.execute('CREATE UNIQUE INDEX idx_social_date_product ON social_sentiment (date, product)')
+    conn.commit()
+
+
+def upsert_weekly(conn, rows, replace=True):
+    """
+    Upsert (week, product, sentiment) rows into social_sentiment.
+
+    replace=False only fills weeks that have no value yet. Returns the number
+    of rows inserted or changed.
+    """
+    before = conn.total_changes
+    if replace:
+        conn.executemany('''INSERT INTO social_sentiment (date, product, sentiment) VALUES (?, ?, ?)
+            ON CONFLICT(date, product) DO UPDATE SET sentiment = excluded.sentiment
+            WHERE sentiment IS NOT excluded.sentiment''', rows)
+    else:
+        conn.executemany('''INSERT INTO social_sentiment (date, product, sentiment) VALUES (?, ?, ?)
+            ON CONFLICT(date, product) DO NOTHING''', rows)
+    return conn.total_changes - before
+
+
+def _known_ids(conn, ids):
+    known = set()
+    ids = list(ids)
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        known.update(r[0] for r in conn.execute(
+            f"SELECT comment_id FROM social_comments WHERE comment_id IN ({','.join('?' * len(chunk))})", chunk))
+    return known
+
+
+def _reaggregate(conn, keys):
+    rows = []
+    for week, product in sorted(keys):
+        mean = conn.execute('SELECT AVG(sentiment) FROM social_comments WHERE product = ? AND week = ?',
+                            (product, week)).fetchone()[0]
+        if mean is not None:
+            rows.append((week, product, round(mean, 6)))
+    return upsert_weekly(conn, rows)
+
+
+# ---------------------------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------------------------
+
+def ingest_comments(comments, db_path=None, scorer=None, block_rows=None):
+    """
+    Score a stream of comment dicts (date, product, text[, id]) and upsert weekly sentiment.
+
+    Returns:
+        dict: comments read / already stored / inserted, texts scored / served from the
+        cache, and the number of (week, product) aggregates refreshed
+    """
+    own_scorer = scorer is None
+    scorer = scorer or SentimentScorer()
+    block_rows = block_rows or scorer.batch_size * scorer.workers
+    stats = {'read': 0, 'duplicates': 0, 'inserted': 0}
+    weeks = set()
+    changed = 0
+    hits_before, scored_before = scorer.hits, scorer.scored
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_tables(conn)
+
+        def flush(block):
+            nonlocal changed
+            by_id = {comment_id(c): c for c in block}
+            known = _known_ids(conn, by_id)
+            fresh = [(cid, c) for cid, c in by_id.items() if cid not in known]
+            stats['duplicates'] += len(block) - len(fresh)
+            if not fresh:
+                return
+            scores = scorer.score([c['text'] for _, c in fresh])
+            rows = [(cid, c['date'], week_end(c['date']), c['product'], s) for (cid, c), s in zip(fresh, scores)]
+            conn.executemany('''INSERT INTO social_comments (comment_id, date, week, product, sentiment)
+                VALUES (?, ?, ?, ?, ?) ON CONFLICT(comment_id) DO NOTHING''', rows)
+            stats['inserted'] += len(rows)
+            touched = {(r[2], r[3]) for r in rows}
+            weeks.update(touched)
+            changed += _reaggregate(conn, touched)
+            conn.commit()
+
+        block = []
+        for comment in comments:
+            stats['read'] += 1
+            block.append(comment)
+            if len(block) >= block_rows:
+                flush(block)
+                block = []
+        if block:
+            flush(block)
+        if changed:
+            data_version.bump('social_sentiment', conn)
+    finally:
+        conn.close()
+        if own_scorer:
+            scorer.close()
+    stats['weeks'] = len(weeks)
+    stats['scored'] = scorer.scored - scored_before
+    stats['cache_hits'] = scorer.hits - hits_before
+    return stats
+
+
+def ingest_file(source, fmt=None, db_path=None, scorer=None):
+    """ingest_comments() over a CSV/NDJSON path, '-' for stdin, or an open text file (adds 'skipped')."""
+    counts = {'skipped': 0}
+    stats = ingest_comments(read_comments(source, fmt, counts), db_path=db_path, scorer=scorer)
+    stats['skipped'] = counts['skipped']
+    return stats
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Score social comments and upsert weekly sentiment')
+    ap.add_argument('source', help="CSV or NDJSON file, or '-' for stdin")
+    ap.add_argument('--format', choices=FORMATS, help='default: from the file extension (.ndjson/.jsonl, else csv)')
+    ap.add_argument('--workers', type=int, default=SENTIMENT_WORKERS)
+    ap.add_argument('--batch', type=int, default=SENTIMENT_BATCH)
+    ap.add_argument('--db', default=None)
+    args = ap.parse_args()
+    with SentimentScorer(workers=args.workers, batch_size=args.batch) as s:
+        result = ingest_file(args.source, args.format, db_path=args.db, scorer=s)
+    print(json.dumps(result, indent=2))
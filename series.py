@@ -0,0 +1,213 @@
+# File: series.py
+# Downsampling and cursor pagination for the time-series endpoints.
+#
+# Series are built once per data version and kept as sorted numpy arrays
+# (get_series()); every request after that only slices or samples them.
+#
+#   ?points=N[&method=lttb|minmax]   at most N rows for a chart.
+#       lttb    Largest-Triangle-Three-Buckets: keeps the first/last point and
+#               in each bucket the point spanning the largest triangle with
+#               its neighbours, so peaks and the overall shape survive.
+#       minmax  min and max of each bucket (never hides a spike).
+#   ?limit=N[&cursor=...]            raw rows in pages of N. The next page's
+#       cursor is returned in the X-Next-Cursor header (absent on the last
+#       page) and the full length in X-Total-Count. Cursors point at an x
+#       value rather than an offset, so appending newer data does not shift
+#       pages a client is walking through.
+#
+# Sampled results are memoized per (series, points, method) alongside the
+# arrays, in a small LRU (SERIES_SAMPLE_CACHE_SIZE per series) so clients
+# walking through ?points= values cannot grow it without bound. Without any
+# of these parameters endpoints return the whole series.
+
+import base64
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import data_version
+
+
+METHODS = ('lttb', 'minmax')
+MAX_POINTS = int(os.environ.get('SERIES_MAX_POINTS', 5000))
+MAX_PAGE_SIZE = int(os.environ.get('SERIES_MAX_PAGE_SIZE', 10000))
+CACHE_SIZE = int(os.environ.get('SERIES_CACHE_SIZE', 64))
+SAMPLE_CACHE_SIZE = int(os.environ.get('SERIES_SAMPLE_CACHE_SIZE', 8))
+
+
+class SeriesError(ValueError):
+    """Bad points/method/cursor/limit parameters."""
+
+
+def lttb_indices(x, y, n):
+    """Row indices of the LTTB sample of (x, y) with n points (x sorted ascending)."""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size - 1][:max(n, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # n - 2 buckets over the interior points; each is at least one row wide
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < n - 1:
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(x, y, n):
+    """Row indices of the min and max of each of n // 2 equal-count buckets."""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    y = np.asarray(y, dtype=np.float64)
+    buckets = max(n // 2, 1)
+    edges = np.linspace(0, size, buckets + 1).astype(np.int64)
+    picks = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        chunk = y[lo:hi]
+        if np.isnan(chunk).all():
+            picks.append(lo)
+            continue
+        picks.append(lo + int(np.nanargmin(chunk)))
+        picks.append(lo + int(np.nanargmax(chunk)))
+    return np.unique(np.array(picks, dtype=np.int64))
+
+
+SAMPLERS = {'lttb': lttb_indices, 'minmax': minmax_indices}
+
+
+def _encode_cursor(x_value, seen):
+    raw = f'{int(x_value)}:{int(seen)}'.encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        x_value, seen = raw.split(':')
+        return int(x_value), int(seen)
+    except Exception:
+        raise SeriesError('invalid cursor')
+
+
+class CachedSeries:
+    """A frame sorted by `x_col` plus its x / y arrays and a memo of samples."""
+
+    def __init__(self, frame, x_col, y_col):
+        self.frame = frame.sort_values(x_col, kind='mergesort').reset_index(drop=True) if len(frame) else frame
+        col = self.frame[x_col] if len(self.frame) else None
+        if col is None:
+            self.x = np.empty(0, dtype=np.int64)
+        elif np.issubdtype(col.dtype, np.datetime64):
+            self.x = col.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        else:
+            try:
+                self.x = np.asarray(col, dtype=np.float64).astype(np.int64)
+            except (TypeError, ValueError):
+                # Text dates (e.g. social_sentiment.date) -> epoch ns
+                self.x = np.asarray(col, dtype='datetime64[ns]').view(np.int64)
+        self.y = self.frame[y_col].to_numpy(dtype=np.float64, na_value=np.nan) if len(self.frame) else np.empty(0)
+        self._samples = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def sample(self, points, method='lttb'):
+        key = (points, method)
+        with self._lock:
+            hit = self._samples.get(key)
+            if hit is not None:
+                self._samples.move_to_end(key)
+                return hit
+        hit = self.frame.iloc[SAMPLERS[method](self.x, self.y, points)].reset_index(drop=True)
+        with self._lock:
+            self._samples[key] = hit
+            while len(self._samples) > SAMPLE_CACHE_SIZE:
+                self._samples.popitem(last=False)
+        return hit
+
+    def page(self, cursor, limit):
+        """(rows, next_cursor | None) for the page after `cursor`."""
+        start = 0
+        if cursor:
+            x_value, seen = _decode_cursor(cursor)
+            start = int(np.searchsorted(self.x, x_value, side='left')) + seen
+        end = min(start + limit, len(self.x))
+        rows = self.frame.iloc[start:end].reset_index(drop=True)
+        if end >= len(self.x):
+            return rows, None
+        last = self.x[end - 1]
+        seen = end - int(np.searchsorted(self.x, last, side='left'))
+        return rows, _encode_cursor(last, seen)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_series(name, key, tables, build, x_col, y_col):
+    """CachedSeries for (name, key), rebuilt with `build()` when `tables` change."""
+    stamp = data_version.version_key(tuple(tables))
+    with _cache_lock:
+        hit = _cache.get((name, key))
+        if hit is not None and hit[0] == stamp:
+            _cache.move_to_end((name, key))
+            return hit[1]
+    series = CachedSeries(build(), x_col, y_col)
+    with _cache_lock:
+        _cache[(name, key)] = (stamp, series)
+        _cache.move_to_end((name, key))
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return series
+
+
+def parse_args(args):
+    """Validate ?points/method/cursor/limit -> dict (raises SeriesError)."""
+    points = args.get('points', type=int)
+    limit = args.get('limit', type=int)
+    if (args.get('points') and points is None) or (args.get('limit') and limit is None):
+        raise SeriesError('points and limit must be integers')
+    cursor = args.get('cursor') or None
+    method = (args.get('method') or 'lttb').lower()
+    if method not in METHODS:
+        raise SeriesError(f"method must be one of: {', '.join(METHODS)}")
+    if points is not None and (limit is not None or cursor):
+        raise SeriesError('points cannot be combined with cursor/limit')
+    if points is not None and not 3 <= points <= MAX_POINTS:
+        raise SeriesError(f'points must be between 3 and {MAX_POINTS}')
+    if cursor and limit is None:
+        limit = min(1000, MAX_PAGE_SIZE)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise SeriesError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return {'points': points, 'method': method, 'cursor': cursor, 'limit': limit}
+
+
+def select(series, opts):
+    """Apply parsed options to a CachedSeries -> (frame, extra response headers)."""
+    if opts['points'] is not None:
+        return series.sample(opts['points'], opts['method']), {'X-Total-Count': str(len(series))}
+    if opts['limit'] is not None:
+        rows, next_cursor = series.page(opts['cursor'], opts['limit'])
+        headers = {'X-Total-Count': str(len(series))}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return rows, headers
+    return series.frame, {}
@@ -0,0 +1,446 @@
+# File: sketches.py
+# Mergeable sketches for approximate analytics over very large histories.
+#
+#   HyperLogLog      distinct users per product/day (and per product, overall)
+#   CountMinSketch   SKU revenue / units, with a top-k heavy-hitter list
+#   TDigest          price and basket-size quantiles
+#   daily totals     exact units / revenue / orders per (product, day)
+#
+# All updates are vectorized over a batch of transactions (64-bit hashes
+# from pandas, register/counter updates with numpy ufunc.at), every sketch
+# merges with another of the same shape, and memory is fixed regardless of
+# the number of rows (the daily totals grow with products x days, not with
+# transactions). analytics.approx_kpis answers ?approx=1 from the store
+# alone, without loading the transactions table. Batches are fed ordered by
+# transaction_id so basket sizes stay whole across batch boundaries.
+#
+# The SketchStore is rebuilt by the transaction write paths
+# (data_ingestion.ingest_mock_transactions, generate_big_db, regenerate_db)
+# and saved next to the database; a store whose transactions data version
+# no longer matches the database is rebuilt lazily on first use, by one
+# thread at a time.
+
+import math
+import os
+import pickle
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_version
+from database import DB_PATH
+
+
+HLL_PRECISION_DAY = 10   # 1024 registers, ~3.3% standard error
+HLL_PRECISION_TOTAL = 14  # 16384 registers, ~0.8% standard error
+CMS_WIDTH = 2048
+CMS_DEPTH = 4
+TOP_K = 20
+TDIGEST_COMPRESSION = 100
+
+
+def hash64(values):
+    """Vectorized 64-bit hashes (uint64) of any array-like of values."""
+    return pd.util.hash_array(np.asarray(pd.Series(values).astype(str), dtype=object))
+
+
+class HyperLogLog:
+    def __init__(self, p=HLL_PRECISION_TOTAL):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, h):
+        if len(h) == 0:
+            return
+        h = np.asarray(h, dtype=np.uint64)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.p)) - 1)
+        # rank = position of the leftmost 1-bit in the remaining 64-p bits
+        bits = np.zeros(len(rest), dtype=np.int64)
+        nz = rest > 0
+        bits[nz] = np.frexp(rest[nz].astype(np.float64))[1]
+        rank = (64 - self.p) - bits + 1
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if est <= 2.5 * m and zeros:
+            est = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(est))
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+
+_CMS_SEEDS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+                       0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53], dtype=np.uint64)
+
+
+class CountMinSketch:
+    """Count-Min sketch with an exact-key candidate list for top-k heavy hitters."""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, k=TOP_K):
+        self.width, self.depth, self.k = width, depth, k
+        self.table = np.zeros((depth, width), dtype=np.float64)
+        self.total = 0.0
+        self.candidates = {}
+
+    def _columns(self, h):
+        with np.errstate(over='ignore'):
+            return [((h ^ _CMS_SEEDS[i]) * _CMS_SEEDS[-1 - i] >> np.uint64(33)) % np.uint64(self.width)
+                    for i in range(self.depth)]
+
+    def _estimate_hashes(self, h):
+        cols = self._columns(np.asarray(h, dtype=np.uint64))
+        return np.min([self.table[i, c.astype(np.int64)] for i, c in enumerate(cols)], axis=0)
+
+    def add(self, keys, weights):
+        keys = pd.Series(keys).astype(str)
+        weights = pd.Series(np.asarray(weights, dtype=np.float64), index=keys.index)
+        # Pre-aggregate the batch so each distinct key costs one counter update per row
+        batch = weights.groupby(keys.to_numpy()).sum()
+        h = hash64(batch.index)
+        for i, c in enumerate(self._columns(h)):
+            np.add.at(self.table[i], c.astype(np.int64), batch.to_numpy())
+        self.total += float(batch.sum())
+        self._update_candidates(batch.index)
+
+    def _update_candidates(self, keys):
+        keys = list(set(self.candidates) | set(keys))
+        est = self._estimate_hashes(hash64(keys))
+        keep = np.argsort(-est, kind='stable')[:self.k * 4]
+        self.candidates = {keys[i]: float(est[i]) for i in keep}
+
+    def estimate(self, key):
+        return float(self._estimate_hashes(hash64([key]))[0])
+
+    def top(self, n=None):
+        n = n or self.k
+        return sorted(self.candidates.items(), key=lambda kv: -kv[1])[:n]
+
+    def merge(self, other):
+        self.table += other.table
+        self.total += other.total
+        self._update_candidates(list(other.candidates))
+        return self
+
+    @property
+    def error_bound(self):
+        """Overestimate is at most e/width * total with probability 1 - e^-depth."""
+        return math.e / self.width * self.total
+
+
+class TDigest:
+    """Merging t-digest; compression via the k1 (arcsine) scale function, fully vectorized."""
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    def _compress(self, means, weights):
+        if len(means) == 0:
+            return
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        # each centroid spans at most one unit of k(q) = delta/(2 pi) * asin(2q - 1)
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * q_left - 1, -1, 1))
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        cluster = np.unique(cluster, return_inverse=True)[1]
+        w = np.bincount(cluster, weights=weights)
+        self.means = np.bincount(cluster, weights=means * weights) / w
+        self.weights = w
+
+    def add(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        ok = ~np.isnan(values)
+        values, weights = values[ok], weights[ok]
+        if len(values) == 0:
+            return
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, weights]))
+
+    def merge(self, other):
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        if len(self.means) == 0:
+            return None
+        cum = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), cum, self.means))
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+
+class SketchStore:
+    """All sketches for one transactions table."""
+
+    FORMAT = 3  # bump when fields change so older pickles are rebuilt
+
+    def __init__(self):
+        self.format = self.FORMAT
+        self.users_day = {}     # (product, 'YYYY-MM-DD') -> HLL (p=10)
+        self.users_product = {}  # product -> HLL (p=14)
+        self.users_all = HyperLogLog()
+        self.orders_all = HyperLogLog()  # distinct transaction_id
+        self.sku_revenue = CountMinSketch()
+        self.sku_units = CountMinSketch()
+        self.price = TDigest()
+        self.basket_size = TDigest()
+        self.daily = None  # DataFrame of units/revenue/orders indexed by (product, day)
+        self.open_basket = None  # (transaction_id, units) of the last batch's trailing order
+        self.rows = 0
+        self.stamp = None
+
+    def update(self, df):
+        """Fold a batch of transaction rows into every sketch."""
+        if df is None or df.empty:
+            return self
+        day = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        sku = df['product_name'] if 'product_name' in df.columns else df['product']
+        if 'user_id' in df.columns:
+            users = df['user_id'].notna().to_numpy()
+            h = hash64(df['user_id'][users])
+            products = df['product'][users].to_numpy()
+            days = day[users].to_numpy()
+            self.users_all.add_hashes(h)
+            for product, idx in pd.Series(np.arange(len(h))).groupby(products).groups.items():
+                self.users_product.setdefault(product, HyperLogLog()).add_hashes(h[idx])
+            for (product, d), idx in pd.Series(np.arange(len(h))).groupby([products, days]).groups.items():
+                self.users_day.setdefault((product, d), HyperLogLog(HLL_PRECISION_DAY)).add_hashes(h[idx])
+        revenue = df['quantity'] * df['price']
+        daily = pd.DataFrame({'units': df['quantity'], 'revenue': revenue, 'orders': 1}).groupby(
+            [df['product'].rename('product'), day.rename('day')]).sum().astype(float)
+        self._add_daily(daily)
+        self.sku_revenue.add(sku, revenue)
+        self.sku_units.add(sku, df['quantity'])
+        self.price.add(df['price'].to_numpy())
+        if 'transaction_id' in df.columns:
+            self.orders_all.add_hashes(hash64(df['transaction_id']))
+            self._add_baskets(df)
+        else:
+            self.basket_size.add(df['quantity'].to_numpy())
+        self.rows += len(df)
+        return self
+
+    def _add_baskets(self, df):
+        # Batches arrive ordered by transaction_id, so only the last order of a
+        # batch can continue into the next one: hold it back until an id changes.
+        baskets = df.groupby('transaction_id', sort=False)['quantity'].sum().astype(float)
+        if self.open_basket is not None:
+            tid, units = self.open_basket
+            if tid in baskets.index:
+                baskets[tid] += units
+            else:
+                self.basket_size.add(np.array([units], dtype=float))
+        self.open_basket = (baskets.index[-1], float(baskets.iloc[-1]))
+        self.basket_size.add(baskets.iloc[:-1].to_numpy())
+
+    def finish(self):
+        """Flush the held-back trailing order; call once the last batch was added."""
+        if self.open_basket is not None:
+            self.basket_size.add(np.array([self.open_basket[1]], dtype=float))
+            self.open_basket = None
+        return self
+
+    def _add_daily(self, daily):
+        if daily is None:
+            return
+        self.daily = daily if self.daily is None else self.daily.add(daily, fill_value=0)
+
+    def merge(self, other):
+        self.finish()
+        other.finish()
+        self._add_daily(other.daily)
+        for key, hll in other.users_day.items():
+            self.users_day.setdefault(key, HyperLogLog(HLL_PRECISION_DAY)).merge(hll)
+        for key, hll in other.users_product.items():
+            self.users_product.setdefault(key, HyperLogLog()).merge(hll)
+        self.users_all.merge(other.users_all)
+        self.orders_all.merge(other.orders_all)
+        self.sku_revenue.merge(other.sku_revenue)
+        self.sku_units.merge(other.sku_units)
+        self.price.merge(other.price)
+        self.basket_size.merge(other.basket_size)
+        self.rows += other.rows
+        return self
+
+    # -- queries -----------------------------------------------------------
+
+    def distinct_users(self, product=None, start=None, end=None):
+        """Approximate distinct users, optionally per product and/or date range (inclusive)."""
+        if start is None and end is None:
+            if product is None:
+                return self.users_all.count()
+            hll = self.users_product.get(product)
+            return hll.count() if hll else 0
+        union = HyperLogLog(HLL_PRECISION_DAY)
+        for (p, d), hll in self.users_day.items():
+            if product is not None and p != product:
+                continue
+            if (start and d < start) or (end and d > end):
+                continue
+            union.merge(hll)
+        return union.count()
+
+    def totals(self, start=None, end=None):
+        """Exact units/revenue/orders per product over an inclusive 'YYYY-MM-DD' range (all days if None)."""
+        if self.daily is None:
+            return pd.DataFrame(columns=['units', 'revenue', 'orders'], index=pd.Index([], name='product'))
+        d = self.daily
+        if start is not None or end is not None:
+            days = d.index.get_level_values('day')
+            mask = np.ones(len(d), dtype=bool)
+            if start is not None:
+                mask &= days >= start
+            if end is not None:
+                mask &= days <= end
+            d = d[mask]
+        out = d.groupby(level='product').sum()
+        return out.reindex(self.daily.index.unique('product'), fill_value=0.0)
+
+    def distinct_orders(self):
+        """Approximate distinct transaction_id count (rows if the column is absent)."""
+        return self.orders_all.count() or self.rows
+
+    def quantiles(self, qs=(0.5, 0.9, 0.99)):
+        return {
+            'price': {f'p{int(q * 100)}': _round(self.price.quantile(q)) for q in qs},
+            'basket_size': {f'p{int(q * 100)}': _round(self.basket_size.quantile(q)) for q in qs},
+        }
+
+    def error_bounds(self):
+        return {
+            'distinct_users_rel_error': round(self.users_all.relative_error, 4),
+            'distinct_users_day_rel_error': round(1.04 / math.sqrt(1 << HLL_PRECISION_DAY), 4),
+            'sku_revenue_abs_error': round(self.sku_revenue.error_bound, 2),
+            'sku_units_abs_error': round(self.sku_units.error_bound, 2),
+            'error_confidence': round(1 - math.exp(-CMS_DEPTH), 4),
+            'tdigest_compression': TDIGEST_COMPRESSION,
+        }
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, db_path=None):
+        self.finish()
+        path = sketch_path(db_path)
+        self.stamp = _db_stamp(db_path or DB_PATH)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+
+def _round(v, digits=2):
+    return None if v is None else round(v, digits)
+
+
+def sketch_path(db_path=None):
+    return os.path.splitext(db_path or DB_PATH)[0] + '.sketches.pkl'
+
+
+def _db_stamp(db_path):
+    return data_version.version_key(('transactions',), db_path)
+
+
+def build_store(df, chunk_rows=200000):
+    """Build a SketchStore from a transactions frame, in chunks to bound peak memory."""
+    store = SketchStore()
+    if 'transaction_id' in df.columns:
+        # Keep each order's rows adjacent so a basket never spans two chunks unseen
+        df = df.sort_values('transaction_id', kind='stable')
+    for start in range(0, len(df), chunk_rows):
+        store.update(df.iloc[start:start + chunk_rows])
+    return store.finish()
+
+
+def rebuild(df, db_path=None):
+    """Write path hook: rebuild and save the sketches after transactions were (re)written."""
+    store = build_store(df)
+    with _build_lock:
+        store.save(db_path)
+        with _lock:
+            _store.update(store=store, path=db_path or DB_PATH)
+    return store
+
+
+_store = {'store': None, 'path': None}
+_lock = threading.Lock()
+_build_lock = threading.Lock()  # one load/rebuild at a time; held across the slow part
+
+
+def _cached(db_path, stamp=None):
+    with _lock:
+        store = _store['store']
+        if store is not None and _store['path'] == db_path and (stamp is None or store.stamp == stamp):
+            return store
+    return None
+
+
+def get_store(db_path=None):
+    """The SketchStore for `db_path`, loaded from disk or rebuilt if the database changed.
+
+    Only one thread loads or rebuilds at a time. While a rebuild is running,
+    callers get the previous store if there is one (the answers are approximate
+    anyway) and otherwise wait for the rebuild.
+    """
+    db_path = db_path or DB_PATH
+    store = _cached(db_path, _db_stamp(db_path))
+    if store is not None:
+        return store
+    if not _build_lock.acquire(blocking=False):
+        store = _cached(db_path)
+        if store is not None:
+            return store
+        _build_lock.acquire()
+    try:
+        return _load_or_rebuild(db_path)
+    finally:
+        _build_lock.release()
+
+
+def _load_or_rebuild(db_path):
+    # Re-check under the build lock: another thread may have just finished
+    stamp = _db_stamp(db_path)
+    store = _cached(db_path, stamp)
+    if store is not None:
+        return store
+    try:
+        with open(sketch_path(db_path), 'rb') as f:
+            store = pickle.load(f)
+        if store.stamp != stamp or getattr(store, 'format', 1) != SketchStore.FORMAT:
+            store = None
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        store = None
+    if store is None:
+        conn = sqlite3.connect(db_path)
+        try:
+            store = SketchStore()
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(transactions)')}
+            order = ' ORDER BY transaction_id' if 'transaction_id' in columns else ''
+            for chunk in pd.read_sql('SELECT * FROM transactions' + order, conn, chunksize=200000):
+                store.update(chunk)
+        finally:
+            conn.close()
+        store.save(db_path)
+    with _lock:
+        _store.update(store=store, path=db_path)
+    return store
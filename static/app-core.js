@@ -9,6 +9,9 @@ let currentTheme = localStorage.getItem('preferred_theme') || 'light';
 let translations = {};
 let currentProduct = '';
 
+// Long series are downsampled server-side (LTTB) to about what a chart can draw
+const SERIES_CHART_POINTS = 500;
+
 // === API Helper ===
 const api = (path, params = {}) => {
   const url = new URL(path, window.location.origin);
@@ -18,6 +21,20 @@ const api = (path, params = {}) => {
   return fetch(url).then(r => r.json());
 };
 
+// All analytics panels come from one /api/dashboard response, fetched once
+// and reused for a minute; a failed panel falls back to its own endpoint.
+let dashboardCache = null;
+const DASHBOARD_TTL_MS = 60000;
+const dashboardPanel = async (name, fallbackPath) => {
+  if (!dashboardCache || Date.now() - dashboardCache.at > DASHBOARD_TTL_MS) {
+    dashboardCache = { at: Date.now(), data: api('/api/dashboard').catch(() => ({})) };
+  }
+  const data = await dashboardCache.data;
+  const panel = data && data[name];
+  if (panel && !panel.error) return panel;
+  return api(fallbackPath);
+};
+
 // === Tutorial System ===
 function showTutorial() {
   const overlay = document.getElementById('tutorialOverlay');
@@ -241,12 +258,13 @@ document.getElementById('btnForecast')?.addEventListener('click', async () => {
   showToast(t('toast_fetching_forecast'));
 
   try {
-    const res = await api('/api/forecast', { product });
+    // Column-oriented payload: { ds: [...], yhat: [...], ... }
+    const res = await api('/api/forecast', { product, format: 'columns', points: SERIES_CHART_POINTS });
     if (res.error) throw new Error(res.error);
 
     // Format labels to show day name and date
-    const labels = res.map(r => formatDateLabel(r.ds));
-    const data = res.map(r => r.yhat);
+    const labels = (res.ds || []).map(formatDateLabel);
+    const data = res.yhat || [];
 
     // Hide empty state, show chart
     hideElement('forecastEmpty');
@@ -361,10 +379,10 @@ document.getElementById('btnSocial')?.addEventListener('click', async () => {
   showToast(t('toast_loading_social'));
 
   try {
-    const res = await api('/api/social_series', { product });
-    const series = res.series || [];
+    const res = await api('/api/social_series', { product, format: 'columns', points: SERIES_CHART_POINTS });
+    const series = res.series || {};
 
-    if (series.length === 0) {
+    if (!series.date || series.date.length === 0) {
       showToast(currentLang === 'bn' ? 'কোনো ডেটা পাওয়া যায়নি' : 'No data found', 'error');
       return;
     }
@@ -379,9 +397,7 @@ document.getElementById('btnSocial')?.addEventListener('click', async () => {
       socialSection.classList.add('show');
     }
 
-    const labels = series.map(s => s.date);
-    const vals = series.map(s => s.sentiment);
-    renderSocial(labels, vals);
+    renderSocial(series.date, series.sentiment);
 
     showToast(currentLang === 'bn' ? 'সোশ্যাল ডেটা লোড হয়েছে!' : 'Social data loaded!', 'info');
   } catch (e) {
@@ -839,11 +855,10 @@ document.getElementById('btnForecast').addEventListener('click', async () => {
   if (!product) { showToast('দয়া করে একটি পণ্য নির্বাচন করুন', 'warning'); return; }
   showToast('পূর্বাভাস তৈরি হচ্ছে...');
   try {
-    const res = await api(`/api/forecast?product=${product}`);
+    const res = await api('/api/forecast', { product, format: 'columns', points: SERIES_CHART_POINTS });
     if (res.error) throw new Error(res.error);
-    const forecastData = Array.isArray(res) ? res : res.forecast || res;
-    const labels = forecastData.map(item => formatDateLabel(item.ds));
-    const yhat = forecastData.map(item => item.yhat);
+    const labels = (res.ds || []).map(formatDateLabel);
+    const yhat = res.yhat || [];
     const avgSales = (yhat.reduce((a, b) => a + b, 0) / yhat.length).toFixed(0);
     showUnifiedResults('চাহিদা পূর্বাভাস', `<div class="chart-container"><canvas id="forecastChartUnified"></canvas></div><div class="mt-3"><p class="fw-bold">📈 পরবর্তী ৩০ দিনের পূর্বাভাস</p><p>গড় দৈনিক বিক্রয়: <strong>${avgSales} units</strong></p></div>`, '📊');
     setTimeout(() => {
@@ -887,12 +902,12 @@ document.getElementById('btnSocial').addEventListener('click', async () => {
   if (!product) { showToast('দয়া করে একটি পণ্য নির্বাচন করুন', 'warning'); return; }
   showToast('সামাজিক তথ্য আনা হচ্ছে...');
   try {
-    const res = await api(`/api/social_series?product=${product}`);
+    const res = await api('/api/social_series', { product, format: 'columns', points: SERIES_CHART_POINTS });
     if (res.error) throw new Error(res.error);
     showUnifiedResults('সামাজিক অনুভূতি', `<div class="chart-container"><canvas id="socialChartUnified"></canvas></div><div class="mt-3 alert alert-info"><strong>😊 সামাজিক অনুভূতি:</strong> ইতিবাচক</div>`, '😊');
     setTimeout(() => {
       const ctx = document.getElementById('socialChartUnified');
-      if (ctx && res.series) new Chart(ctx, { type: 'line', data: { labels: res.series.map(s => s.date), datasets: [{ label: 'Sentiment', data: res.series.map(s => s.sentiment), borderColor: '#fd79a8', backgroundColor: 'rgba(253,121,168,0.1)', tension: 0.4, fill: true }] }, options: { responsive: true, maintainAspectRatio: false } });
+      if (ctx && res.series) new Chart(ctx, { type: 'line', data: { labels: res.series.date, datasets: [{ label: 'Sentiment', data: res.series.sentiment, borderColor: '#fd79a8', backgroundColor: 'rgba(253,121,168,0.1)', tension: 0.4, fill: true }] }, options: { responsive: true, maintainAspectRatio: false } });
     }, 100);
     showToast('সামাজিক তথ্য প্রস্তুত!', 'success');
   } catch (e) { console.error('Social error:', e); }
@@ -902,7 +917,7 @@ document.getElementById('btnSocial').addEventListener('click', async () => {
 document.getElementById('btnStock').addEventListener('click', async () => {
   showToast('স্টক তথ্য আনা হচ্ছে...');
   try {
-    const res = await api('/api/stock/alert');
+    const res = await dashboardPanel('stock_alert', '/api/stock/alert');
     if (res.error) throw new Error(res.error);
     let html = '';
     (res.alerts || []).forEach(alert => {
@@ -919,7 +934,7 @@ document.getElementById('btnStock').addEventListener('click', async () => {
 document.getElementById('btnTrends').addEventListener('click', async () => {
   showToast('বিক্রয় প্রবণতা বিশ্লেষণ হচ্ছে...');
   try {
-    const res = await api('/api/trends/analysis');
+    const res = await dashboardPanel('trends', '/api/trends/analysis');
     if (res.error) throw new Error(res.error);
     let html = `<div class="card mb-3"><div class="card-body"><h5 class="text-primary">🏆 সেরা দিন: ${res.best_day.name}</h5><p>আয়: ৳${res.best_day.revenue.toLocaleString()}</p></div></div><div class="card"><div class="card-body"><h6>সাপ্তাহিক প্যাটার্ন</h6><ul class="list-group">`;
     (res.weekly_pattern || []).forEach(day => { html += `<li class="list-group-item d-flex justify-content-between"><span>${day.day}</span><strong>৳${day.revenue.toLocaleString()}</strong></li>`; });
@@ -933,7 +948,7 @@ document.getElementById('btnTrends').addEventListener('click', async () => {
 document.getElementById('btnCustomer').addEventListener('click', async () => {
   showToast('ক্রেতা তথ্য বিশ্লেষণ হচ্ছে...');
   try {
-    const res = await api('/api/customer/insights');
+    const res = await dashboardPanel('customer_insights', '/api/customer/insights');
     if (res.error) throw new Error(res.error);
     let html = `<div class="row mb-3"><div class="col-md-6"><div class="card"><div class="card-body text-center"><h3 class="text-primary">${res.total_customers}</h3><p class="text-muted">মোট ক্রেতা</p></div></div></div><div class="col-md-6"><div class="card"><div class="card-body text-center"><h3 class="text-success">৳${res.avg_ltv.toLocaleString()}</h3><p class="text-muted">গড় LTV</p></div></div></div></div><h6>🏆 সেরা ৫ ক্রেতা</h6><ul class="list-group mb-3">`;
     (res.top_customers || []).forEach((c, i) => { html += `<li class="list-group-item d-flex justify-content-between"><span>#${i + 1} - ক্রেতা ${c.customer_id}</span><div><strong>৳${c.total_spent.toLocaleString()}</strong> <small>(${c.orders} অর্ডার)</small></div></li>`; });
@@ -947,7 +962,7 @@ document.getElementById('btnCustomer').addEventListener('click', async () => {
 document.getElementById('btnProfit').addEventListener('click', async () => {
   showToast('লাভ হিসাব করা হচ্ছে...');
   try {
-    const res = await api('/api/profit/analysis');
+    const res = await dashboardPanel('profit', '/api/profit/analysis');
     if (res.error) throw new Error(res.error);
     let html = `<div class="row mb-3"><div class="col-md-6"><div class="card bg-success text-white"><div class="card-body text-center"><h3>৳${res.total_profit.toLocaleString()}</h3><p>মোট লাভ</p></div></div></div><div class="col-md-6"><div class="card bg-info text-white"><div class="card-body text-center"><h3>${res.profit_margin.toFixed(1)}%</h3><p>লাভের হার</p></div></div></div></div><h6>🏆 লাভজনক পণ্য</h6><ul class="list-group mb-3">`;
     (res.top_profitable || []).forEach((p, i) => { html += `<li class="list-group-item"><div class="d-flex justify-content-between"><strong>#${i + 1} ${p.product}</strong><span class="badge bg-success">${p.margin.toFixed(1)}%</span></div><small>লাভ: ৳${p.profit.toLocaleString()}</small></li>`; });
@@ -961,7 +976,7 @@ document.getElementById('btnProfit').addEventListener('click', async () => {
 document.getElementById('btnSeasonal').addEventListener('click', async () => {
   showToast('মৌসুমী পূর্বাভাস করা হচ্ছে...');
   try {
-    const res = await api('/api/seasonal/predictor');
+    const res = await dashboardPanel('seasonal', '/api/seasonal/predictor');
     if (res.error) throw new Error(res.error);
     let html = `<div class="alert alert-primary"><h5>🎯 ${res.upcoming_season}</h5></div><div class="card mb-3"><div class="card-body"><h6>পিক মাস: ${res.peak_month.name}</h6><p>আয়: ৳${res.peak_month.revenue.toLocaleString()}</p></div></div><div class="row"><div class="col-md-6"><div class="card"><div class="card-header">ঈদ/রমজান</div><ul class="list-group list-group-flush">`;
     (res.eid_top_products || []).forEach(p => { html += `<li class="list-group-item">${p.product}</li>`; });
@@ -977,7 +992,7 @@ document.getElementById('btnSeasonal').addEventListener('click', async () => {
 document.getElementById('btnMarketing').addEventListener('click', async () => {
   showToast('মার্কেটিং পরিকল্পনা তৈরি হচ্ছে...');
   try {
-    const res = await api('/api/marketing/planner');
+    const res = await dashboardPanel('marketing', '/api/marketing/planner');
     if (res.error) throw new Error(res.error);
     let html = `<div class="alert alert-success"><h5>📅 সেরা দিন: ${res.best_campaign_day}</h5></div><div class="card mb-3"><div class="card-header bg-warning">⚠️ বিক্রয় কমছে</div><ul class="list-group list-group-flush">`;
     (res.declining_products || []).forEach(p => { html += `<li class="list-group-item d-flex justify-content-between"><span>${p.product}</span><span class="badge bg-danger">${p.decline.toFixed(1)}% কমেছে</span></li>`; });
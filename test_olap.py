@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import olap
+
+# Offline checks of olap.py: bad queries raise QueryError (a 400 from
+# /api/query) and valid ones aggregate correctly in a throwaway database.
+failures = []
+
+
+def check(name, ok, detail=''):
+    print(('OK  ' if ok else 'FAIL'), name, detail)
+    if not ok:
+        failures.append(name)
+
+
+def rejected(q):
+    try:
+        olap.normalize_query(q)
+    except olap.QueryError as e:
+        return str(e)
+    except Exception:
+        return None  # any other exception would be a 500
+    return None
+
+
+BAD_QUERIES = {
+    'unknown dimension': {'group': ['colour']},
+    'non-string dimension': {'group': [{'a': 1}]},
+    'group as object': {'group': {'category': 1}},
+    'unknown measure': {'measures': 'profit'},
+    'filters as list': {'filters': ['product']},
+    'filters as string': {'filters': 'product=clothing'},
+    'filter on unknown dimension': {'filters': {'colour': ['red']}},
+    'filter values as object': {'filters': {'product': {'x': 1}}},
+    'sort as list': {'sort': ['-revenue']},
+    'sort as number': {'sort': 1},
+    'sort not selected': {'sort': 'product'},
+    'bad limit': {'limit': 'ten'},
+    'bad start': {'start': '2024-13-45'},
+    'start not a date': {'start': 'yesterday'},
+    'end as number': {'end': 20240101},
+    'start after end': {'start': '2024-03-01', 'end': '2024-01-31'},
+}
+for name, q in BAD_QUERIES.items():
+    msg = rejected(q)
+    check(f'rejects {name}', msg is not None, msg or '')
+
+nq = olap.normalize_query({'group': 'category, month', 'filters': {'user_id': 7, 'product': ['b', 'a']},
+                           'start': '2024-01-05T13:00:00', 'end': '2024-02-01', 'limit': 99999})
+check('normalizes dates', (nq['start'], nq['end']) == ('2024-01-05', '2024-02-01'), str((nq['start'], nq['end'])))
+check('normalizes filters', nq['filters'] == (('product', ('a', 'b')), ('user_id', ('7',))), str(nq['filters']))
+check('clamps limit', nq['limit'] == olap.MAX_LIMIT)
+check('same query, same key', olap.normalize_query({'group': ['category', 'month'], 'filters': {
+    'product': 'a,b', 'user_id': '7'}, 'start': '2024-01-05', 'end': '2024-02-01', 'limit': 99999}) == nq)
+
+# End-to-end on a small database
+fd, db_path = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+try:
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE transactions (transaction_id INTEGER, date TEXT, product TEXT, category TEXT, '
+                 'product_name TEXT, user_id INTEGER, quantity INTEGER, price REAL)')
+    conn.executemany('INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+        (1, '2024-01-01 10:00:00', 'clothing', 'clothing', 'shirt', 1, 2, 10.0),
+        (1, '2024-01-01 10:00:00', 'clothing', 'clothing', 'socks', 1, 1, 5.0),
+        (2, '2024-01-15 12:00:00', 'electronics', 'electronics', 'phone', 2, 1, 300.0),
+        (3, '2024-02-01 23:59:00', 'clothing', 'clothing', 'shirt', 2, 3, 10.0),
+        (4, '2024-02-02 00:00:00', 'clothing', 'clothing', 'shirt', 3, 1, 10.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    res = olap.run_query({'group': ['category'], 'measures': ['revenue', 'orders', 'units'],
+                          'start': '2024-01-01', 'end': '2024-02-01', 'sort': 'category'}, db_path=db_path)
+    check('run_query groups in SQLite', res['rows'] == [['clothing', 55.0, 2, 6], ['electronics', 300.0, 1, 1]],
+          str(res['rows']))
+    res = olap.run_query({'group': 'month', 'measures': 'distinct_users', 'filters': {'product_name': 'shirt'},
+                          'sort': 'month'}, db_path=db_path)
+    check('run_query filters', res['rows'] == [['2024-01', 1], ['2024-02', 2]], str(res['rows']))
+    again = olap.run_query({'group': 'month', 'measures': 'distinct_users', 'filters': {'product_name': ['shirt']},
+                            'sort': 'month'}, db_path=db_path)
+    check('run_query cache hit', again['cached'] and again['rows'] == res['rows'])
+finally:
+    os.remove(db_path)
+
+if failures:
+    print(f'{len(failures)} check(s) failed')
+    sys.exit(1)
+print('all olap checks passed')
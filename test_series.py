@@ -0,0 +1,81 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+import series
+from series import CachedSeries, SeriesError, lttb_indices, minmax_indices
+
+# Offline checks of the downsampling and cursor pagination in series.py.
+failures = []
+
+
+def check(name, ok, detail=''):
+    print(('OK  ' if ok else 'FAIL'), name, detail)
+    if not ok:
+        failures.append(name)
+
+
+x = np.arange(10000, dtype=np.int64)
+y = np.sin(x / 200.0) * 10
+y[4321] = 500.0   # spike
+y[7000] = -500.0  # dip
+
+for n in (3, 10, 100, 999):
+    idx = lttb_indices(x, y, n)
+    check(f'lttb n={n} size', len(idx) == n, str(len(idx)))
+    check(f'lttb n={n} ends kept', idx[0] == 0 and idx[-1] == len(x) - 1)
+    check(f'lttb n={n} strictly increasing', bool((np.diff(idx) > 0).all()))
+idx = lttb_indices(x, y, 100)
+check('lttb keeps the spike and the dip', 4321 in idx and 7000 in idx)
+check('lttb returns everything when n >= size', (lttb_indices(x[:50], y[:50], 80) == np.arange(50)).all())
+check('lttb n < 3', list(lttb_indices(x, y, 2)) == [0, len(x) - 1] and len(lttb_indices(x, y, 0)) == 0)
+
+for n in (2, 10, 101, 1000):
+    idx = minmax_indices(x, y, n)
+    check(f'minmax n={n} at most n points', len(idx) <= n, str(len(idx)))
+    check(f'minmax n={n} sorted and unique', bool((np.diff(idx) > 0).all()))
+    check(f'minmax n={n} keeps global min and max', 4321 in idx and 7000 in idx)
+with_nan = y.copy()
+with_nan[:5000] = np.nan
+idx = minmax_indices(x, with_nan, 20)
+# All-NaN buckets contribute their first row only; the others a real min and max
+check('minmax handles NaN buckets', len(idx[idx < 5000]) == 5 and not np.isnan(with_nan[idx[idx >= 5000]]).any()
+      and 7000 in idx)
+
+# Cursor pages over duplicate x values: every row exactly once, in order
+xs = [1, 1, 1, 2, 2, 3, 3, 3, 3, 4, 5, 5]
+frame = pd.DataFrame({'x': xs, 'y': np.arange(len(xs), dtype=float), 'row': np.arange(len(xs))})
+cached = CachedSeries(frame, 'x', 'y')
+for limit in (1, 2, 3, 4, 5, 12, 50):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = cached.page(cursor, limit)
+        rows.extend(page['row'].tolist())
+        pages += 1
+        if cursor is None or pages > len(xs):
+            break
+    check(f'cursor pages limit={limit}', rows == list(range(len(xs))), str(rows))
+
+# A cursor stays on its row when newer (larger x) rows are appended
+first, cursor = cached.page(None, 4)
+grown = CachedSeries(pd.concat([frame, pd.DataFrame({'x': [6, 7], 'y': [0.0, 0.0], 'row': [12, 13]})]), 'x', 'y')
+rest, _ = grown.page(cursor, 100)
+check('cursor survives appended rows', first['row'].tolist() + rest['row'].tolist() == list(range(14)))
+
+try:
+    cached.page('not-a-cursor!', 5)
+    check('invalid cursor rejected', False)
+except SeriesError:
+    check('invalid cursor rejected', True)
+
+# Sample memo is an LRU of SAMPLE_CACHE_SIZE entries
+big = CachedSeries(pd.DataFrame({'x': x, 'y': y}), 'x', 'y')
+for points in range(10, 10 + series.SAMPLE_CACHE_SIZE + 5):
+    big.sample(points, 'lttb')
+check('sample cache bounded', len(big._samples) == series.SAMPLE_CACHE_SIZE, str(len(big._samples)))
+
+if failures:
+    print(f'{len(failures)} check(s) failed')
+    sys.exit(1)
+print('all series checks passed')
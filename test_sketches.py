@@ -0,0 +1,90 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+import sketches
+from sketches import HyperLogLog, CountMinSketch, TDigest, HLL_PRECISION_DAY
+
+# Offline checks of the approximate-analytics sketches: every estimate must
+# stay inside the error bound the sketch reports (3 standard errors for HLL).
+rng = np.random.default_rng(7)
+failures = []
+
+
+def check(name, ok, detail=''):
+    print(('OK  ' if ok else 'FAIL'), name, detail)
+    if not ok:
+        failures.append(name)
+
+
+# HyperLogLog: large (harmonic mean) and small (linear counting) ranges, both precisions
+for p, n in ((sketches.HLL_PRECISION_TOTAL, 200000), (sketches.HLL_PRECISION_TOTAL, 300),
+             (HLL_PRECISION_DAY, 20000), (HLL_PRECISION_DAY, 50)):
+    hll = HyperLogLog(p)
+    values = rng.choice(10 ** 9, size=n, replace=False)
+    hll.add_hashes(sketches.hash64(values))
+    hll.add_hashes(sketches.hash64(values[: n // 2]))  # duplicates must not count
+    err = abs(hll.count() - n) / n
+    check(f'hll p={p} n={n}', err <= 3 * hll.relative_error, f'rel err {err:.4f} bound {3 * hll.relative_error:.4f}')
+
+a, b = HyperLogLog(), HyperLogLog()
+a.add_hashes(sketches.hash64(np.arange(0, 60000)))
+b.add_hashes(sketches.hash64(np.arange(40000, 100000)))
+err = abs(a.merge(b).count() - 100000) / 100000
+check('hll merge is a union', err <= 3 * a.relative_error, f'rel err {err:.4f}')
+
+# Count-Min: never underestimates; overestimate within e/width * total for ~1 - e^-depth of keys
+keys = np.array([f'sku-{i}' for i in range(5000)])
+weights = np.floor(1000.0 / np.arange(1, 5001) ** 1.1) + 1  # zipf-like SKU revenue
+rows = np.repeat(np.arange(5000), 3)
+cms = CountMinSketch()
+for part in np.array_split(rng.permutation(rows), 4):
+    cms.add(keys[part], weights[part] / 3)
+true = weights
+est = np.array([cms.estimate(k) for k in keys])
+check('cms never underestimates', bool((est >= true - 1e-6).all()))
+within = np.mean(est - true <= cms.error_bound)
+check('cms error bound', within >= 1 - np.exp(-cms.depth), f'{within:.4f} of keys within {cms.error_bound:.1f}')
+top = [k for k, _ in cms.top(5)]
+check('cms top-5 heavy hitters', top == list(keys[:5]), str(top))
+
+# t-digest: quantiles accurate in rank, tightest in the tails; merging keeps it
+values = np.concatenate([rng.lognormal(3, 1, 150000), rng.normal(50, 5, 50000)])
+td, left, right = TDigest(), TDigest(), TDigest()
+for part in np.array_split(values, 10):
+    td.add(part)
+left.add(values[::2])
+right.add(values[1::2])
+left.merge(right)
+ordered = np.sort(values)
+# k1 scale, delta=100: centroids span ~3% of the rank at the median, ~0.2% at p99.9
+for q, tol in ((0.5, 0.02), (0.9, 0.015), (0.99, 0.005), (0.999, 0.002)):
+    for label, digest in (('streamed', td), ('merged', left)):
+        rank = np.searchsorted(ordered, digest.quantile(q)) / len(ordered)
+        check(f'tdigest {label} q={q}', abs(rank - q) <= tol, f'rank {rank:.5f}')
+check('tdigest keeps the weight', td.count == len(values) and left.count == len(values))
+check('tdigest is bounded', len(td.means) <= 2 * sketches.TDIGEST_COMPRESSION, f'{len(td.means)} centroids')
+
+# Basket sizes: an order split across batches (or build chunks) is still one basket
+df = pd.DataFrame({
+    'date': ['2024-01-01'] * 6,
+    'product': ['clothing'] * 6,
+    'product_name': ['a', 'b', 'c', 'a', 'b', 'c'],
+    'quantity': [1, 2, 3, 4, 5, 6],
+    'price': [10.0] * 6,
+    'transaction_id': [1, 2, 2, 2, 3, 3],
+})
+store = sketches.SketchStore()
+store.update(df.iloc[:2]).update(df.iloc[2:5]).update(df.iloc[5:]).finish()
+check('basket count across batches', store.basket_size.count == 3, str(store.basket_size.count))
+check('basket sizes across batches', sorted(store.basket_size.means.tolist()) == [1.0, 9.0, 11.0],
+      str(store.basket_size.means.tolist()))
+built = sketches.build_store(df.sample(frac=1, random_state=1), chunk_rows=2)
+check('build_store chunks keep baskets whole', sorted(built.basket_size.means.tolist()) == [1.0, 9.0, 11.0],
+      str(built.basket_size.means.tolist()))
+
+if failures:
+    print(f'{len(failures)} check(s) failed')
+    sys.exit(1)
+print('all sketch checks passed')
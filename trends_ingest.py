@@ -0,0 +1,296 @@
+# File: trends_ingest.py
+# Incremental, idempotent Google Trends ingestion.
+#
+# `trends` holds one row per (date, product), enforced by a unique index;
+# rows are upserted, so re-running ingestion never duplicates anything.
+# Older databases that already collected duplicates are de-duplicated once
+# when the index is created.
+#
+# `trends_ingest_state` tracks, per product, the last date stored and when it
+# was last fetched (the table holds one region, as before). A run:
+#   - skips products fetched less than TRENDS_MIN_INTERVAL seconds ago
+#     (app restarts no longer hit Google);
+#   - asks only for [last date - TRENDS_OVERLAP_DAYS, today], or the last
+#     TRENDS_LOOKBACK_DAYS for a new product;
+#   - keeps the stored history as it is: only points from the last stored
+#     date on are written (that last point may have been a partial week).
+#     Google rescales interest to 0-100 within each requested timeframe,
+#     so for sources that are not scale-stable (pytrends) the new points
+#     are first multiplied by stored/new over the overlap dates, which puts
+#     them on the stored scale (values may then exceed 100). Google answers
+#     short timeframes with daily points; PytrendsSource averages them into
+#     the Sunday-dated weeks of the long-range history;
+#   - fetches products concurrently (TRENDS_CONCURRENCY threads), with every
+#     request passing a shared token-bucket RateLimiter (TRENDS_RATE per
+#     second, bursts of TRENDS_BURST) and retrying with backoff;
+#   - writes from the calling thread only, so SQLite sees a single writer,
+#     and bumps the 'trends' data version only when rows changed.
+#
+# Sources are pluggable. A source is any object with
+# fetch(product, start, end, geo) -> iterable of (YYYY-MM-DD, interest), and
+# an optional `scale_stable` attribute (True when values do not depend on the
+# requested range, like the mock server; overlap rescaling is then skipped).
+# TRENDS_SOURCE selects one:
+#   pytrends (default)            Google Trends through pytrends
+#   http://127.0.0.1:8766         a JSON endpoint such as mock_trends_server.py
+#   package.module:factory        any importable callable returning a source
+
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import data_version
+from database import DB_PATH
+
+
+TRENDS_SOURCE = os.environ.get('TRENDS_SOURCE', 'pytrends')
+TRENDS_CONCURRENCY = int(os.environ.get('TRENDS_CONCURRENCY', 4))
+TRENDS_RATE = float(os.environ.get('TRENDS_RATE', 1.0))
+TRENDS_BURST = int(os.environ.get('TRENDS_BURST', 2))
+TRENDS_RETRIES = int(os.environ.get('TRENDS_RETRIES', 3))
+TRENDS_LOOKBACK_DAYS = int(os.environ.get('TRENDS_LOOKBACK_DAYS', 5 * 365))
+TRENDS_OVERLAP_DAYS = int(os.environ.get('TRENDS_OVERLAP_DAYS', 28))
+TRENDS_MIN_INTERVAL = float(os.environ.get('TRENDS_MIN_INTERVAL', 12 * 3600))
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class PytrendsSource:
+    """Google Trends via pytrends (one TrendReq per thread; it is not thread-safe)."""
+
+    scale_stable = False  # Google normalizes each timeframe to its own 0-100
+
+    def __init__(self, hl='en-US', tz=360):
+        self.hl = hl
+        self.tz = tz
+        self._local = threading.local()
+
+    def _client(self):
+        if getattr(self._local, 'client', None) is None:
+            from pytrends.request import TrendReq
+            self._local.client = TrendReq(hl=self.hl, tz=self.tz)
+        return self._local.client
+
+    def fetch(self, product, start, end, geo):
+        client = self._client()
+        client.build_payload([product], cat=0, timeframe=f'{start.isoformat()} {end.isoformat()}', geo=geo)
+        data = client.interest_over_time()
+        if data is None or data.empty or product not in data.columns:
+            return []
+        return to_weekly([(ts.date(), int(v)) for ts, v in data[product].items()])
+
+
+def to_weekly(points):
+    """Average daily (date, value) points into weeks dated on their Sunday, like Google's weekly data.
+
+    Points that are already weekly (Sunday-dated) pass through unchanged.
+    """
+    weeks = {}
+    for day, value in points:
+        week = day - timedelta(days=(day.weekday() + 1) % 7)
+        weeks.setdefault(week, []).append(value)
+    return [(week.isoformat(), int(round(sum(vs) / len(vs)))) for week, vs in sorted(weeks.items())]
+
+
+class HTTPSource:
+    """JSON source: GET {base_url}/trends?product=&start=&end=&geo= -> [{"date", "interest"}, ...]."""
+
+    scale_stable = True
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def fetch(self, product, start, end, geo):
+        query = urlencode({'product': product, 'start': start.isoformat(), 'end': end.isoformat(), 'geo': geo})
+        with urlopen(f'{self.base_url}/trends?{query}', timeout=self.timeout) as resp:
+            rows = json.loads(resp.read().decode('utf-8'))
+        return [(str(r['date'])[:10], int(r['interest'])) for r in rows]
+
+
+def get_source(spec=None):
+    """Source object for a TRENDS_SOURCE-style spec (or pass a source through)."""
+    spec = spec or TRENDS_SOURCE
+    if not isinstance(spec, str):
+        return spec
+    if spec == 'pytrends':
+        return PytrendsSource()
+    if spec.startswith(('http://', 'https://')):
+        return HTTPSource(spec)
+    if ':' in spec:
+        module, attr = spec.split(':', 1)
+        return getattr(importlib.import_module(module), attr)()
+    raise ValueError(f'Unknown trends source: {spec}')
+
+
+class RateLimiter:
+    """Token bucket shared by all fetch threads: `rate` requests/second, bursts of `burst`."""
+
+    def __init__(self, rate=TRENDS_RATE, burst=TRENDS_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def ensure_tables(conn):
+    """Create trends / trends_ingest_state and the (date, product) unique index (de-duplicating first)."""
+    conn.execute('CREATE TABLE IF NOT EXISTS trends (date TEXT, product TEXT, interest INTEGER)')
+    conn.execute('''CREATE TABLE IF NOT EXISTS trends_ingest_state (
+        product TEXT PRIMARY KEY,
+        last_date TEXT,
+        fetched_at TEXT)''')
+    has_index = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_trends_date_product'"
+                             ).fetchone()
+    if not has_index:
+        # Rows appended by older versions: normalize timestamps to days, keep the latest duplicate
+        conn.execute('UPDATE trends SET date = substr(date, 1, 10) WHERE length(date) > 10')
+        conn.execute('''DELETE FROM trends WHERE rowid NOT IN
+            (SELECT MAX(rowid) FROM trends GROUP BY date, product)''')
+        conn.execute('CREATE UNIQUE INDEX idx_trends_date_product ON trends (date, product)')
+    conn.commit()
+
+
+def upsert_rows(conn, product, rows):
+    """Upsert (date, interest) rows for `product`; returns the number of rows inserted or changed."""
+    before = conn.total_changes
+    conn.executemany('''INSERT INTO trends (date, product, interest) VALUES (?, ?, ?)
+        ON CONFLICT(date, product) DO UPDATE SET interest = excluded.interest
+        WHERE interest IS NOT excluded.interest''', [(d, product, v) for d, v in rows])
+    return conn.total_changes - before
+
+
+def align_to_stored(conn, product, rows, last_date, scale_stable=False):
+    """
+    Rows of an incremental fetch to write: those dated on/after `last_date`,
+    rescaled onto the stored series unless the source is scale-stable.
+
+    The scale factor is sum(stored) / sum(fetched) over the dates both have.
+    """
+    if not last_date:
+        return rows
+    if not scale_stable:
+        fetched = dict(rows)
+        stored = dict(conn.execute(
+            f"SELECT date, interest FROM trends WHERE product = ? AND date IN ({','.join('?' * len(fetched))})",
+            [product, *fetched])) if fetched else {}
+        shared = [d for d in stored if d in fetched]
+        new_sum = sum(fetched[d] for d in shared)
+        if new_sum > 0:
+            ratio = sum(stored[d] for d in shared) / new_sum
+            rows = [(d, int(round(v * ratio))) for d, v in rows]
+    return [(d, v) for d, v in rows if d >= last_date]
+
+
+def _state(conn):
+    return {p: (last, fetched) for p, last, fetched in conn.execute(
+        'SELECT product, last_date, fetched_at FROM trends_ingest_state')}
+
+
+def plan_range(last_date, today, lookback=TRENDS_LOOKBACK_DAYS, overlap=TRENDS_OVERLAP_DAYS):
+    """(start, end) dates to fetch for a product whose newest stored date is `last_date`."""
+    if last_date:
+        start = date.fromisoformat(last_date) - timedelta(days=overlap)
+        start -= timedelta(days=(start.weekday() + 1) % 7)  # whole Sunday-based weeks in the overlap
+    else:
+        start = today - timedelta(days=lookback)
+    return min(start, today), today
+
+
+# ---------------------------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------------------------
+
+def _fetch_with_retry(source, limiter, product, start, end, geo, retries):
+    delay = 2.0
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            return list(source.fetch(product, start, end, geo))
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+def ingest(products, geo='BD', source=None, db_path=None, force=False, limiter=None,
+           concurrency=TRENDS_CONCURRENCY, retries=TRENDS_RETRIES, today=None):
+    """
+    Fetch new trend points for `products` and upsert them.
+
+    Returns:
+        dict: product -> {'status': 'ok'|'skipped'|'error', 'start', 'end', 'fetched', 'upserted'[, 'error']}
+    """
+    source = get_source(source)
+    limiter = limiter or RateLimiter()
+    today = today or date.today()
+    now = datetime.now(timezone.utc)
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        ensure_tables(conn)
+        state = _state(conn)
+        report, todo = {}, []
+        for product in dict.fromkeys(products):
+            last_date, fetched_at = state.get(product, (None, None))
+            if not force and fetched_at and \
+                    (now - datetime.fromisoformat(fetched_at)).total_seconds() < TRENDS_MIN_INTERVAL:
+                report[product] = {'status': 'skipped', 'last_date': last_date}
+                continue
+            todo.append((product, last_date) + plan_range(last_date, today))
+
+        changed = 0
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='trends') as pool:
+            futures = {pool.submit(_fetch_with_retry, source, limiter, p, start, end, geo, retries):
+                       (p, last, start, end) for p, last, start, end in todo}
+            for future in as_completed(futures):
+                product, last_date, start, end = futures[future]
+                entry = {'start': start.isoformat(), 'end': end.isoformat()}
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    report[product] = dict(entry, status='error', error=str(e))
+                    continue
+                upserted = upsert_rows(conn, product, align_to_stored(
+                    conn, product, rows, last_date, getattr(source, 'scale_stable', False)))
+                newest = max([d for d, _ in rows] + ([last_date] if last_date else []), default=None)
+                conn.execute('''INSERT INTO trends_ingest_state (product, last_date, fetched_at)
+                    VALUES (?, ?, ?) ON CONFLICT(product) DO UPDATE SET
+                    last_date = excluded.last_date, fetched_at = excluded.fetched_at''',
+                             (product, newest, now.isoformat(timespec='seconds')))
+                conn.commit()
+                changed += upserted
+                report[product] = dict(entry, status='ok', fetched=len(rows), upserted=upserted)
+        if changed:
+            data_version.bump('trends', conn)
+        return report
+    finally:
+        conn.close()